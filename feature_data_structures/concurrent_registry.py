@@ -0,0 +1,240 @@
+import threading
+from bisect import bisect_left, insort
+from contextlib import contextmanager
+from datetime import datetime
+
+from feature_data_structures.expiration_data import ExpirationData
+from feature_data_structures.owner_based_car_registration import CopyOnWriteAVLTree
+from feature_data_structures.plate_lookup_registry import CopyOnWriteTrie
+from feature_data_structures.registry_service import RegistryService
+from feature_data_structures.vehicle_registration_system import VehicleRegistrationSystem
+
+# The registration details of a snapshot are split by plate hash into this many dicts. Publishing a
+# version copies only the dicts holding a changed plate, not the details of every registration.
+DETAIL_CHUNKS = 1024
+
+
+class RegistrySnapshot:
+    """
+    One published version of the registry. Nothing reachable from a snapshot is ever changed, so
+    any number of threads can read it at the same time without taking a lock. The registration
+    details it returns are shared with other snapshots and must not be changed either.
+    """
+    __slots__ = ("version", "trie", "owner_index", "owner_root", "details", "expiration_days",
+                 "expiration_buckets", "next_expiration", "registration_count")
+
+    def __init__(self, version, trie, owner_index, owner_root, details, expiration_days, expiration_buckets,
+                 registration_count):
+        self.version = version
+        self.trie = trie  # Read-only CompressedTrie sharing the nodes of this version
+        self.owner_index = owner_index  # Only used for its query methods, always with owner_root
+        self.owner_root = owner_root
+        self.details = details  # Tuple of DETAIL_CHUNKS dicts, license plate -> registration dict
+        # Sorted tuple of the "YYYY-MM-DD" expiration dates, and date -> sorted tuple of plates
+        self.expiration_days = expiration_days
+        self.expiration_buckets = expiration_buckets
+        self.next_expiration = next(iter(self.next_expirations(1)), None)  # (expiration_date, license_plate) or None
+        self.registration_count = registration_count
+
+    # Registration details as nested dicts, or None if the plate was not registered in this version
+    def get(self, license_plate):
+        return self.details[hash(license_plate) % DETAIL_CHUNKS].get(license_plate)
+
+    # The first count registrations to expire, earliest first, like ExpirationData.next_expirations
+    def next_expirations(self, count):
+        result = []
+        for day in self.expiration_days:
+            if len(result) >= count:
+                break
+            expiration_datetime = datetime.fromisoformat(day)
+            result.extend((expiration_datetime, license_plate)
+                          for license_plate in self.expiration_buckets[day][:count - len(result)])
+        return result
+
+    def search(self, prefix, limit=None, after=None):
+        return self.trie.search(prefix, limit=limit, after=after)
+
+    def count(self, prefix):
+        return self.trie.count(prefix)
+
+    def wildcard_search(self, pattern, limit=None):
+        return self.trie.wildcard_search(pattern, limit)
+
+    def find_vehicles_by_dl(self, dl_numbers, limit=None, offset=0):
+        return self.owner_index.find_vehicles_by_dl(self.owner_root, dl_numbers, limit, offset)
+
+    def owners_between(self, lo=None, hi=None):
+        return self.owner_index.range(self.owner_root, lo, hi)
+
+
+class VersionedRegistry:
+    """
+    Registry for one writer thread and many reader threads.
+
+    Readers take the current RegistrySnapshot with snapshot() and query it without any lock, so they
+    never wait for each other or for the writer. The writer changes the registry inside write(),
+    which hands out the RegistryService under a writer lock and runs the changes as one batch. The
+    trie and the owner index copy the nodes a change touches instead of changing them in place, so
+    when the batch ends a new snapshot is published by swapping a single reference, and readers
+    still holding an older snapshot keep a consistent view of it. The registration details and the
+    expiration dates are versioned the same way: the service tells the registry which plates a
+    write changed, and only the detail dicts and expiration days of those plates are copied.
+    """
+
+    def __init__(self, service=None):
+        if service is None:
+            # No owner table: owner names are kept in the versioned nodes instead of the shared table
+            service = RegistryService(VehicleRegistrationSystem(), CopyOnWriteTrie(), ExpirationData(), CopyOnWriteAVLTree())
+        if not isinstance(service.trie, CopyOnWriteTrie) or not isinstance(service.owner_index, CopyOnWriteAVLTree):
+            raise TypeError("A VersionedRegistry needs a CopyOnWriteTrie and a CopyOnWriteAVLTree")
+        self.service = service
+        self.write_lock = threading.Lock()
+        self.version = 0
+        self.current = None
+        self.changed_plates = set()
+        self.changed_all = True  # Copy every registration into the first version
+        service.add_listener(self._note_changes)
+        self._publish()
+
+    # The latest published version. Reading one attribute is atomic, with or without the GIL.
+    def snapshot(self):
+        return self.current
+
+    @contextmanager
+    def write(self):
+        """
+        Apply changes through the yielded RegistryService, then publish them as a new version.
+        Mutations applied before an exception are published too, each of them is atomic.
+        """
+        with self.write_lock:
+            try:
+                with self.service.batch():
+                    yield self.service
+            finally:
+                self._publish()
+
+    def _note_changes(self, license_plates):
+        if license_plates is None:
+            self.changed_all = True
+        else:
+            self.changed_plates.update(license_plates)
+
+    def _publish(self):
+        service = self.service
+        if self.changed_all:
+            details, expiration_days, expiration_buckets = self._copy_all()
+        else:
+            details, expiration_days, expiration_buckets = self._copy_changed()
+        self.changed_plates, self.changed_all = set(), False
+        self.version += 1
+        self.current = RegistrySnapshot(self.version, service.trie.snapshot(), service.owner_index,
+                                        service.owner_index.snapshot(), details, expiration_days,
+                                        expiration_buckets, len(service.registrations))
+
+    def _copy_all(self):
+        details = tuple({} for _ in range(DETAIL_CHUNKS))
+        buckets = {}
+        registrations = self.service.registrations
+        for license_plate in registrations:
+            registration = registrations[license_plate].to_dict()
+            details[hash(license_plate) % DETAIL_CHUNKS][license_plate] = registration
+            buckets.setdefault(registration['expiration_date'], []).append(license_plate)
+        return details, tuple(sorted(buckets)), {day: tuple(sorted(plates)) for day, plates in buckets.items()}
+
+    def _copy_changed(self):
+        previous = self.current
+        details = list(previous.details)
+        copied = set()  # Chunks already copied for this version
+        expiration_days = list(previous.expiration_days)
+        buckets = dict(previous.expiration_buckets)
+        moved = {}  # expiration date -> set of plates of that day, for the days with a change
+        registrations = self.service.registrations
+        for license_plate in self.changed_plates:
+            chunk = hash(license_plate) % DETAIL_CHUNKS
+            if chunk not in copied:
+                details[chunk] = dict(details[chunk])
+                copied.add(chunk)
+            old = details[chunk].pop(license_plate, None)
+            new = registrations[license_plate].to_dict() if license_plate in registrations else None
+            if new is not None:
+                details[chunk][license_plate] = new
+            for registration, present in ((old, False), (new, True)):
+                if registration is not None:
+                    day = registration['expiration_date']
+                    if day not in moved:
+                        moved[day] = set(buckets.get(day, ()))
+                    (moved[day].add if present else moved[day].discard)(license_plate)
+        for day, plates in moved.items():
+            if day not in buckets and plates:
+                insort(expiration_days, day)
+            elif day in buckets and not plates:
+                del expiration_days[bisect_left(expiration_days, day)]
+            if plates:
+                buckets[day] = tuple(sorted(plates))
+            else:
+                buckets.pop(day, None)
+        return tuple(details), tuple(expiration_days), buckets
+
+
+# Test suite for the versioned registry
+def test_concurrent_registry():
+    from objects.owner import Owner
+    from objects.vehicle import Vehicle
+
+    toyota = Vehicle("Toyota", "Camry", 2020, "Blue", "Sedan", "123456789")
+    registry = VersionedRegistry()
+
+    # Test Case 1: Snapshots do not see later changes
+    print("\n-- Test Case 1: Snapshot isolation --")
+    with registry.write() as service:
+        service.add("ABC123", toyota, Owner("John", "Doe", "DL12345"), "2023-01-01", "2025-01-01")
+        service.add("ABD456", toyota, Owner("John", "Doe", "DL12345"), "2023-01-01", "2024-06-01")
+    first = registry.snapshot()
+    with registry.write() as service:
+        service.remove("ABD456")
+        service.add("ABE789", toyota, Owner("Jane", "Roe", "DL67890"), "2023-01-01", "2024-01-01")
+        service.rename_owner("DL12345", "Johnny", "Doe")
+        service.update("ABC123", "expiration_date", "2023-12-01")
+    second = registry.snapshot()
+    for snapshot in (first, second):
+        print(f"Version {snapshot.version}: plates {snapshot.search('AB')}, "
+              f"DL12345 {snapshot.find_vehicles_by_dl('DL12345')}, next expiring {snapshot.next_expiration}")
+        print(f"  'ABC123': {snapshot.get('ABC123')}, 'ABD456' is {'present' if snapshot.get('ABD456') else 'absent'}, "
+              f"next two: {[license_plate for _, license_plate in snapshot.next_expirations(2)]}")
+
+    # Test Case 2: Readers on many threads while the writer keeps publishing
+    print("\n-- Test Case 2: Concurrent readers --")
+    errors = []
+    done = threading.Event()
+
+    def reader():
+        while not done.is_set():
+            snapshot = registry.snapshot()
+            plates = snapshot.search("P")
+            # Every version adds or removes plates in pairs, so a consistent view has an even count,
+            # and the details and expiration dates of the version hold the same plates
+            if len(plates) % 2 or len(plates) != snapshot.count("P") or \
+                    len(snapshot.next_expirations(snapshot.registration_count + 1)) != snapshot.registration_count or \
+                    any(snapshot.get(plate) is None for plate in plates[-10:]):
+                errors.append(snapshot.version)
+
+    threads = [threading.Thread(target=reader) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for i in range(500):
+        with registry.write() as service:
+            for plate in (f"P{i:04d}A", f"P{i:04d}B"):
+                service.add(plate, toyota, Owner("Fleet", "Owner", "DL00001"), "2023-01-01", "2026-01-01")
+            if i % 3 == 0:
+                service.remove(f"P{i // 3:04d}A")
+                service.remove(f"P{i // 3:04d}B")
+    done.set()
+    for thread in threads:
+        thread.join()
+    latest = registry.snapshot()
+    print("Published versions:", latest.version, "- Plates:", latest.count("P"), "- Inconsistent reads:", len(errors))
+
+
+# Running the test suite
+if __name__ == "__main__":
+    test_concurrent_registry()
@@ -1,60 +1,460 @@
 import heapq
-from datetime import datetime
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from datetime import date, datetime
+
+from feature_data_structures.registry_events import events, hide_events, show_events
+
+
+# Parse a "YYYY-MM-DD" expiration date into a day ordinal.
+# date.fromisoformat is implemented in C and much faster than datetime.strptime, but it also accepts
+# other ISO forms ("20240115", "2024-W03-1"), so it only takes the zero-padded layout. Anything else
+# goes through strptime, which accepts the same dates as the prompts ("2024-1-5" too).
+def parse_expiration_date(expiration_date):
+    if len(expiration_date) == 10 and expiration_date[4] == "-" and expiration_date[7] == "-":
+        try:
+            return date.fromisoformat(expiration_date).toordinal()
+        except ValueError:
+            pass  # Let strptime report the error
+    return datetime.strptime(expiration_date, "%Y-%m-%d").toordinal()
+
 
 class ExpirationData:
     def __init__(self):
         # Min-heap to store (expiration_date, license_plate) tuples
         self.expiration_heap = []
+        # Position of every license plate in the heap, so a plate can be found without scanning
+        self.positions = {}
+        # Calendar buckets for range queries: day ordinal -> set of plates expiring that day,
+        # plus the sorted list of days that have at least one plate
+        self.day_buckets = {}
+        self.bucket_days = []
+        # Callbacks told about a new earliest expiration
+        self.listeners = []
+        # Callbacks told about every day that gets its first expiring registration, e.g. to wake up an
+        # ExpirationScheduler waiting for a later day
+        self.day_listeners = []
+
+    def __len__(self):
+        return len(self.expiration_heap)
+
+    def __contains__(self, license_plate):
+        return self._position(license_plate) is not None
 
     # Add a vehicle's expiration date and license plate to the heap
+    # (a plate that is already in the heap gets its expiration date changed instead)
     def add_registration(self, license_plate, expiration_date):
-        expiration_datetime = datetime.strptime(expiration_date, "%Y-%m-%d")
-        heapq.heappush(self.expiration_heap, (expiration_datetime, license_plate))
-        print(f"Added {license_plate} with expiration date {expiration_date} to the heap.")
+        day = parse_expiration_date(expiration_date)
+        if self._position(license_plate) is not None:
+            self._change_date(license_plate, day)
+        else:
+            self.expiration_heap.append(self._make_entry(day, license_plate))
+            if self._sift_up(len(self.expiration_heap) - 1) == 0:
+                self._notify_earliest()
+            self._bucket_add(day, license_plate)
+        events.debug("Added %s with expiration date %s to the heap.", license_plate, expiration_date)
+
+    # Add a whole column of registrations at once. Each distinct date string is parsed only once,
+    # and when the new plates are appended the heap order is rebuilt with a single heapify
+    # instead of sifting every entry in. Returns the number of plates that were not in the heap yet.
+    def add_registrations(self, license_plates, expiration_dates):
+        parsed = {}
+        days = {}  # The last date given for a plate wins, like repeated add_registration calls
+        for license_plate, expiration_date in zip(license_plates, expiration_dates):
+            day = parsed.get(expiration_date)
+            if day is None:
+                day = parsed[expiration_date] = parse_expiration_date(expiration_date)
+            days[license_plate] = day
+
+        if self.expiration_heap:
+            # Plates that are already in the heap only get their date changed
+            for license_plate in [plate for plate in days if self._position(plate) is not None]:
+                self._change_date(license_plate, days.pop(license_plate))
+
+        make_entry = self._make_entry
+        new_entries = [make_entry(day, license_plate) for license_plate, day in days.items()]
+        if new_entries:
+            earliest = self.expiration_heap[0] if self.expiration_heap else None
+            self._heapify(new_entries)
+            if self.expiration_heap[0] != earliest:
+                self._notify_earliest()
+
+        # Fill the calendar buckets one day at a time
+        plates_by_day = {}
+        for license_plate, day in days.items():
+            plates_by_day.setdefault(day, []).append(license_plate)
+        for day, day_plates in plates_by_day.items():
+            self._bucket_add(day, day_plates[0])
+            self.day_buckets[day].update(day_plates)
+
+        events.debug("Added %d registrations to the heap.", len(new_entries))
+        return len(new_entries)
 
     # Get the next vehicle registration to expire (without removing it)
     def get_next_expiration(self):
         if not self.expiration_heap:
             return None
-        return self.expiration_heap[0]  # Peek at the smallest element (earliest expiration date)
+        return self._decode(self.expiration_heap[0])  # Peek at the smallest element (earliest expiration date)
+
+    # Get the first count registrations to expire, earliest first (without removing them).
+    # Registrations expiring on the same day are ordered by plate, like expiring_between.
+    def next_expirations(self, count):
+        result = []
+        for day in self.bucket_days:
+            if len(result) >= count:
+                break
+            expiration_datetime = datetime.fromordinal(day)
+            for license_plate in sorted(self.day_buckets[day])[:count - len(result)]:
+                result.append((expiration_datetime, license_plate))
+        return result
 
     # Remove the next vehicle registration to expire from the heap
     def remove_next_expiration(self):
         if not self.expiration_heap:
             return None
-        next_expiration = heapq.heappop(self.expiration_heap)  # Pop the smallest element
-        print(f"Removed {next_expiration[1]} with expiration date {next_expiration[0]} from the heap.")
+        next_expiration = self._remove_at(0)  # Pop the smallest element
+        events.debug("Removed %s with expiration date %s from the heap.", next_expiration[1], next_expiration[0])
         return next_expiration
 
-    # Remove a specific vehicle's registration from the heap (if needed)
+    # Remove a specific vehicle's registration from the heap in O(log n)
     def remove_registration(self, license_plate):
-        for i, (exp_date, plate) in enumerate(self.expiration_heap):
-            if plate == license_plate:
-                del self.expiration_heap[i]
-                heapq.heapify(self.expiration_heap)
-                print(f"Removed registration for {license_plate}.")
-                return True
-        print(f"License plate {license_plate} not found in the heap.")
-        return False
+        index = self._position(license_plate)
+        if index is None:
+            events.debug("License plate %s not found in the heap.", license_plate)
+            return False
+        self._remove_at(index)
+        events.debug("Removed registration for %s.", license_plate)
+        return True
 
-    # Update the expiration date for a given vehicle
+    # Remove many registrations at once. When they are a large share of the heap, the remaining entries
+    # are re-heapified once instead of sifting the heap after every removal.
+    # Returns the number of plates that were in the heap.
+    def remove_registrations(self, license_plates):
+        removed = {license_plate for license_plate in license_plates if self._position(license_plate) is not None}
+        if len(removed) * len(self.expiration_heap).bit_length() < len(self.expiration_heap):
+            for license_plate in removed:
+                self._remove_at(self._position(license_plate))
+        elif removed:
+            kept = []
+            for entry in self.expiration_heap:
+                license_plate = self._entry_plate(entry)
+                if license_plate in removed:
+                    self._bucket_remove(self._entry_day(entry), license_plate)
+                    self._forget(license_plate)
+                else:
+                    kept.append(entry)
+            del self.expiration_heap[:]
+            self._heapify(kept)
+        events.debug("Removed %d registrations from the heap.", len(removed))
+        return len(removed)
+
+    # Update the expiration date for a given vehicle in O(log n), moving its entry up or down the heap
     def update_registration(self, license_plate, new_expiration_date):
-        # Step 1: Remove the old registration entry
-        removed = self.remove_registration(license_plate)
-        if removed:
-            # Step 2: Add the new registration with the updated expiration date
-            self.add_registration(license_plate, new_expiration_date)
-            print(f"Updated expiration date for {license_plate} to {new_expiration_date}.")
+        if self._position(license_plate) is not None:
+            self._change_date(license_plate, parse_expiration_date(new_expiration_date))
+            events.debug("Updated expiration date for %s to %s.", license_plate, new_expiration_date)
+            return True
+        events.debug("Failed to update: License plate %s not found.", license_plate)
+        return False
+
+    # Register a callback that is called with the new (expiration_date, license_plate) whenever
+    # a registration becomes the earliest one to expire because of an add or a date change
+    def add_listener(self, callback):
+        self.listeners.append(callback)
+
+    def remove_listener(self, callback):
+        self.listeners.remove(callback)
+
+    # Register a callback that is called with the day ordinal whenever a registration expires on a
+    # day no other registration in the heap expires on
+    def add_day_listener(self, callback):
+        self.day_listeners.append(callback)
+
+    def remove_day_listener(self, callback):
+        self.day_listeners.remove(callback)
+
+    def _notify_earliest(self):
+        if self.listeners:
+            earliest = self._decode(self.expiration_heap[0])
+            for callback in self.listeners:
+                callback(earliest)
+
+    # Get the registrations expiring between start and end (both included), ordered by date and plate.
+    # Dates can be given as "YYYY-MM-DD" strings or date objects. The heap is left untouched.
+    def expiring_between(self, start, end):
+        result = []
+        for day in self._days_between(start, end):
+            expiration_datetime = datetime.fromordinal(day)
+            for license_plate in sorted(self.day_buckets[day]):
+                result.append((expiration_datetime, license_plate))
+        return result
+
+    # Count the registrations expiring between start and end (both included) without listing them
+    def count_between(self, start, end):
+        return sum(len(self.day_buckets[day]) for day in self._days_between(start, end))
+
+    # Number of registrations expiring on each day that has any, as {"YYYY-MM-DD": count}.
+    # start and end optionally limit the range of days.
+    def count_by_day(self, start=None, end=None):
+        return {date.fromordinal(day).isoformat(): len(self.day_buckets[day])
+                for day in self._days_between(start, end)}
+
+    # Number of registrations expiring in each month that has any, as {"YYYY-MM": count}
+    def count_by_month(self, start=None, end=None):
+        counts = {}
+        for day in self._days_between(start, end):
+            month = date.fromordinal(day).isoformat()[:7]
+            counts[month] = counts.get(month, 0) + len(self.day_buckets[day])
+        return counts
+
+    # Remove and return every registration that has expired as of the given date (expiration date <= as_of),
+    # earliest first. Each removal is an O(log n) pop, the rest of the heap is not touched.
+    def pop_expired(self, as_of):
+        as_of_day = self._to_ordinal(as_of)
+        expired = []
+        while self.expiration_heap and self._entry_day(self.expiration_heap[0]) <= as_of_day:
+            expired.append(self._remove_at(0))
+        if expired:
+            events.debug("Removed %d registrations expired as of %s.", len(expired), date.fromordinal(as_of_day))
+        return expired
+
+    # Ordinals of the non-empty days between start and end (None means unbounded)
+    def _days_between(self, start, end):
+        low = 0 if start is None else bisect_left(self.bucket_days, self._to_ordinal(start))
+        high = len(self.bucket_days) if end is None else bisect_right(self.bucket_days, self._to_ordinal(end))
+        return self.bucket_days[low:high]
+
+    @staticmethod
+    def _to_ordinal(value):
+        if isinstance(value, str):
+            return parse_expiration_date(value)
+        return value.toordinal()
+
+    def _bucket_add(self, day, license_plate):
+        bucket = self.day_buckets.get(day)
+        if bucket is None:
+            bucket = self.day_buckets[day] = set()
+            insort(self.bucket_days, day)
+            for callback in self.day_listeners:
+                callback(day)
+        bucket.add(license_plate)
+
+    def _bucket_remove(self, day, license_plate):
+        bucket = self.day_buckets[day]
+        bucket.discard(license_plate)
+        if not bucket:
+            del self.day_buckets[day]
+            del self.bucket_days[bisect_left(self.bucket_days, day)]
+
+    # Entry layout hooks. By default an entry is a (datetime, license_plate) tuple and positions are
+    # kept in a dict; CompactExpirationData overrides these to pack entries into integers.
+    def _make_entry(self, day, license_plate):
+        return datetime.fromordinal(day), license_plate
+
+    def _entry_day(self, entry):
+        return entry[0].toordinal()
+
+    def _entry_plate(self, entry):
+        return entry[1]
+
+    def _decode(self, entry):
+        return entry
+
+    def _position(self, license_plate):
+        return self.positions.get(license_plate)
+
+    def _set_position(self, entry, index):
+        self.positions[entry[1]] = index
+
+    def _forget(self, license_plate):
+        del self.positions[license_plate]
+
+    # Append new entries and restore the heap order with one heapify, then record every position
+    def _heapify(self, new_entries):
+        self.expiration_heap.extend(new_entries)
+        heapq.heapify(self.expiration_heap)
+        self.positions = {license_plate: index for index, (_, license_plate) in enumerate(self.expiration_heap)}
+
+    # Replace the date of a plate's entry and restore the heap order around it
+    def _change_date(self, license_plate, day):
+        index = self._position(license_plate)
+        old_entry = self.expiration_heap[index]
+        new_entry = self._make_entry(day, license_plate)
+        self.expiration_heap[index] = new_entry
+        self._bucket_remove(self._entry_day(old_entry), license_plate)
+        self._bucket_add(day, license_plate)
+        if new_entry < old_entry:
+            if self._sift_up(index) == 0:
+                self._notify_earliest()
         else:
-            print(f"Failed to update: License plate {license_plate} not found.")
+            self._sift_down(index)
+
+    # Remove the entry at the given heap index by moving the last entry into its place.
+    # Returns the removed registration as an (expiration_date, license_plate) tuple.
+    def _remove_at(self, index):
+        heap = self.expiration_heap
+        removed = heap[index]
+        license_plate = self._entry_plate(removed)
+        registration = self._decode(removed)
+        self._bucket_remove(self._entry_day(removed), license_plate)
+        self._forget(license_plate)
+        last = heap.pop()
+        if index < len(heap):
+            heap[index] = last
+            self._set_position(last, index)
+            # The moved entry can belong either above or below its new position
+            self._sift_down(self._sift_up(index))
+        return registration
+
+    # Move the entry at index up while it is earlier than its parent. Returns its final index.
+    def _sift_up(self, index):
+        heap, positions = self.expiration_heap, self.positions
+        entry = heap[index]
+        while index > 0:
+            parent = (index - 1) // 2
+            if heap[parent] <= entry:
+                break
+            heap[index] = heap[parent]
+            positions[heap[index][1]] = index
+            index = parent
+        heap[index] = entry
+        positions[entry[1]] = index
+        return index
+
+    # Move the entry at index down while one of its children is earlier. Returns its final index.
+    def _sift_down(self, index):
+        heap, positions = self.expiration_heap, self.positions
+        size = len(heap)
+        entry = heap[index]
+        while True:
+            child = 2 * index + 1
+            if child >= size:
+                break
+            if child + 1 < size and heap[child + 1] < heap[child]:
+                child += 1
+            if entry <= heap[child]:
+                break
+            heap[index] = heap[child]
+            positions[heap[index][1]] = index
+            index = child
+        heap[index] = entry
+        positions[entry[1]] = index
+        return index
 
     # Utility function to check the contents of the heap (for debugging)
     def print_heap(self):
         print("Current Expiration Heap:")
-        for exp_date, plate in self.expiration_heap:
+        for entry in self.expiration_heap:
+            exp_date, plate = self._decode(entry)
             print(f"License Plate: {plate}, Expiration Date: {exp_date.strftime('%Y-%m-%d')}")
 
 
+# Number of low bits of a compact heap entry that hold the plate id
+PLATE_ID_BITS = 32
+PLATE_ID_MASK = (1 << PLATE_ID_BITS) - 1
+
+
+class CompactExpirationData(ExpirationData):
+    """
+    Memory-lean ExpirationData for very large registries.
+
+    Every heap entry is one 64-bit integer, (day ordinal << 32) | plate id, stored in an array('q')
+    buffer, so comparing two entries still compares the expiration dates first. Each plate is kept
+    once in a plate table and heap positions live in another array indexed by plate id, instead of
+    a (datetime, str) tuple per entry and a dict of positions. Registrations expiring on the same day
+    are ordered by plate id rather than by plate. The public methods return the same
+    (expiration_date, license_plate) tuples as ExpirationData.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.expiration_heap = array("q")
+        self.positions = array("q")  # plate id -> heap index, -1 while the id is unused
+        self.plates = []  # plate id -> license plate
+        self.plate_ids = {}  # license plate -> plate id
+        self.free_ids = []  # ids of removed plates, reused before the table grows
+
+    def _make_entry(self, day, license_plate):
+        plate_id = self.plate_ids.get(license_plate)
+        if plate_id is None:
+            if self.free_ids:
+                plate_id = self.free_ids.pop()
+                self.plates[plate_id] = license_plate
+            else:
+                plate_id = len(self.plates)
+                self.plates.append(license_plate)
+                self.positions.append(-1)
+            self.plate_ids[license_plate] = plate_id
+        return day << PLATE_ID_BITS | plate_id
+
+    def _entry_day(self, entry):
+        return entry >> PLATE_ID_BITS
+
+    def _entry_plate(self, entry):
+        return self.plates[entry & PLATE_ID_MASK]
+
+    def _decode(self, entry):
+        return datetime.fromordinal(entry >> PLATE_ID_BITS), self.plates[entry & PLATE_ID_MASK]
+
+    def _position(self, license_plate):
+        plate_id = self.plate_ids.get(license_plate)
+        if plate_id is None or self.positions[plate_id] < 0:
+            return None
+        return self.positions[plate_id]
+
+    def _set_position(self, entry, index):
+        self.positions[entry & PLATE_ID_MASK] = index
+
+    def _forget(self, license_plate):
+        plate_id = self.plate_ids.pop(license_plate)
+        self.positions[plate_id] = -1
+        self.plates[plate_id] = None
+        self.free_ids.append(plate_id)
+
+    def _heapify(self, new_entries):
+        # heapq only works on lists, so the buffer is heapified as a list once and packed back
+        entries = self.expiration_heap.tolist()
+        entries.extend(new_entries)
+        heapq.heapify(entries)
+        self.expiration_heap = array("q", entries)
+        positions = self.positions
+        for index, entry in enumerate(entries):
+            positions[entry & PLATE_ID_MASK] = index
+
+    def _sift_up(self, index):
+        heap, positions = self.expiration_heap, self.positions
+        entry = heap[index]
+        while index > 0:
+            parent = (index - 1) // 2
+            if heap[parent] <= entry:
+                break
+            heap[index] = heap[parent]
+            positions[heap[index] & PLATE_ID_MASK] = index
+            index = parent
+        heap[index] = entry
+        positions[entry & PLATE_ID_MASK] = index
+        return index
+
+    def _sift_down(self, index):
+        heap, positions = self.expiration_heap, self.positions
+        size = len(heap)
+        entry = heap[index]
+        while True:
+            child = 2 * index + 1
+            if child >= size:
+                break
+            if child + 1 < size and heap[child + 1] < heap[child]:
+                child += 1
+            if entry <= heap[child]:
+                break
+            heap[index] = heap[child]
+            positions[heap[index] & PLATE_ID_MASK] = index
+            index = child
+        heap[index] = entry
+        positions[entry & PLATE_ID_MASK] = index
+        return index
+
+
 # Testing the ExpirationHeap (Priority Queue) implementation
 
 def test_expiration_heap():
@@ -109,7 +509,78 @@ def test_expiration_heap():
     if next_expiration is None:
         print("Heap is empty, no next expiration.")
 
+    # Test Case 8: Renewing the next registration to expire moves it down the heap
+    print("\n-- Test Case 8: Renewing registrations by license plate --")
+    for plate, date in [("AAA111", "2024-02-01"), ("BBB222", "2024-03-01"), ("CCC333", "2024-04-01")]:
+        expiration_manager.add_registration(plate, date)
+    expiration_manager.update_registration("AAA111", "2025-02-01")
+    print(f"Next to expire after renewing AAA111: {expiration_manager.get_next_expiration()[1]}")
+    expiration_manager.add_registration("CCC333", "2024-01-01")  # Adding a known plate changes its date
+    print(f"Next to expire after moving CCC333 earlier: {expiration_manager.get_next_expiration()[1]}")
+    print(f"Registrations in the heap: {len(expiration_manager)}")
+
+    # Test Case 9: Date range queries and expiry sweeps
+    print("\n-- Test Case 9: Date range queries and expiry sweeps --")
+    expiration_manager.add_registration("DDD444", "2024-04-15")
+    print("Expiring between 2024-01-01 and 2024-03-31:",
+          [(plate, exp_date.strftime('%Y-%m-%d')) for exp_date, plate in expiration_manager.expiring_between("2024-01-01", "2024-03-31")])
+    print("Number expiring in 2024:", expiration_manager.count_between("2024-01-01", "2024-12-31"))
+    print("Expirations per day:", expiration_manager.count_by_day())
+    print("Expirations per month:", expiration_manager.count_by_month())
+    expired = expiration_manager.pop_expired("2024-03-01")
+    print("Expired as of 2024-03-01:", [plate for exp_date, plate in expired])
+    print(f"Next to expire after the sweep: {expiration_manager.get_next_expiration()[1]}")
+
+
+# Compare the memory and load time of the default and compact layouts on a bulk ingest
+def test_compact_expiration_data(num_plates=100000):
+    import random
+    import time
+    import tracemalloc
+
+    print(f"\n-- Test Case 10: Bulk ingest of {num_plates} registrations --")
+    plates = [f"P{i:07d}" for i in range(num_plates)]
+    dates = [f"{random.randint(2024, 2026)}-{random.randint(1, 12):02d}-{random.randint(1, 28):02d}" for _ in plates]
+
+    for data_class in (ExpirationData, CompactExpirationData):
+        tracemalloc.start()
+        start_time = time.time()
+        expiration_manager = data_class()
+        expiration_manager.add_registrations(plates, dates)
+        duration = time.time() - start_time
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        next_date, next_plate = expiration_manager.get_next_expiration()
+        assert next_date.strftime('%Y-%m-%d') == min(dates), "The earliest date should be at the top of the heap"
+        print(f"{data_class.__name__}: {duration:.2f} seconds, {current / num_plates:.0f} bytes per registration")
+
+
+# Time one-by-one adds with the heap's events hidden and with them written to a buffer
+def test_event_overhead(num_plates=100000):
+    import io
+    import time
+
+    print(f"\n-- Test Case 11: Cost of the heap's events on {num_plates} adds --")
+    plates = [f"P{i:07d}" for i in range(num_plates)]
+    dates = [f"20{25 + i % 5}-{1 + i % 12:02d}-{1 + i % 28:02d}" for i in range(num_plates)]
+    for shown in (False, True):
+        hide_events()
+        if shown:
+            show_events(stream=io.StringIO())
+        start_time = time.time()
+        expiration_manager = ExpirationData()
+        for plate, date in zip(plates, dates):
+            expiration_manager.add_registration(plate, date)
+        duration = time.time() - start_time
+        print(f"Events {'shown' if shown else 'hidden'}: {duration:.2f} seconds, {num_plates / duration:,.0f} adds per second")
+    hide_events()
+    show_events()
+
 
 # Running the test suite
 if __name__ == "__main__":
+    show_events()  # Follow the heap's events in the terminal
     test_expiration_heap()
+    test_compact_expiration_data()
+    test_event_overhead()
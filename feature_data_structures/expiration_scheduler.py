@@ -0,0 +1,170 @@
+import asyncio
+import inspect
+from bisect import bisect_right
+from datetime import date, datetime
+
+
+class ExpirationScheduler:
+    """
+    Background task that flags lapsed registrations as soon as they expire.
+
+    Instead of polling, the scheduler sleeps until the next day on which a registration in the
+    ExpirationData expires. When it wakes up it reads the registrations that expired since the last
+    day it reported (expiring_between) and emits them as one batch of (expiration_date, license_plate)
+    tuples to the registered callbacks and, if given, to an asyncio queue. The first run reports
+    everything that expired up to today. A registration on a new day before the one it is waiting
+    for wakes it up immediately.
+
+    The ExpirationData is only read, so the scheduler can watch the registry's own heap (see
+    RegistryService.expiration_scheduler): lapsed plates stay in next-expiring queries until they
+    are renewed or removed. A registration added with a day that was already reported is not
+    reported again.
+    """
+
+    def __init__(self, expiration_data, queue=None, clock=datetime.now, max_sleep=3600):
+        self.expiration_data = expiration_data
+        self.queue = queue  # Optional asyncio.Queue receiving every batch of expired registrations
+        self.clock = clock  # Returns the current datetime, replaceable for testing
+        self.max_sleep = max_sleep  # Upper bound on one sleep in seconds, guards against clock changes
+        self.callbacks = []
+        self.reported_through = None  # Ordinal of the last day whose expirations were emitted
+        self._loop = None
+        self._wakeup = None
+        self._running = False
+        expiration_data.add_day_listener(self._on_new_day)
+
+    # Register a function or coroutine function called with each batch of expired registrations
+    def add_callback(self, callback):
+        self.callbacks.append(callback)
+
+    async def run(self):
+        """
+        Run the scheduler until stop() is called.
+        """
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._running = True
+        while self._running:
+            # Clear before looking at the heap, so an insert made while we emit is not missed
+            self._wakeup.clear()
+            expired = self._expired_since_last_report()
+            if expired:
+                await self._emit(expired)
+                continue  # Emitting may have taken a while, check the clock again
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self._seconds_until_next_expiration())
+            except asyncio.TimeoutError:
+                pass
+
+    def stop(self):
+        self._running = False
+        if self._wakeup is not None:
+            self._wake_up()
+
+    def close(self):
+        """
+        Stop the scheduler and stop listening to the ExpirationData.
+        """
+        self.stop()
+        self.expiration_data.remove_day_listener(self._on_new_day)
+
+    # Registrations expiring after the last reported day up to today, marking today as reported
+    def _expired_since_last_report(self):
+        today = self.clock().toordinal()
+        if self.reported_through is not None and today <= self.reported_through:
+            return []
+        start = None if self.reported_through is None else date.fromordinal(self.reported_through + 1)
+        self.reported_through = today
+        return self.expiration_data.expiring_between(start, date.fromordinal(today))
+
+    def _seconds_until_next_expiration(self):
+        days = self.expiration_data.bucket_days
+        index = 0 if self.reported_through is None else bisect_right(days, self.reported_through)
+        if index == len(days):
+            return self.max_sleep
+        seconds = (datetime.fromordinal(days[index]) - self.clock()).total_seconds()
+        return min(max(seconds, 0), self.max_sleep)
+
+    async def _emit(self, expired):
+        for callback in self.callbacks:
+            result = callback(expired)
+            if inspect.isawaitable(result):
+                await result
+        if self.queue is not None:
+            await self.queue.put(expired)
+
+    # Called by ExpirationData when a registration expires on a day that had none
+    def _on_new_day(self, day):
+        if self._wakeup is not None and (self.reported_through is None or day > self.reported_through):
+            self._wake_up()
+
+    def _wake_up(self):
+        # The heap can be changed from another thread, asyncio.Event is only safe to set from its own loop
+        try:
+            same_loop = asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            same_loop = False
+        if same_loop:
+            self._wakeup.set()
+        elif not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+
+# Test suite for the expiration scheduler, driven by a fake clock
+def test_expiration_scheduler():
+    from datetime import timedelta
+    from feature_data_structures.expiration_data import ExpirationData
+    from feature_data_structures.registry_service import RegistryService
+    from objects.owner import Owner
+    from objects.vehicle import Vehicle
+
+    async def scenario():
+        now = [datetime(2024, 6, 1)]
+        expiration_manager = ExpirationData()
+        events = asyncio.Queue()
+        scheduler = ExpirationScheduler(expiration_manager, queue=events, clock=lambda: now[0])
+        scheduler.add_callback(lambda batch: print("Callback received:", [plate for _, plate in batch]))
+
+        # Test Case 1: Registrations that already lapsed are emitted as one batch
+        print("\n-- Test Case 1: Emitting registrations that already expired --")
+        expiration_manager.add_registration("OLD111", "2024-05-01")
+        expiration_manager.add_registration("OLD222", "2024-05-20")
+        expiration_manager.add_registration("NEW333", "2025-01-01")
+        task = asyncio.create_task(scheduler.run())
+        batch = await asyncio.wait_for(events.get(), 1)
+        print("Expired batch:", [plate for _, plate in batch])
+
+        # Test Case 2: An earlier expiration wakes the scheduler up instead of waiting for NEW333
+        print("\n-- Test Case 2: Inserting an earlier expiration while the scheduler sleeps --")
+        await asyncio.sleep(0.01)
+        now[0] += timedelta(days=30)
+        expiration_manager.add_registration("SOON44", "2024-06-15")
+        batch = await asyncio.wait_for(events.get(), 1)
+        print("Expired batch:", [plate for _, plate in batch])
+        print("Registrations left in the heap:", len(expiration_manager),
+              "- Next to expire:", expiration_manager.get_next_expiration()[1])
+
+        scheduler.close()
+        await task
+
+        # Test Case 3: Watching the heap of a registry, which keeps its lapsed plates
+        print("\n-- Test Case 3: Watching a RegistryService --")
+        service = RegistryService()
+        scheduler = service.expiration_scheduler(queue=events, clock=lambda: now[0])
+        toyota = Vehicle("Toyota", "Camry", 2020, "Blue", "Sedan", "123456789")
+        service.add("ABC123", toyota, Owner("John", "Doe", "DL12345"), "2023-01-01", "2024-06-20")
+        service.add("XYZ789", toyota, Owner("Jane", "Roe", "DL67890"), "2023-01-01", "2024-09-01")
+        task = asyncio.create_task(scheduler.run())
+        batch = await asyncio.wait_for(events.get(), 1)
+        print("Expired batch:", [plate for _, plate in batch])
+        print("Next expiring vehicles of the registry:", [plate for _, plate in service.heap.next_expirations(2)])
+        scheduler.close()
+        await task
+
+    asyncio.run(scenario())
+
+
+# Running the test suite
+if __name__ == "__main__":
+    test_expiration_scheduler()
@@ -0,0 +1,267 @@
+import mmap
+import sys
+from array import array
+from collections import deque
+from itertools import islice
+from struct import Struct
+
+# File header: magic, format version, byte order flag, node count, label bytes, plate count
+HEADER = Struct("<4sHHIII")
+MAGIC = b"PLTF"
+VERSION = 2
+NATIVE_ORDER = 1 if sys.byteorder == "little" else 2
+
+
+class FrozenTrie:
+    """
+    Immutable, pointer-free image of a CompressedTrie.
+
+    Nodes are numbered in breadth first order, so the children of a node are stored next to each
+    other and every node is described by a few entries in flat arrays:
+        label_start[k] .. label_start[k + 1]  bytes of the edge label in the labels buffer
+        first_child[k] .. first_child[k + 1]  indexes of the child nodes (sorted by label)
+        counts[k]                             number of license plates in the subtree of the node
+        is_end[k]                             1 if a license plate ends at the node
+    The image can be saved to disk and served through mmap, so several processes share one copy.
+    """
+
+    def __init__(self, buffer):
+        self._buffer = buffer
+        magic, version, byte_order, node_count, label_size, plate_count = HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("Not a frozen trie image")
+        if byte_order != NATIVE_ORDER:
+            raise ValueError("Frozen trie image was written on a machine with a different byte order")
+
+        view = memoryview(buffer)
+        offset = HEADER.size
+        self._label_start = view[offset:offset + 4 * (node_count + 1)].cast("I")
+        offset += 4 * (node_count + 1)
+        self._first_child = view[offset:offset + 4 * (node_count + 1)].cast("I")
+        offset += 4 * (node_count + 1)
+        self._counts = view[offset:offset + 4 * node_count].cast("I")
+        offset += 4 * node_count
+        self._is_end = view[offset:offset + node_count]
+        offset += node_count
+        self._labels = view[offset:offset + label_size]
+        self._node_count = node_count
+        self._plate_count = plate_count
+
+    @classmethod
+    def from_trie(cls, trie):
+        """
+        Flatten a CompressedTrie into a new in-memory image.
+        """
+        label_start = array("I", [0])
+        first_child = array("I")
+        counts = array("I")
+        is_end = bytearray()
+        labels = bytearray()
+        plate_count = 0
+
+        queue = deque([trie.root])
+        next_index = 1  # The root is node 0
+        while queue:
+            node = queue.popleft()
+            labels += node.label.encode("utf-8")
+            label_start.append(len(labels))
+            counts.append(node.count)
+            is_end.append(1 if node.is_end_of_plate else 0)
+            plate_count += node.is_end_of_plate
+
+            first_child.append(next_index)
+            for char in sorted(node.children):
+                queue.append(node.children[char])
+                next_index += 1
+        first_child.append(next_index)
+
+        node_count = len(is_end)
+        header = HEADER.pack(MAGIC, VERSION, NATIVE_ORDER, node_count, len(labels), plate_count)
+        return cls(b"".join([header, label_start.tobytes(), first_child.tobytes(), counts.tobytes(),
+                             bytes(is_end), bytes(labels)]))
+
+    @classmethod
+    def load(cls, path):
+        """
+        Memory-map a frozen image from disk. The pages are shared with every other process mapping the file.
+        """
+        with open(path, "rb") as file:
+            mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(mapped)
+
+    def save(self, path):
+        with open(path, "wb") as file:
+            file.write(self._buffer)
+
+    def close(self):
+        """
+        Release the views on the buffer and unmap it if it was loaded from disk.
+        """
+        for view in (self._label_start, self._first_child, self._counts, self._is_end, self._labels):
+            view.release()
+        if isinstance(self._buffer, mmap.mmap):
+            self._buffer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return self._plate_count
+
+    def __contains__(self, license_plate):
+        located = self._locate(license_plate.encode("utf-8"))
+        return located is not None and located[1] == license_plate.encode("utf-8") and self._is_end[located[0]] == 1
+
+    def nbytes(self):
+        """
+        Size of the image in bytes.
+        """
+        return len(self._buffer)
+
+    def search(self, prefix, limit=None, offset=0, after=None):
+        """
+        Search for license plates starting with the given prefix, with the same paging as CompressedTrie.search.
+        """
+        return list(islice(self.iter_search(prefix, after, offset), limit))
+
+    def count(self, prefix):
+        """
+        Count the license plates starting with the given prefix in O(prefix length).
+        """
+        if not prefix:  # Handle empty prefix case, like search
+            return 0
+        located = self._locate(prefix.encode("utf-8"))
+        return 0 if located is None else self._counts[located[0]]
+
+    def iter_search(self, prefix, after=None, offset=0):
+        """
+        Lazily yield the license plates starting with the given prefix in sorted order,
+        skipping the first offset plates whole subtrees at a time.
+        """
+        if not prefix:  # Handle empty prefix case
+            return
+
+        located = self._locate(prefix.encode("utf-8"))
+        if located is None:
+            return  # Prefix not found
+
+        after = None if after is None else after.encode("utf-8")
+        label_start, first_child, counts, is_end, labels = (self._label_start, self._first_child, self._counts,
+                                                            self._is_end, self._labels)
+        skip = offset
+        stack = [located]
+        while stack:
+            index, path = stack.pop()
+            if skip and after is None and counts[index] <= skip:
+                skip -= counts[index]  # The whole subtree comes before the requested page
+                continue
+            if is_end[index] and (after is None or path > after):
+                if skip:
+                    skip -= 1
+                else:
+                    yield path.decode("utf-8")
+
+            # Children are stored in sorted order, push them in reverse so the smallest is visited first
+            for child in range(first_child[index + 1] - 1, first_child[index] - 1, -1):
+                child_path = path + labels[label_start[child]:label_start[child + 1]]
+                if after is not None and child_path < after[:len(child_path)]:
+                    continue  # Every plate below this child sorts before the cursor
+                stack.append((child, child_path))
+
+    # Binary search the sorted children of a node for the one whose label starts with the given
+    # character, as UTF-8 bytes. The whole character is compared: the first byte alone is shared by
+    # characters like "Ä" and "é". UTF-8 byte order is code point order, the order of the children.
+    def _find_child(self, index, char):
+        labels, label_start = self._labels, self._label_start
+        low, high = self._first_child[index], self._first_child[index + 1]
+        while low < high:
+            middle = (low + high) // 2
+            first = bytes(labels[label_start[middle]:label_start[middle] + len(char)])
+            if first < char:
+                low = middle + 1
+            elif first > char:
+                high = middle
+            else:
+                return middle
+        return None
+
+    # Find the node at or directly below the given prefix, together with the full path to it.
+    def _locate(self, prefix):
+        index = 0
+        i = 0
+        while i < len(prefix):
+            child = self._find_child(index, prefix[i:i + _utf8_length(prefix[i])])
+            if child is None:
+                return None
+            label = bytes(self._labels[self._label_start[child]:self._label_start[child + 1]])
+            if prefix.startswith(label, i):
+                index = child
+                i += len(label)
+            elif label.startswith(prefix[i:]):
+                # The prefix ends in the middle of this edge
+                return child, prefix[:i] + label
+            else:
+                return None
+        return index, prefix
+
+
+# Number of bytes of the UTF-8 character starting with the given lead byte
+def _utf8_length(lead_byte):
+    if lead_byte < 0x80:
+        return 1
+    return 2 if lead_byte < 0xE0 else 3 if lead_byte < 0xF0 else 4
+
+
+# Test suite for the frozen Trie snapshot
+def test_frozen_trie():
+    import os
+    import tempfile
+    from feature_data_structures.plate_lookup_registry import CompressedTrie
+
+    trie = CompressedTrie()
+    for plate in ["ABC123", "ABC456", "XYZ789", "DEF123", "ABX789", "A1BCD7", "A1B123", "ABC"]:
+        trie.insert(plate)
+
+    # Test Case 1: Freeze the Trie and search the image
+    print("\n-- Test Case 1: Freezing the Trie --")
+    frozen = trie.freeze()
+    print(f"Frozen {len(frozen)} plates into {frozen.nbytes()} bytes.")
+    print("License plates starting with 'AB':", frozen.search("AB"))
+    print("License plates starting with 'ABC':", frozen.search("ABC"))
+    print("License plates starting with 'NON':", frozen.search("NON"))
+    print("Is 'ABC' a plate:", "ABC" in frozen, "- Is 'AB' a plate:", "AB" in frozen)
+
+    # Test Case 2: Paging through the image
+    print("\n-- Test Case 2: Paging through the frozen Trie --")
+    print("First page of 'A' (limit 2):", frozen.search("A", limit=2))
+    print("Page after cursor 'ABC123' (limit 2):", frozen.search("A", limit=2, after="ABC123"))
+    print("Third page of 'A' (limit 2, offset 4):", frozen.search("A", limit=2, offset=4))
+    print("Number of plates starting with 'AB':", frozen.count("AB"))
+
+    # Test Case 3: Save the image and memory-map it back
+    print("\n-- Test Case 3: Saving and memory-mapping the image --")
+    path = os.path.join(tempfile.mkdtemp(), "plates.trie")
+    frozen.save(path)
+    with FrozenTrie.load(path) as mapped:
+        print("Memory-mapped search for 'A':", mapped.search("A"))
+    os.remove(path)
+
+    # Test Case 4: Non-ASCII plates whose first characters share a UTF-8 lead byte ("Ä", "é" and "Ö" are 0xC3 ...)
+    print("\n-- Test Case 4: Non-ASCII plates --")
+    trie = CompressedTrie()
+    plates = ["ÄB1", "ÄB2", "éA1", "ÖZ9", "€1", "AB€", "ABé", "ABÄ"]
+    for plate in plates:
+        trie.insert(plate)
+    frozen = trie.freeze()
+    print("License plates starting with 'é':", frozen.search("é"), "- with 'AB':", frozen.search("AB"))
+    print("Number of plates starting with 'Ä':", frozen.count("Ä"))
+    assert all(plate in frozen and frozen.search(plate[0]) == trie.search(plate[0]) for plate in plates), \
+        "Every plate should be found in the frozen image"
+
+
+# Running the test suite
+if __name__ == "__main__":
+    test_frozen_trie()
@@ -1,15 +1,72 @@
+import gc
+from itertools import islice
+
+# Plates listed with each owner by in_order, range, select and page. The rest of a fleet is paged
+# with find_vehicles_by_dl, so listing owners does not copy whole fleets.
+OWNER_RECORD_VEHICLES = 10
+
+
 class Node:
+    __slots__ = ("dl_numbers", "owner_name", "vehicles", "left", "right", "height", "size")  # No per-node __dict__
+
     def __init__(self, dl_numbers, owner_name, license_plate):
         self.dl_numbers = dl_numbers  # Driver's License Number (unique key)
         self.owner_name = owner_name
-        self.vehicles = [license_plate]  # Store a list of vehicles (license plates) under the owner
+        # License plates of the owner. A dict keeps them in insertion order like a list, but adds and
+        # removes in O(1) and ignores duplicates, which matters for fleets of thousands of vehicles.
+        self.vehicles = {license_plate: None}
         self.left = None
         self.right = None
         self.height = 1
+        self.size = 1  # Number of owners in the subtree rooted here, for rank and select
 
 class AVLTree:
-    def __init__(self):
+    def __init__(self, owner_table=None):
         self.root = None
+        # Optional OwnerTable shared with the registrations. With it the nodes keep no copy of the
+        # owner name, names are read from the table, so a rename there is seen here too.
+        self.owner_table = owner_table
+
+    # Build a perfectly balanced tree in O(n) from (dl_numbers, owner_name, license_plate) items sorted by
+    # dl_numbers. Consecutive items with the same dl_numbers are grouped under one owner.
+    @classmethod
+    def build_from_sorted(cls, items, owner_table=None):
+        # The nodes cannot form reference cycles, so pause the cyclic garbage collector
+        # instead of letting it rescan the growing list of nodes during the build
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            return cls._build_from_sorted(items, owner_table)
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+
+    @classmethod
+    def _build_from_sorted(cls, items, owner_table):
+        owners = []
+        for dl_numbers, owner_name, license_plate in items:
+            if owners and owners[-1].dl_numbers == dl_numbers:
+                owners[-1].vehicles[license_plate] = None
+                continue
+            if owners and dl_numbers < owners[-1].dl_numbers:
+                raise ValueError(f"Items are not sorted: {dl_numbers!r} comes after {owners[-1].dl_numbers!r}")
+            owners.append(Node(dl_numbers, None if owner_table is not None else owner_name, license_plate))
+
+        # The middle owner of every range becomes the root of that range, so the depth is only log n
+        def build(low, high):
+            if low >= high:
+                return None
+            middle = (low + high) // 2
+            node = owners[middle]
+            node.left = build(low, middle)
+            node.right = build(middle + 1, high)
+            node.height = max(node.left.height if node.left else 0, node.right.height if node.right else 0) + 1
+            node.size = (node.left.size if node.left else 0) + (node.right.size if node.right else 0) + 1
+            return node
+
+        tree = cls(owner_table)
+        tree.root = build(0, len(owners))
+        return tree
 
     # Get the height of a node
     def get_height(self, node):
@@ -30,9 +87,11 @@ class AVLTree:
         # Perform rotation
         x.right = y
         y.left = T2
-        # Update heights
-        y.height = max(self.get_height(y.left), self.get_height(y.right)) + 1
-        x.height = max(self.get_height(x.left), self.get_height(x.right)) + 1
+        # Update heights and sizes
+        y.height = max(T2.height if T2 else 0, y.right.height if y.right else 0) + 1
+        x.height = max(x.left.height if x.left else 0, y.height) + 1
+        y.size = (T2.size if T2 else 0) + (y.right.size if y.right else 0) + 1
+        x.size = (x.left.size if x.left else 0) + y.size + 1
         return x
 
     # Left rotate subtree rooted with x
@@ -42,132 +101,336 @@ class AVLTree:
         # Perform rotation
         y.left = x
         x.right = T2
-        # Update heights
-        x.height = max(self.get_height(x.left), self.get_height(x.right)) + 1
-        y.height = max(self.get_height(y.left), self.get_height(y.right)) + 1
+        # Update heights and sizes
+        x.height = max(x.left.height if x.left else 0, T2.height if T2 else 0) + 1
+        y.height = max(x.height, y.right.height if y.right else 0) + 1
+        x.size = (x.left.size if x.left else 0) + (T2.size if T2 else 0) + 1
+        y.size = x.size + (y.right.size if y.right else 0) + 1
         return y
 
     # Insert a vehicle into the AVL tree based on dl_numbers (driver’s license number)
     def insert(self, root, dl_numbers, owner_name, license_plate):
-        # Step 1: Perform normal BST insertion
+        # Step 1: Perform normal BST insertion, remembering the path from the root
+        if self.owner_table is not None:
+            owner_name = None  # The name is kept in the owner table
         if not root:
             return Node(dl_numbers, owner_name, license_plate)
 
-        if dl_numbers < root.dl_numbers:
-            root.left = self.insert(root.left, dl_numbers, owner_name, license_plate)
-        elif dl_numbers > root.dl_numbers:
-            root.right = self.insert(root.right, dl_numbers, owner_name, license_plate)
+        path = []
+        node = root
+        while node:
+            path.append(node)
+            if dl_numbers < node.dl_numbers:
+                node = node.left
+            elif dl_numbers > node.dl_numbers:
+                node = node.right
+            else:
+                # If the owner with the same dl_numbers already exists, add the vehicle to their set
+                node.vehicles[license_plate] = None
+                return root
+
+        new_node = Node(dl_numbers, owner_name, license_plate)
+        if dl_numbers < path[-1].dl_numbers:
+            path[-1].left = new_node
         else:
-            # If the owner with the same dl_numbers already exists, add the vehicle to their list
-            root.vehicles.append(license_plate)
-            return root
-
-        # Step 2: Update the height of the ancestor node
-        root.height = max(self.get_height(root.left), self.get_height(root.right)) + 1
-
-        # Step 3: Get the balance factor to check if this node became unbalanced
-        balance = self.get_balance(root)
-
-        # Step 4: If the node is unbalanced, then apply rotations
-
-        # Left Left Case
-        if balance > 1 and dl_numbers < root.left.dl_numbers:
-            return self.right_rotate(root)
-
-        # Right Right Case
-        if balance < -1 and dl_numbers > root.right.dl_numbers:
-            return self.left_rotate(root)
+            path[-1].right = new_node
 
-        # Left Right Case
-        if balance > 1 and dl_numbers > root.left.dl_numbers:
-            root.left = self.left_rotate(root.left)
-            return self.right_rotate(root)
-
-        # Right Left Case
-        if balance < -1 and dl_numbers < root.right.dl_numbers:
-            root.right = self.right_rotate(root.right)
-            return self.left_rotate(root)
-
-        # Return the (unchanged) node pointer
-        return root
+        # Step 2: Update heights and rebalance on the way back up
+        return self._rebalance_path(root, path)
 
     # Remove a license plate for a specific driver's license
     def remove(self, root, dl_number, license_plate):
-        if not root:
+        path = []
+        node = root
+        while node and node.dl_numbers != dl_number:
+            path.append(node)
+            node = node.left if dl_number < node.dl_numbers else node.right
+        if not node:
             return root
 
-        if dl_number < root.dl_numbers:
-            root.left = self.remove(root.left, dl_number, license_plate)
-        elif dl_number > root.dl_numbers:
-            root.right = self.remove(root.right, dl_number, license_plate)
-        else:
-            # If we found the driver's license node, remove the vehicle from the list
-            if license_plate in root.vehicles:
-                root.vehicles.remove(license_plate)
-
-            # If no vehicles remain, we delete the node
-            if not root.vehicles:
-                if not root.left:
-                    return root.right
-                elif not root.right:
-                    return root.left
-
-                # If the node has two children, get the inorder successor (smallest in the right subtree)
-                temp = self.get_min_value_node(root.right)
-                root.dl_numbers = temp.dl_numbers
-                root.vehicles = temp.vehicles
-                root.right = self.remove(root.right, temp.dl_numbers, license_plate)
-
-        # If the node had children, we need to update its height and balance the tree
-        if root is None:
+        # If we found the driver's license node, remove the vehicle from the set
+        node.vehicles.pop(license_plate, None)
+        if node.vehicles:
             return root
 
-        root.height = max(self.get_height(root.left), self.get_height(root.right)) + 1
-
-        balance = self.get_balance(root)
-
-        # Balancing
-        if balance > 1 and self.get_balance(root.left) >= 0:
-            return self.right_rotate(root)
-
-        if balance < -1 and self.get_balance(root.right) <= 0:
-            return self.left_rotate(root)
-
-        if balance > 1 and self.get_balance(root.left) < 0:
-            root.left = self.left_rotate(root.left)
-            return self.right_rotate(root)
-
-        if balance < -1 and self.get_balance(root.right) > 0:
-            root.right = self.right_rotate(root.right)
-            return self.left_rotate(root)
+        # If no vehicles remain, we delete the node
+        if node.left and node.right:
+            # If the node has two children, move the inorder successor (smallest in the right subtree)
+            # into it and unlink the successor instead
+            path.append(node)
+            successor = node.right
+            while successor.left:
+                path.append(successor)
+                successor = successor.left
+            node.dl_numbers = successor.dl_numbers
+            node.owner_name = successor.owner_name
+            node.vehicles = successor.vehicles
+            node, replacement = successor, successor.right
+        else:
+            replacement = node.left or node.right
 
+        if not path:
+            return replacement
+        parent = path[-1]
+        if parent.left is node:
+            parent.left = replacement
+        else:
+            parent.right = replacement
+
+        # Update heights and rebalance from the parent of the unlinked node up to the root
+        return self._rebalance_path(root, path)
+
+    # Walk a root-to-node path bottom up, fixing heights and sizes and rotating unbalanced nodes.
+    # Once a node keeps its height nothing above it needs rebalancing, and only the sizes of the
+    # remaining ancestors are updated. Returns the new root.
+    def _rebalance_path(self, root, path):
+        for i in range(len(path) - 1, -1, -1):
+            node = path[i]
+            left, right = node.left, node.right
+            node.size = (left.size if left else 0) + (right.size if right else 0) + 1
+            left_height = left.height if left else 0
+            right_height = right.height if right else 0
+            balance = left_height - right_height
+
+            if balance > 1:
+                if (left.left.height if left.left else 0) < (left.right.height if left.right else 0):
+                    node.left = self.left_rotate(left)  # Left Right Case
+                subtree = self.right_rotate(node)  # Left Left Case
+            elif balance < -1:
+                if (right.right.height if right.right else 0) < (right.left.height if right.left else 0):
+                    node.right = self.right_rotate(right)  # Right Left Case
+                subtree = self.left_rotate(node)  # Right Right Case
+            else:
+                height = max(left_height, right_height) + 1
+                if height == node.height:
+                    for ancestor in reversed(path[:i]):
+                        ancestor.size = ((ancestor.left.size if ancestor.left else 0)
+                                         + (ancestor.right.size if ancestor.right else 0) + 1)
+                    return root
+                node.height = height
+                continue
+
+            # Hang the rotated subtree back under the parent
+            if i == 0:
+                root = subtree
+            elif path[i - 1].left is node:
+                path[i - 1].left = subtree
+            else:
+                path[i - 1].right = subtree
         return root
 
     # Utility function to get the node with the smallest value in a subtree
     def get_min_value_node(self, node):
-        if node is None or node.left is None:
-            return node
-        return self.get_min_value_node(node.left)
-
-    # Find vehicles by driver's license number
-    def find_vehicles_by_dl(self, root, dl_numbers):
-        if not root:
+        while node is not None and node.left is not None:
+            node = node.left
+        return node
+
+    # Find the node of a driver's license number, or None
+    def _find_node(self, root, dl_numbers):
+        node = root
+        while node:
+            if dl_numbers < node.dl_numbers:
+                node = node.left
+            elif dl_numbers > node.dl_numbers:
+                node = node.right
+            else:
+                return node
+        return None
+
+    # Find vehicles by driver's license number. For fleet owners, limit and offset return one page of
+    # the plates; 'vehicle_count' is always the size of the whole fleet.
+    def find_vehicles_by_dl(self, root, dl_numbers, limit=None, offset=0):
+        node = self._find_node(root, dl_numbers)
+        if not node:
             return None
-
-        if dl_numbers < root.dl_numbers:
-            return self.find_vehicles_by_dl(root.left, dl_numbers)
-        elif dl_numbers > root.dl_numbers:
-            return self.find_vehicles_by_dl(root.right, dl_numbers)
+        return {'owner_name': self._owner_name(node), 'vehicles': self._vehicle_page(node, limit, offset),
+                'vehicle_count': len(node.vehicles)}
+
+    # Number of vehicles registered to a driver's license number, in O(log n)
+    def count_vehicles(self, root, dl_numbers):
+        node = self._find_node(root, dl_numbers)
+        return len(node.vehicles) if node else 0
+
+    # Lazily iterate over the license plates of one owner, in the order they were registered
+    def iter_vehicles(self, root, dl_numbers, offset=0):
+        node = self._find_node(root, dl_numbers)
+        if node:
+            yield from islice(node.vehicles, offset, None)
+
+    def _owner_name(self, node):
+        if self.owner_table is None:
+            return node.owner_name
+        return self.owner_table.full_name(node.dl_numbers)
+
+    def _vehicle_page(self, node, limit=None, offset=0):
+        return list(islice(node.vehicles, offset, None if limit is None else offset + limit))
+
+    def _owner_record(self, node):
+        return {'dl_numbers': node.dl_numbers, 'owner_name': self._owner_name(node),
+                'vehicles': self._vehicle_page(node, OWNER_RECORD_VEHICLES), 'vehicle_count': len(node.vehicles)}
+
+    # Iterate over the owners in driver's license order, starting at the first one >= start
+    # (or at the smallest one). Yields dicts with 'dl_numbers', 'owner_name', 'vehicles' (the first
+    # OWNER_RECORD_VEHICLES plates) and 'vehicle_count'.
+    def in_order(self, root, start=None):
+        stack = []
+        node = root
+        # Keep only the ancestors that come after start, the left spine of the path
+        while node:
+            if start is None or node.dl_numbers >= start:
+                stack.append(node)
+                node = node.left
+            else:
+                node = node.right
+        while stack:
+            node = stack.pop()
+            yield self._owner_record(node)
+            node = node.right
+            while node:
+                stack.append(node)
+                node = node.left
+
+    # Owners with lo <= dl_numbers <= hi, in driver's license order (None leaves a side open)
+    def range(self, root, lo=None, hi=None):
+        result = []
+        for owner in self.in_order(root, lo):
+            if hi is not None and owner['dl_numbers'] > hi:
+                break
+            result.append(owner)
+        return result
+
+    # Number of owners whose driver's license number is smaller than dl_numbers, in O(log n)
+    def rank(self, root, dl_numbers):
+        rank = 0
+        node = root
+        while node:
+            if dl_numbers <= node.dl_numbers:
+                node = node.left
+            else:
+                rank += (node.left.size if node.left else 0) + 1
+                node = node.right
+        return rank
+
+    # The owner at position index (0 based) in driver's license order, or None, in O(log n)
+    def select(self, root, index):
+        if index < 0 or index >= (root.size if root else 0):
+            return None
+        node = root
+        while True:
+            left_size = node.left.size if node.left else 0
+            if index < left_size:
+                node = node.left
+            elif index > left_size:
+                index -= left_size + 1
+                node = node.right
+            else:
+                return self._owner_record(node)
+
+    # Number of owners with lo <= dl_numbers <= hi, in O(log n) without visiting them
+    # (None leaves a side open)
+    def count_between(self, root, lo=None, hi=None):
+        if hi is None:
+            high_rank = root.size if root else 0
+        else:
+            high_rank = self.rank(root, hi) + (1 if self._find_node(root, hi) else 0)
+        low_rank = 0 if lo is None else self.rank(root, lo)
+        return max(high_rank - low_rank, 0)
+
+    # One page of owners in driver's license order. Continue after a license number (the last one of
+    # the previous page) or jump straight to a position with offset.
+    def page(self, root, limit, after=None, offset=0):
+        if after is None:
+            first = self.select(root, offset)
+            if first is None:
+                return []
+            owners = self.in_order(root, first['dl_numbers'])
         else:
-            return {'owner_name': root.owner_name, 'vehicles': root.vehicles}
+            owners = (owner for owner in self.in_order(root, after) if owner['dl_numbers'] != after)
+        return list(islice(owners, limit))
 
     # Utility function to print the tree (for debugging)
     def pre_order(self, root):
-        if not root:
-            return
-        print(f"DL Number: {root.dl_numbers}, Owner: {root.owner_name}, Vehicles: {root.vehicles}")
-        self.pre_order(root.left)
-        self.pre_order(root.right)
+        stack = [root] if root else []
+        while stack:
+            node = stack.pop()
+            print(f"DL Number: {node.dl_numbers}, Owner: {self._owner_name(node)}, Vehicles: {list(node.vehicles)}")
+            if node.right:
+                stack.append(node.right)
+            if node.left:
+                stack.append(node.left)
+
+class CopyOnWriteAVLTree(AVLTree):
+    """
+    AVLTree whose published versions are never changed, for readers on other threads.
+
+    snapshot() returns the current root, which readers pass to the usual query methods. Later
+    inserts and removes copy the nodes on the search path (and the nodes a rotation moves) instead
+    of changing them, so an old root keeps describing the owners it was published with. The
+    vehicles of an owner are copied before they change. Nodes and vehicle sets copied since the last
+    snapshot belong to no published version and are changed in place.
+
+    Use it without an owner table, so the owner names are versioned with the nodes too.
+    """
+
+    def __init__(self, owner_table=None):
+        super().__init__(owner_table)
+        self.fresh = set()  # Nodes created since the last snapshot, safe to change in place
+        self.fresh_vehicles = {}  # id -> vehicles dict created since the last snapshot
+
+    def snapshot(self):
+        self.fresh = set()  # Everything reachable from the root is published now
+        self.fresh_vehicles = {}
+        return self.root
+
+    def insert(self, root, dl_numbers, owner_name, license_plate):
+        return super().insert(self._copy_path(root, dl_numbers), dl_numbers, owner_name, license_plate)
+
+    def remove(self, root, dl_number, license_plate):
+        return super().remove(self._copy_path(root, dl_number, removing=True), dl_number, license_plate)
+
+    def right_rotate(self, y):
+        y = self._own(y)
+        y.left = self._own(y.left)
+        return super().right_rotate(y)
+
+    def left_rotate(self, x):
+        x = self._own(x)
+        x.right = self._own(x.right)
+        return super().left_rotate(x)
+
+    # Copy a node unless it was created since the last snapshot. The copy shares the vehicles dict.
+    def _own(self, node):
+        if node is None or node in self.fresh:
+            return node
+        copy = Node.__new__(Node)
+        copy.dl_numbers, copy.owner_name, copy.vehicles = node.dl_numbers, node.owner_name, node.vehicles
+        copy.left, copy.right, copy.height, copy.size = node.left, node.right, node.height, node.size
+        self.fresh.add(copy)
+        return copy
+
+    def _own_vehicles(self, node):
+        if id(node.vehicles) not in self.fresh_vehicles:
+            node.vehicles = dict(node.vehicles)
+            self.fresh_vehicles[id(node.vehicles)] = node.vehicles  # Kept alive, so the id stays unique
+
+    # Copy the nodes an insert or remove of the key can change and return the new root. A remove can
+    # also unlink the in-order successor of the key, so that path is copied too.
+    def _copy_path(self, root, dl_numbers, removing=False):
+        root = node = self._own(root)
+        while node:
+            if dl_numbers < node.dl_numbers:
+                node.left = node = self._own(node.left)
+            elif dl_numbers > node.dl_numbers:
+                node.right = node = self._own(node.right)
+            else:
+                self._own_vehicles(node)
+                if removing and node.left and node.right:
+                    node.right = successor = self._own(node.right)
+                    while successor.left:
+                        successor.left = successor = self._own(successor.left)
+                break
+        return root
+
 
 def testcases_avl_tree():
     # Initialize the AVL tree
@@ -209,6 +472,71 @@ def testcases_avl_tree():
     empty_tree_root = avl_tree.insert(empty_tree_root, "DL11111", "Eve", "LMN345")
     avl_tree.pre_order(empty_tree_root)  # Should only show Eve's data
 
+    # Test Case 7: Build a balanced tree from owners sorted by driver's license number
+    print("\n-- Test Case 7: Building a tree from sorted owners --")
+    sorted_tree = AVLTree.build_from_sorted([
+        ("DL10000", "Dan", "AAA111"),
+        ("DL20000", "Fay", "BBB222"),
+        ("DL20000", "Fay", "CCC333"),  # Second vehicle of the same owner
+        ("DL30000", "Gus", "DDD444"),
+        ("DL40000", "Hal", "EEE555"),
+    ])
+    sorted_tree.pre_order(sorted_tree.root)
+    print("Vehicles for DL20000 (Fay):", sorted_tree.find_vehicles_by_dl(sorted_tree.root, "DL20000"))
+    print("Height of the tree:", sorted_tree.get_height(sorted_tree.root))
+
+    # Test Case 8: Compare one-by-one inserts with the sorted build
+    print("\n-- Test Case 8: Loading 100000 owners --")
+    import random
+    import time
+    owners = [(f"DL{i:08d}", "Owner", f"P{i:06d}") for i in range(100000)]
+    shuffled_owners = owners[:]
+    random.shuffle(shuffled_owners)
+    start_time = time.time()
+    insert_tree = AVLTree()
+    for dl_numbers, owner_name, license_plate in shuffled_owners:
+        insert_tree.root = insert_tree.insert(insert_tree.root, dl_numbers, owner_name, license_plate)
+    print(f"Time to insert 100000 owners one by one: {time.time() - start_time:.2f} seconds")
+    start_time = time.time()
+    sorted_tree = AVLTree.build_from_sorted(owners)
+    print(f"Time to build the tree from 100000 sorted owners: {time.time() - start_time:.2f} seconds")
+
+    # Test Case 9: Ordered scans, paging and rank/select by driver's license number
+    print("\n-- Test Case 9: Range queries and order statistics --")
+    print("Owners from DL00000010 to DL00000012:",
+          [owner['dl_numbers'] for owner in sorted_tree.range(sorted_tree.root, "DL00000010", "DL00000012")])
+    print("Rank of DL00050000:", sorted_tree.rank(sorted_tree.root, "DL00050000"))
+    print("Owner at position 42:", sorted_tree.select(sorted_tree.root, 42)['dl_numbers'])
+    print("Owners between DL00001000 and DL00001999:",
+          sorted_tree.count_between(sorted_tree.root, "DL00001000", "DL00001999"))
+    first_page = sorted_tree.page(sorted_tree.root, 3, offset=99998)
+    print("Page at offset 99998:", [owner['dl_numbers'] for owner in first_page])
+    print("Page after DL00000005:", [owner['dl_numbers'] for owner in sorted_tree.page(sorted_tree.root, 3, after="DL00000005")])
+
+    # Test Case 10: A fleet owner with many vehicles
+    print("\n-- Test Case 10: Fleet owner with 50000 vehicles --")
+    fleet_tree = AVLTree()
+    start_time = time.time()
+    for i in range(50000):
+        fleet_tree.root = fleet_tree.insert(fleet_tree.root, "DL77777", "Rental Co", f"F{i:06d}")
+    fleet_tree.root = fleet_tree.insert(fleet_tree.root, "DL77777", "Rental Co", "F000000")  # Duplicate plate
+    print("Vehicles for DL77777:", fleet_tree.count_vehicles(fleet_tree.root, "DL77777"))
+    for i in range(0, 50000, 2):
+        fleet_tree.root = fleet_tree.remove(fleet_tree.root, "DL77777", f"F{i:06d}")
+    print(f"Time to add 50000 and remove 25000 fleet vehicles: {time.time() - start_time:.2f} seconds")
+    print("Second page of DL77777 (3 per page):",
+          fleet_tree.find_vehicles_by_dl(fleet_tree.root, "DL77777", limit=3, offset=3))
+
+    # Test Case 11: Owner names read from a shared owner table
+    print("\n-- Test Case 11: Sharing owner names with an owner table --")
+    from feature_data_structures.owner_table import OwnerTable
+    owner_table = OwnerTable()
+    owner_table.acquire("Ivy", "Chen", "DL88888")
+    shared_tree = AVLTree(owner_table)
+    shared_tree.root = shared_tree.insert(shared_tree.root, "DL88888", "Ivy Chen", "IVY001")
+    owner_table.rename("DL88888", "Ivy", "Park")
+    print("Vehicles for DL88888 after the rename:", shared_tree.find_vehicles_by_dl(shared_tree.root, "DL88888"))
+
 # Running the test suite
 if __name__ == "__main__":
     testcases_avl_tree()
\ No newline at end of file
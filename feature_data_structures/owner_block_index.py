@@ -0,0 +1,325 @@
+import gc
+from bisect import bisect_left, bisect_right
+from itertools import islice
+
+from feature_data_structures.owner_based_car_registration import OWNER_RECORD_VEHICLES
+
+# Number of owners a block is filled with. Blocks are split when they grow to twice this size
+# and merged with a neighbour when they shrink below half of it.
+BLOCK_SIZE = 512
+
+
+class OwnerRecord:
+    __slots__ = ("owner_name", "vehicles")  # No per-record __dict__
+
+    def __init__(self, owner_name, license_plate):
+        self.owner_name = owner_name
+        self.vehicles = {license_plate: None}  # Ordered set of license plates, like Node.vehicles
+
+
+class OwnerBlocks:
+    """
+    Owners sorted by driver's license number, cut into blocks of a few hundred entries.
+
+    Each block is a pair of parallel Python lists (license numbers and their records), so a lookup
+    is two C-level binary searches (bisect on the block maxima, then inside one block) instead of a
+    pointer chase through log n tree nodes, and an insert only shifts the pointers of one block.
+    """
+    __slots__ = ("maxes", "keys", "records", "offsets", "size")
+
+    def __init__(self):
+        self.maxes = []  # Largest driver's license number of every block
+        self.keys = []  # Blocks of sorted driver's license numbers
+        self.records = []  # Blocks of OwnerRecords, parallel to keys
+        self.offsets = None  # Number of owners before every block, rebuilt lazily for rank and select
+        self.size = 0
+
+
+class BlockedOwnerIndex:
+    """
+    Owner index with the same interface as AVLTree, backed by OwnerBlocks instead of a balanced tree.
+
+    Like AVLTree, the methods take the root (here an OwnerBlocks) and insert and remove return it,
+    so the two backends are interchangeable in main.py.
+    """
+
+    def __init__(self, owner_table=None):
+        self.root = None
+        # Optional OwnerTable shared with the registrations, names are then read from it (see AVLTree)
+        self.owner_table = owner_table
+
+    # Build the index in O(n) from (dl_numbers, owner_name, license_plate) items sorted by dl_numbers.
+    # Consecutive items with the same dl_numbers are grouped under one owner.
+    @classmethod
+    def build_from_sorted(cls, items, owner_table=None):
+        # The records cannot form reference cycles, so pause the cyclic garbage collector
+        # instead of letting it rescan the growing lists during the build
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            return cls._build_from_sorted(items, owner_table)
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+
+    @classmethod
+    def _build_from_sorted(cls, items, owner_table):
+        keys = []
+        records = []
+        for dl_numbers, owner_name, license_plate in items:
+            if keys and keys[-1] == dl_numbers:
+                records[-1].vehicles[license_plate] = None
+                continue
+            if keys and dl_numbers < keys[-1]:
+                raise ValueError(f"Items are not sorted: {dl_numbers!r} comes after {keys[-1]!r}")
+            keys.append(dl_numbers)
+            records.append(OwnerRecord(None if owner_table is not None else owner_name, license_plate))
+
+        index = cls(owner_table)
+        if keys:
+            blocks = index.root = OwnerBlocks()
+            for start in range(0, len(keys), BLOCK_SIZE):
+                blocks.keys.append(keys[start:start + BLOCK_SIZE])
+                blocks.records.append(records[start:start + BLOCK_SIZE])
+                blocks.maxes.append(blocks.keys[-1][-1])
+            blocks.size = len(keys)
+        return index
+
+    # Insert a vehicle for the owner with the given driver's license number
+    def insert(self, root, dl_numbers, owner_name, license_plate):
+        if self.owner_table is not None:
+            owner_name = None  # The name is kept in the owner table
+        if root is None:
+            root = OwnerBlocks()
+        if not root.maxes:
+            root.keys.append([dl_numbers])
+            root.records.append([OwnerRecord(owner_name, license_plate)])
+            root.maxes.append(dl_numbers)
+            root.size = 1
+            root.offsets = None
+            return root
+
+        # Past the largest license number the owner goes to the end of the last block
+        i = min(bisect_left(root.maxes, dl_numbers), len(root.maxes) - 1)
+        keys = root.keys[i]
+        j = bisect_left(keys, dl_numbers)
+        if j < len(keys) and keys[j] == dl_numbers:
+            # If the owner already exists, add the vehicle to their set
+            root.records[i][j].vehicles[license_plate] = None
+            return root
+
+        keys.insert(j, dl_numbers)
+        root.records[i].insert(j, OwnerRecord(owner_name, license_plate))
+        root.maxes[i] = keys[-1]
+        root.size += 1
+        root.offsets = None
+        if len(keys) >= 2 * BLOCK_SIZE:
+            self._split(root, i)
+        return root
+
+    # Remove a license plate for a specific driver's license; the owner goes away with their last vehicle
+    def remove(self, root, dl_numbers, license_plate):
+        located = self._locate(root, dl_numbers)
+        if located is None:
+            return root
+        i, j = located
+        vehicles = root.records[i][j].vehicles
+        vehicles.pop(license_plate, None)
+        if vehicles:
+            return root
+
+        keys = root.keys[i]
+        del keys[j]
+        del root.records[i][j]
+        root.size -= 1
+        root.offsets = None
+        if not keys:
+            del root.keys[i], root.records[i], root.maxes[i]
+        else:
+            root.maxes[i] = keys[-1]
+            if len(keys) < BLOCK_SIZE // 2 and len(root.keys) > 1:
+                self._merge(root, i)
+        return root
+
+    # Cut block i in two halves
+    def _split(self, root, i):
+        keys, records = root.keys[i], root.records[i]
+        root.keys.insert(i + 1, keys[BLOCK_SIZE:])
+        root.records.insert(i + 1, records[BLOCK_SIZE:])
+        del keys[BLOCK_SIZE:], records[BLOCK_SIZE:]
+        root.maxes.insert(i, keys[-1])
+
+    # Join block i with its right neighbour (or the left one for the last block), splitting again if too big
+    def _merge(self, root, i):
+        if i == len(root.keys) - 1:
+            i -= 1
+        root.keys[i] += root.keys[i + 1]
+        root.records[i] += root.records[i + 1]
+        root.maxes[i] = root.maxes[i + 1]
+        del root.keys[i + 1], root.records[i + 1], root.maxes[i + 1]
+        if len(root.keys[i]) >= 2 * BLOCK_SIZE:
+            self._split(root, i)
+
+    # Find the (block, position) of a driver's license number, or None
+    def _locate(self, root, dl_numbers):
+        if root is None:
+            return None
+        i = bisect_left(root.maxes, dl_numbers)
+        if i == len(root.maxes):
+            return None
+        keys = root.keys[i]
+        j = bisect_left(keys, dl_numbers)
+        if keys[j] != dl_numbers:
+            return None
+        return i, j
+
+    # Number of owners before every block, recomputed after the blocks changed
+    def _offsets(self, root):
+        if root.offsets is None:
+            offsets = []
+            total = 0
+            for keys in root.keys:
+                offsets.append(total)
+                total += len(keys)
+            root.offsets = offsets
+        return root.offsets
+
+    def _owner_name(self, dl_numbers, record):
+        if self.owner_table is None:
+            return record.owner_name
+        return self.owner_table.full_name(dl_numbers)
+
+    # Find vehicles by driver's license number, with the same paging as AVLTree.find_vehicles_by_dl
+    def find_vehicles_by_dl(self, root, dl_numbers, limit=None, offset=0):
+        located = self._locate(root, dl_numbers)
+        if located is None:
+            return None
+        record = root.records[located[0]][located[1]]
+        return {'owner_name': self._owner_name(dl_numbers, record),
+                'vehicles': list(islice(record.vehicles, offset, None if limit is None else offset + limit)),
+                'vehicle_count': len(record.vehicles)}
+
+    # Number of vehicles registered to a driver's license number
+    def count_vehicles(self, root, dl_numbers):
+        located = self._locate(root, dl_numbers)
+        return 0 if located is None else len(root.records[located[0]][located[1]].vehicles)
+
+    # Lazily iterate over the license plates of one owner, in the order they were registered
+    def iter_vehicles(self, root, dl_numbers, offset=0):
+        located = self._locate(root, dl_numbers)
+        if located is not None:
+            yield from islice(root.records[located[0]][located[1]].vehicles, offset, None)
+
+    # Iterate over the owners in driver's license order, starting at the first one >= start. Like
+    # AVLTree.in_order, only the first OWNER_RECORD_VEHICLES plates of each owner are listed.
+    def in_order(self, root, start=None):
+        if root is None:
+            return
+        i = 0 if start is None else bisect_left(root.maxes, start)
+        j = 0 if start is None or i == len(root.maxes) else bisect_left(root.keys[i], start)
+        while i < len(root.keys):
+            keys, records = root.keys[i], root.records[i]
+            for k in range(j, len(keys)):
+                record = records[k]
+                yield {'dl_numbers': keys[k], 'owner_name': self._owner_name(keys[k], record),
+                       'vehicles': list(islice(record.vehicles, OWNER_RECORD_VEHICLES)), 'vehicle_count': len(record.vehicles)}
+            i += 1
+            j = 0
+
+    # Owners with lo <= dl_numbers <= hi, in driver's license order (None leaves a side open)
+    def range(self, root, lo=None, hi=None):
+        return list(islice(self.in_order(root, lo), self.count_between(root, lo, hi)))
+
+    # Number of owners whose driver's license number is smaller than dl_numbers
+    def rank(self, root, dl_numbers):
+        if root is None:
+            return 0
+        i = bisect_left(root.maxes, dl_numbers)
+        if i == len(root.maxes):
+            return root.size
+        return self._offsets(root)[i] + bisect_left(root.keys[i], dl_numbers)
+
+    # The owner at position index (0 based) in driver's license order, or None
+    def select(self, root, index):
+        if root is None or index < 0 or index >= root.size:
+            return None
+        offsets = self._offsets(root)
+        i = bisect_right(offsets, index) - 1
+        return next(self.in_order(root, root.keys[i][index - offsets[i]]))
+
+    # Number of owners with lo <= dl_numbers <= hi (None leaves a side open)
+    def count_between(self, root, lo=None, hi=None):
+        if root is None:
+            return 0
+        if hi is None:
+            high_rank = root.size
+        else:
+            i = bisect_right(root.maxes, hi)
+            high_rank = root.size if i == len(root.maxes) else self._offsets(root)[i] + bisect_right(root.keys[i], hi)
+        low_rank = 0 if lo is None else self.rank(root, lo)
+        return max(high_rank - low_rank, 0)
+
+    # One page of owners in driver's license order, continuing after a license number or from an offset
+    def page(self, root, limit, after=None, offset=0):
+        if after is None:
+            first = self.select(root, offset)
+            if first is None:
+                return []
+            owners = self.in_order(root, first['dl_numbers'])
+        else:
+            owners = (owner for owner in self.in_order(root, after) if owner['dl_numbers'] != after)
+        return list(islice(owners, limit))
+
+    # Utility function to print the owners in driver's license order (for debugging)
+    def pre_order(self, root):
+        for owner in self.in_order(root):
+            print(f"DL Number: {owner['dl_numbers']}, Owner: {owner['owner_name']}, Vehicles: {owner['vehicles']}")
+
+
+def testcases_blocked_owner_index():
+    owner_index = BlockedOwnerIndex()
+    root = None
+
+    # Test Case 1: Insert vehicles for different owners, twice for the same owner
+    print("\n-- Test Case 1: Inserting vehicles for multiple owners --")
+    root = owner_index.insert(root, "DL12345", "Alice", "ABC123")
+    root = owner_index.insert(root, "DL67890", "Bob", "XYZ789")
+    root = owner_index.insert(root, "DL54321", "Charlie", "GHI012")
+    root = owner_index.insert(root, "DL12345", "Alice", "DEF456")
+    owner_index.pre_order(root)
+
+    # Test Case 2: Search and remove
+    print("\n-- Test Case 2: Searching and removing by driver's license number --")
+    print("Vehicles for DL12345 (Alice):", owner_index.find_vehicles_by_dl(root, "DL12345"))
+    print("Vehicles for DL99999 (non-existent):", owner_index.find_vehicles_by_dl(root, "DL99999"))
+    root = owner_index.remove(root, "DL54321", "GHI012")
+    owner_index.pre_order(root)
+
+    # Test Case 3: Enough owners to split and merge blocks
+    print(f"\n-- Test Case 3: Splitting and merging blocks of {BLOCK_SIZE} owners --")
+    import random
+    dl_numbers = [f"DL{i:08d}" for i in range(10 * BLOCK_SIZE)]
+    random.shuffle(dl_numbers)
+    for dl in dl_numbers:
+        root = owner_index.insert(root, dl, "Owner", "P" + dl)
+    print("Blocks after inserts:", len(root.keys), "- Owners:", root.size)
+    for dl in dl_numbers[:9 * BLOCK_SIZE]:
+        root = owner_index.remove(root, dl, "P" + dl)
+    print("Blocks after removals:", len(root.keys), "- Owners:", root.size)
+
+    # Test Case 4: Ordered scans and rank/select
+    print("\n-- Test Case 4: Range queries and order statistics --")
+    sorted_index = BlockedOwnerIndex.build_from_sorted((f"DL{i:08d}", "Owner", f"P{i:06d}") for i in range(100000))
+    print("Owners from DL00000010 to DL00000012:",
+          [owner['dl_numbers'] for owner in sorted_index.range(sorted_index.root, "DL00000010", "DL00000012")])
+    print("Rank of DL00050000:", sorted_index.rank(sorted_index.root, "DL00050000"))
+    print("Owner at position 42:", sorted_index.select(sorted_index.root, 42)['dl_numbers'])
+    print("Owners between DL00001000 and DL00001999:",
+          sorted_index.count_between(sorted_index.root, "DL00001000", "DL00001999"))
+    print("Page after DL00000005:",
+          [owner['dl_numbers'] for owner in sorted_index.page(sorted_index.root, 3, after="DL00000005")])
+
+
+# Running the test suite
+if __name__ == "__main__":
+    testcases_blocked_owner_index()
@@ -0,0 +1,170 @@
+import sys
+from array import array
+
+OWNER_FIELDS = ("first_name", "last_name", "license_number")
+
+
+class OwnerTable:
+    """
+    Normalized table of vehicle owners keyed by driver's license number.
+
+    Every owner is stored once under an integer owner id, however many vehicles they register, so
+    registrations only keep the id and an owner rename is a single write seen by every registration
+    and by the owner index. Names are interned, so owners with the same first or last name share one
+    string. An owner is dropped, and their id reused, once their last registration is released.
+    """
+
+    def __init__(self):
+        self.ids = {}  # license number -> owner id
+        self.first_names = []  # owner id -> first name
+        self.last_names = []  # owner id -> last name
+        self.license_numbers = []  # owner id -> license number, None for a free id
+        self.registration_counts = array("I")  # owner id -> number of registrations pointing at the owner
+        self.free_ids = []
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, license_number):
+        return license_number in self.ids
+
+    # Owner id of a license number, or None
+    def find(self, license_number):
+        return self.ids.get(license_number)
+
+    def acquire(self, first_name, last_name, license_number):
+        """
+        Return the owner id for a new registration, adding the owner if needed. The names given with
+        the latest registration replace the stored ones.
+        """
+        first_name, last_name = sys.intern(first_name), sys.intern(last_name)
+        owner_id = self.ids.get(license_number)
+        if owner_id is not None:
+            self.first_names[owner_id] = first_name
+            self.last_names[owner_id] = last_name
+            self.registration_counts[owner_id] += 1
+            return owner_id
+
+        if self.free_ids:
+            owner_id = self.free_ids.pop()
+            self.first_names[owner_id] = first_name
+            self.last_names[owner_id] = last_name
+            self.license_numbers[owner_id] = license_number
+            self.registration_counts[owner_id] = 1
+        else:
+            owner_id = len(self.license_numbers)
+            self.first_names.append(first_name)
+            self.last_names.append(last_name)
+            self.license_numbers.append(license_number)
+            self.registration_counts.append(1)
+        self.ids[license_number] = owner_id
+        return owner_id
+
+    # Drop one registration of an owner, removing the owner with their last one
+    def release(self, owner_id):
+        self.registration_counts[owner_id] -= 1
+        if self.registration_counts[owner_id] == 0:
+            del self.ids[self.license_numbers[owner_id]]
+            self.first_names[owner_id] = self.last_names[owner_id] = self.license_numbers[owner_id] = None
+            self.free_ids.append(owner_id)
+
+    def reassign(self, owner_id, license_number):
+        """
+        Move one registration of owner_id to the owner with license_number and return that owner's id.
+        An existing owner keeps their name; a new one is added with the name of owner_id.
+        """
+        new_id = self.ids.get(license_number)
+        if new_id == owner_id:
+            return owner_id
+        if new_id is None:
+            new_id = self.acquire(self.first_names[owner_id], self.last_names[owner_id], license_number)
+        else:
+            self.registration_counts[new_id] += 1
+        self.release(owner_id)
+        return new_id
+
+    def get(self, owner_id, field):
+        if field == "first_name":
+            return self.first_names[owner_id]
+        if field == "last_name":
+            return self.last_names[owner_id]
+        if field == "license_number":
+            return self.license_numbers[owner_id]
+        raise KeyError(field)
+
+    def set(self, owner_id, field, value):
+        """
+        Change one field of an owner, for all their registrations. Changing the license number fails
+        with ValueError if another owner already has the new number (see reassign to move a single
+        registration instead).
+        """
+        if field == "first_name":
+            self.first_names[owner_id] = sys.intern(value)
+        elif field == "last_name":
+            self.last_names[owner_id] = sys.intern(value)
+        elif field == "license_number":
+            other = self.ids.get(value)
+            if other is not None and other != owner_id:
+                raise ValueError(f"License number {value} already belongs to another owner")
+            del self.ids[self.license_numbers[owner_id]]
+            self.ids[value] = owner_id
+            self.license_numbers[owner_id] = value
+        else:
+            raise KeyError(field)
+
+    # Rename the owner with the given license number. Returns False if there is no such owner.
+    def rename(self, license_number, first_name, last_name):
+        owner_id = self.ids.get(license_number)
+        if owner_id is None:
+            return False
+        self.set(owner_id, "first_name", first_name)
+        self.set(owner_id, "last_name", last_name)
+        return True
+
+    # "First Last" name of the owner with the given license number, or None
+    def full_name(self, license_number):
+        owner_id = self.ids.get(license_number)
+        if owner_id is None:
+            return None
+        return f"{self.first_names[owner_id]} {self.last_names[owner_id]}"
+
+
+# Test suite for the owner table
+def test_owner_table():
+    owners = OwnerTable()
+
+    # Test Case 1: Registrations of the same owner share one entry
+    print("\n-- Test Case 1: Acquiring owners --")
+    first = owners.acquire("John", "Doe", "DL12345")
+    second = owners.acquire("John", "Doe", "DL12345")
+    other = owners.acquire("Jane", "Doe", "DL67890")
+    print("Owner ids:", first, second, other, "- Owners stored:", len(owners))
+    print("Is the last name shared:", owners.get(first, "last_name") is owners.get(other, "last_name"))
+
+    # Test Case 2: A rename is one write
+    print("\n-- Test Case 2: Renaming an owner --")
+    owners.rename("DL12345", "Johnny", "Doe")
+    print("Name of DL12345:", owners.full_name("DL12345"))
+    print("Renaming a non-existent owner:", owners.rename("DL99999", "No", "One"))
+
+    # Test Case 3: Releasing registrations
+    print("\n-- Test Case 3: Releasing registrations --")
+    owners.release(first)
+    print("DL12345 after releasing one of two registrations:", "DL12345" in owners)
+    owners.release(second)
+    print("DL12345 after releasing both registrations:", "DL12345" in owners)
+    print("Id reused for a new owner:", owners.acquire("Ann", "Lee", "DL24680") == first)
+
+    # Test Case 4: Moving one registration to another license number
+    print("\n-- Test Case 4: Reassigning a registration --")
+    ann = owners.acquire("Ann", "Lee", "DL24680")  # Ann now has two registrations
+    moved = owners.reassign(ann, "DL11111")
+    print("New owner:", owners.full_name("DL11111"), "- Registrations left with DL24680:",
+          owners.registration_counts[owners.find("DL24680")])
+    print("Moved to an existing owner, who keeps their name:", owners.reassign(moved, "DL67890") == other,
+          owners.full_name("DL67890"), "- DL11111 dropped:", "DL11111" not in owners)
+
+
+# Running the test suite
+if __name__ == "__main__":
+    test_owner_table()
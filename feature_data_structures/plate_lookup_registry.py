@@ -1,12 +1,22 @@
-class CompressedTrieNode:
+import gc
+from bisect import bisect_right
+from itertools import islice
+
+from feature_data_structures.frozen_trie import FrozenTrie
+from feature_data_structures.plate_ngram_index import PlateNgramIndex
+
+
+# Original engine: the first 3 characters live in Trie nodes and the rest of the plate in a hash map.
+# Kept so the test suite can compare it against the radix trie below.
+class HashSuffixTrieNode:
     def __init__(self):
         self.children = {}  # Child nodes (for each character)
         self.is_end_of_plate = False  # Indicates if a complete license plate ends here
         self.hash_map_suffix = {}  # Hash map for handling long suffixes
 
-class CompressedTrie:
+class HashSuffixTrie:
     def __init__(self):
-        self.root = CompressedTrieNode()
+        self.root = HashSuffixTrieNode()
 
     def insert(self, license_plate):
         """
@@ -22,7 +32,7 @@ class CompressedTrie:
             if i < 3:  # Use the Trie for the first 3 characters
                 current_char = license_plate[i]
                 if current_char not in node.children:
-                    node.children[current_char] = CompressedTrieNode()
+                    node.children[current_char] = HashSuffixTrieNode()
                 node = node.children[current_char]
                 i += 1
             else:
@@ -31,18 +41,27 @@ class CompressedTrie:
                 if suffix not in node.hash_map_suffix:
                     node.hash_map_suffix[suffix] = True
                 break
-        node.is_end_of_plate = i == len(license_plate)  # Set end of plate only if we finished the plate
+        if i == len(license_plate):  # Set end of plate only if we finished the plate
+            node.is_end_of_plate = True
 
-    def search(self, prefix):
+    def search(self, prefix, limit=None, offset=0, after=None):
         """
         Search for license plates starting with the given prefix.
+        Results are returned in sorted order. Use limit and offset (or after, the last plate
+        of the previous page) to fetch a single page of results.
+        """
+        return list(islice(self.iter_search(prefix, after), offset, None if limit is None else offset + limit))
+
+    def iter_search(self, prefix, after=None):
+        """
+        Lazily yield the license plates starting with the given prefix in sorted order.
+        If after is given, only plates that sort after it are yielded (cursor based paging).
         """
         if not prefix:  # Handle empty prefix case
-            return []
+            return
 
         node = self.root
         i = 0
-        result = []
 
         # Traverse the Trie for the first 3 characters
         while i < len(prefix) and i < 3:
@@ -51,18 +70,38 @@ class CompressedTrie:
                 node = node.children[current_char]
                 i += 1
             else:
-                return result  # Prefix not found
-
-        # If the prefix length exceeds 3, check the hash map for suffixes
-        if i == 3:
-            for suffix in node.hash_map_suffix:
-                if suffix.startswith(prefix[3:]):
-                    result.append(prefix[:3] + suffix)
-
-        # Perform DFS to collect all license plates starting from this node
-        self._collect_plates(node, prefix[:i], result)
-
-        return result
+                return  # Prefix not found
+
+        # Plates stored in the hash map at depth 3 must also match the rest of the prefix
+        yield from self._iter_plates(node, prefix[:i], prefix[i:], after)
+
+    # Helper generator that walks the Trie in sorted order starting from the given node.
+    # suffix_prefix filters the hash map suffixes of the start node, after skips plates before the cursor.
+    def _iter_plates(self, start_node, start_prefix, suffix_prefix, after):
+        stack = [(start_node, start_prefix)]
+        while stack:
+            node, prefix = stack.pop()
+            if node.is_end_of_plate and not suffix_prefix and (after is None or prefix > after):
+                yield prefix
+
+            if node.hash_map_suffix:
+                suffixes = sorted(node.hash_map_suffix)
+                start = 0
+                if after is not None and after.startswith(prefix):
+                    start = bisect_right(suffixes, after[len(prefix):])
+                elif after is not None and prefix < after:
+                    suffixes = []
+                for suffix in suffixes[start:]:
+                    if suffix.startswith(suffix_prefix):
+                        yield prefix + suffix
+            suffix_prefix = ""
+
+            # Push the children in reverse order so the smallest character is visited first
+            for char in sorted(node.children, reverse=True):
+                child_prefix = prefix + char
+                if after is not None and child_prefix < after[:len(child_prefix)]:
+                    continue  # Every plate below this child sorts before the cursor
+                stack.append((node.children[char], child_prefix))
 
     # Delete a license plate from the Trie.
     def delete(self, license_plate):
@@ -95,22 +134,6 @@ class CompressedTrie:
 
         return _delete(self.root, license_plate, 0)
 
-    # Helper function to collect all license plates from the current node.
-    # Ensure no duplicates by avoiding adding from both Trie and hash map for the same plate.
-    def _collect_plates(self, node, prefix, result):
-        if node.is_end_of_plate and prefix not in result:
-            result.append(prefix)
-
-        # Collect plates in the Trie
-        for char, child_node in node.children.items():
-            self._collect_plates(child_node, prefix + char, result)
-
-        # Collect plates from the hash map (ensure no duplicates)
-        for suffix in node.hash_map_suffix:
-            full_plate = prefix + suffix
-            if full_plate not in result:  # Prevent duplicates
-                result.append(full_plate)
-
     # Utility function to print the contents of the Trie for debugging.
     def print_trie(self):
         def _print(node, prefix):
@@ -124,6 +147,468 @@ class CompressedTrie:
         _print(self.root, "")
 
 
+class CompressedTrieNode:
+    __slots__ = ("label", "children", "is_end_of_plate", "count")  # No per-node __dict__, there are many nodes
+
+    def __init__(self, label="", is_end_of_plate=False, count=0):
+        self.label = label  # Characters on the edge leading into this node
+        self.children = {}  # Child nodes keyed by the first character of their label
+        self.is_end_of_plate = is_end_of_plate  # Indicates if a complete license plate ends here
+        self.count = count  # Number of license plates in the subtree rooted here
+
+# Path-compressed radix (Patricia) trie. Chains of single-child nodes are merged into one edge,
+# so every lookup costs O(key length) no matter how deep the prefix goes.
+class CompressedTrie:
+    def __init__(self, index_substrings=False):
+        self.root = CompressedTrieNode()
+        # Optional n-gram index answering "contains" and "ends with" queries, kept in sync with the Trie
+        self.substring_index = PlateNgramIndex() if index_substrings else None
+
+    def insert(self, license_plate):
+        """
+        Insert a license plate into the radix Trie, splitting an edge when the plate leaves it midway.
+        Returns True if the plate was not stored before.
+        """
+        if not license_plate:  # Ignore empty strings
+            return False
+
+        node = self.root
+        path = [node]  # Nodes whose subtree count grows if the plate is new
+        i = 0
+        while i < len(license_plate):
+            child = node.children.get(license_plate[i])
+            if child is None:
+                # The rest of the plate becomes a new leaf
+                leaf = CompressedTrieNode(license_plate[i:])
+                node.children[license_plate[i]] = leaf
+                node = leaf
+                path.append(leaf)
+                break
+
+            # Length of the common part between the edge label and the rest of the plate
+            label = child.label
+            j = 1
+            limit = min(len(label), len(license_plate) - i)
+            while j < limit and label[j] == license_plate[i + j]:
+                j += 1
+
+            if j < len(label):
+                # Split the edge: the common part becomes a new node above the existing child
+                middle = CompressedTrieNode(label[:j], count=child.count)
+                child.label = label[j:]
+                middle.children[child.label[0]] = child
+                node.children[license_plate[i]] = middle
+                child = middle
+
+            node = child
+            path.append(node)
+            i += j
+
+        if node.is_end_of_plate:
+            return False
+        node.is_end_of_plate = True
+        for path_node in path:
+            path_node.count += 1
+        if self.substring_index is not None:
+            self.substring_index.add(license_plate)
+        return True
+
+    def bulk_load(self, license_plates, presorted=False):
+        """
+        Load many license plates in one linear pass. The plates are sorted first unless presorted is True.
+        Because the plates arrive in order, each one only shares a prefix with the right-most path of the
+        Trie, so that path is kept on a stack instead of walking down from the root for every plate.
+        Loading into a Trie that already holds plates falls back to one insert per plate.
+        Returns the number of plates that were added.
+        """
+        if not presorted:
+            license_plates = sorted(license_plates)
+        if self.root.children:
+            return sum(1 for plate in license_plates if self.insert(plate))
+
+        # The nodes built here cannot form reference cycles, so pause the cyclic garbage collector
+        # instead of letting it rescan the growing Trie every few thousand allocations.
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            return self._bulk_load_sorted(license_plates)
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+
+    def _bulk_load_sorted(self, license_plates):
+        substring_index = self.substring_index
+        added = 0
+        previous = ""
+        stack = [(self.root, 0)]  # Right-most path of the Trie as (node, length of the path to it)
+        for plate in license_plates:
+            if not plate or plate == previous:
+                continue  # Ignore empty strings and duplicates
+            if plate < previous:
+                raise ValueError(f"License plates are not sorted: {plate!r} comes after {previous!r}")
+
+            # Length of the prefix shared with the previous plate
+            common = 0
+            for plate_char, previous_char in zip(plate, previous):
+                if plate_char != previous_char:
+                    break
+                common += 1
+
+            # Leave the part of the path that is below the shared prefix
+            child = None
+            while stack[-1][1] > common:
+                child = stack.pop()[0]
+            node, depth = stack[-1]
+
+            if depth < common:
+                # The shared prefix ends inside the edge of the last node we left: split that edge
+                middle = CompressedTrieNode(child.label[:common - depth], count=child.count)
+                child.label = child.label[common - depth:]
+                middle.children[child.label[0]] = child
+                node.children[middle.label[0]] = middle
+                node = middle
+                stack.append((middle, common))
+
+            # A sorted, unique plate is never a prefix of the previous one, so it always gets a new leaf
+            leaf = CompressedTrieNode(plate[common:], True, 1)
+            node.children[plate[common]] = leaf
+            for path_node, _ in stack:
+                path_node.count += 1
+            stack.append((leaf, len(plate)))
+            if substring_index is not None:
+                substring_index.add(plate)
+            previous = plate
+            added += 1
+        return added
+
+    def search(self, prefix, limit=None, offset=0, after=None):
+        """
+        Search for license plates starting with the given prefix.
+        Results are returned in sorted order. Use limit and offset (or after, the last plate
+        of the previous page) to fetch a single page of results.
+        """
+        return list(islice(self.iter_search(prefix, after, offset), limit))
+
+    def iter_search(self, prefix, after=None, offset=0):
+        """
+        Lazily yield the license plates starting with the given prefix in sorted order.
+        If after is given, only plates that sort after it are yielded (cursor based paging).
+        The first offset plates are skipped, whole subtrees at a time thanks to the subtree counts.
+        """
+        if not prefix:  # Handle empty prefix case
+            return
+
+        located = self._locate(prefix)
+        if located is None:
+            return  # Prefix not found
+
+        yield from self._iter_plates(*located, after, offset)
+
+    def count(self, prefix):
+        """
+        Count the license plates starting with the given prefix in O(prefix length),
+        without visiting the matching plates.
+        """
+        if not prefix:  # Handle empty prefix case, like search
+            return 0
+        located = self._locate(prefix)
+        return 0 if located is None else located[0].count
+
+    def __len__(self):
+        return self.root.count
+
+    def contains(self, fragment, limit=None):
+        """
+        Search for license plates containing the fragment anywhere, in sorted order.
+        Uses the n-gram index when the Trie was created with index_substrings=True, otherwise scans every plate.
+        """
+        if self.substring_index is not None:
+            return self.substring_index.contains(fragment, limit)
+        if not fragment:
+            return []
+        return list(islice((plate for plate in self._iter_plates(self.root, "") if fragment in plate), limit))
+
+    def endswith(self, fragment, limit=None):
+        """
+        Search for license plates ending with the fragment, in sorted order.
+        Uses the n-gram index when the Trie was created with index_substrings=True, otherwise scans every plate.
+        """
+        if self.substring_index is not None:
+            return self.substring_index.endswith(fragment, limit)
+        if not fragment:
+            return []
+        return list(islice((plate for plate in self._iter_plates(self.root, "") if plate.endswith(fragment)), limit))
+
+    def wildcard_search(self, pattern, limit=None):
+        """
+        Search for license plates matching a pattern where '?' stands for any single character
+        and a trailing '*' for any (possibly empty) rest of the plate, e.g. "AB?123" or "A?C*".
+        Branches that cannot match are pruned while walking the Trie. Results are in sorted order.
+        """
+        return list(islice(self.iter_wildcard_search(pattern), limit))
+
+    def iter_wildcard_search(self, pattern):
+        """
+        Lazily yield the license plates matching a wildcard pattern in sorted order.
+        """
+        match_rest = pattern.endswith("*")
+        pattern = pattern[:-1] if match_rest else pattern
+        if "*" in pattern:
+            raise ValueError("'*' is only supported at the end of a pattern")
+        if not pattern and not match_rest:
+            return
+
+        # Each entry is (node, path, number of pattern characters matched by the path)
+        stack = [(self.root, "", 0)]
+        while stack:
+            node, path, matched = stack.pop()
+            if matched == len(pattern):
+                if match_rest:
+                    yield from self._iter_plates(node, path)
+                    continue
+                if node.is_end_of_plate:
+                    yield path
+                continue  # Every child would make the plate longer than the pattern
+
+            for char in sorted(node.children, reverse=True):
+                child = node.children[char]
+                child_matched = matched
+                for label_char in child.label:
+                    if child_matched == len(pattern):
+                        break  # Only reachable with a trailing '*', which accepts the rest of the label
+                    expected = pattern[child_matched]
+                    if expected != "?" and expected != label_char:
+                        child_matched = -1
+                        break
+                    child_matched += 1
+                if child_matched == -1:
+                    continue
+                if child_matched == len(pattern) and not match_rest and child_matched - matched < len(child.label):
+                    continue  # The label is longer than what is left of the pattern
+                stack.append((child, path + child.label, child_matched))
+
+    def fuzzy_search(self, license_plate, max_distance=1, limit=None):
+        """
+        Find the plates within max_distance edits (Levenshtein distance: a misread, missing or extra
+        character each count as one edit) of a partial plate read, e.g. "A8C123" for "ABC123".
+        The dynamic programming row of the distance is carried down the Trie and a branch is abandoned
+        as soon as every entry in its row exceeds max_distance. Keep max_distance small (1 or 2).
+        Returns a list of (license_plate, distance) tuples, closest matches first.
+        """
+        if max_distance < 0:
+            raise ValueError("max_distance must not be negative")
+
+        matches = []
+        stack = [(self.root, "", list(range(len(license_plate) + 1)))]
+        while stack:
+            node, path, row = stack.pop()
+            if node.is_end_of_plate and row[-1] <= max_distance:
+                matches.append((path, row[-1]))
+
+            for child in node.children.values():
+                child_row = row
+                for label_char in child.label:
+                    previous = child_row
+                    child_row = [previous[0] + 1]
+                    for i, plate_char in enumerate(license_plate, 1):
+                        child_row.append(min(child_row[i - 1] + 1,  # Extra character in the plate
+                                             previous[i] + 1,  # Character missing from the read
+                                             previous[i - 1] + (plate_char != label_char)))  # Misread
+                    if min(child_row) > max_distance:
+                        break
+                else:
+                    stack.append((child, path + child.label, child_row))
+
+        matches.sort(key=lambda match: (match[1], match[0]))
+        return matches[:limit]
+
+    def partial_search(self, pattern, max_distance=1, limit=None):
+        """
+        Search for a partially read plate: '?' for an unreadable character, a leading and/or trailing
+        '*' for an unknown start or end ("*X12*", "*X12", "AB?1*"). Without wildcards, plates within
+        max_distance misread, missing or extra characters are returned, closest first.
+        Raises ValueError for '?' or '*' inside the plate when its start is unknown.
+        """
+        if pattern.startswith('*'):
+            # Only the middle ("*X12*") or the end ("*X12") of the plate is known
+            fragment = pattern.strip('*')
+            if '?' in fragment or '*' in fragment:
+                raise ValueError("'?' and '*' inside the plate are not supported when the start of the plate is unknown.")
+            if len(pattern) > 1 and pattern.endswith('*'):
+                return self.contains(fragment, limit=limit)
+            return self.endswith(fragment, limit=limit)
+        if '?' in pattern or '*' in pattern:
+            return self.wildcard_search(pattern, limit=limit)
+        return [plate for plate, distance in self.fuzzy_search(pattern, max_distance, limit=limit)]
+
+    # Helper generator that yields the plates below a node in sorted order, skipping the plates
+    # that do not sort after the cursor and then the first skip plates.
+    def _iter_plates(self, start_node, start_path, after=None, skip=0):
+        stack = [(start_node, start_path)]
+        while stack:
+            node, path = stack.pop()
+            if skip and after is None and node.count <= skip:
+                skip -= node.count  # The whole subtree comes before the requested page
+                continue
+            if node.is_end_of_plate and (after is None or path > after):
+                if skip:
+                    skip -= 1
+                else:
+                    yield path
+
+            # Push the children in reverse order so the smallest label is visited first
+            for char in sorted(node.children, reverse=True):
+                child = node.children[char]
+                child_path = path + child.label
+                if after is not None and child_path < after[:len(child_path)]:
+                    continue  # Every plate below this child sorts before the cursor
+                stack.append((child, child_path))
+
+    # Delete a license plate from the Trie. Returns True if the plate was found and removed.
+    def delete(self, license_plate):
+        if not license_plate:
+            return False
+
+        # Walk down to the plate, remembering every node on the way
+        path = [self.root]
+        i = 0
+        while i < len(license_plate):
+            child = path[-1].children.get(license_plate[i])
+            if child is None or not license_plate.startswith(child.label, i):
+                return False
+            path.append(child)
+            i += len(child.label)
+
+        node = path[-1]
+        if not node.is_end_of_plate:
+            return False
+        node.is_end_of_plate = False
+        for path_node in path:
+            path_node.count -= 1
+        parent = path[-2]
+
+        # Remove the node if it became a leaf, then merge whatever is left with a single child
+        if not node.children:
+            del parent.children[node.label[0]]
+            node = parent
+        if node is not self.root and not node.is_end_of_plate and len(node.children) == 1:
+            self._merge_with_child(node)
+        if self.substring_index is not None:
+            self.substring_index.remove(license_plate)
+        return True
+
+    # Fold the only child of a node into it, so no internal node without a plate has a single child.
+    def _merge_with_child(self, node):
+        (child,) = node.children.values()
+        node.label += child.label
+        node.children = child.children
+        node.is_end_of_plate = child.is_end_of_plate
+        node.count = child.count
+
+    def freeze(self):
+        """
+        Build an immutable, array-backed FrozenTrie image of the current plates.
+        The image can be saved to disk and memory-mapped by read-only lookup processes.
+        """
+        return FrozenTrie.from_trie(self)
+
+    # Find the node at or directly below the given prefix, together with the full path to it.
+    def _locate(self, prefix):
+        node = self.root
+        i = 0
+        while i < len(prefix):
+            child = node.children.get(prefix[i])
+            if child is None:
+                return None
+            label = child.label
+            if prefix.startswith(label, i):
+                node = child
+                i += len(label)
+            elif label.startswith(prefix[i:]):
+                # The prefix ends in the middle of this edge
+                return child, prefix[:i] + label
+            else:
+                return None
+        return node, prefix
+
+    # Utility function to print the contents of the Trie for debugging.
+    def print_trie(self):
+        def _print(node, prefix):
+            if node.is_end_of_plate:
+                print(f"License plate: {prefix}")
+            for char in sorted(node.children):
+                child = node.children[char]
+                _print(child, prefix + child.label)
+
+        _print(self.root, "")
+
+
+
+class CopyOnWriteTrie(CompressedTrie):
+    """
+    CompressedTrie whose published versions are never changed, for readers on other threads.
+
+    snapshot() returns a read-only CompressedTrie sharing the current root. Later inserts and deletes
+    copy the nodes on the path of their plate (with their children dicts) instead of changing them,
+    and hang the copies under a new root, so every snapshot keeps seeing the plates it was taken
+    with. Nodes copied since the last snapshot belong to no published version and are changed in
+    place, so a batch of changes to the same part of the Trie only copies it once.
+    Substring indexing is not supported: contains and endswith scan the snapshot instead.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.fresh = set()  # Nodes created since the last snapshot, safe to change in place
+
+    def snapshot(self):
+        view = CompressedTrie()
+        view.root = self.root
+        self.fresh = set()  # Everything reachable from the root is published now
+        return view
+
+    def insert(self, license_plate):
+        self.root = self._copy_path(license_plate)
+        return super().insert(license_plate)
+
+    def delete(self, license_plate):
+        self.root = self._copy_path(license_plate)
+        return super().delete(license_plate)
+
+    def bulk_load(self, license_plates, presorted=False):
+        self.root = self._own(self.root)  # An empty Trie is loaded under its root
+        return super().bulk_load(license_plates, presorted)
+
+    # Copy a node unless it was created since the last snapshot
+    def _own(self, node):
+        if node in self.fresh:
+            return node
+        copy = CompressedTrieNode(node.label, node.is_end_of_plate, node.count)
+        copy.children = dict(node.children)
+        self.fresh.add(copy)
+        return copy
+
+    # Copy the nodes an insert or delete of the plate can change, including an edge the plate leaves
+    # midway, and return the new root
+    def _copy_path(self, license_plate):
+        root = node = self._own(self.root)
+        i = 0
+        while i < len(license_plate):
+            child = node.children.get(license_plate[i])
+            if child is None:
+                break
+            child = node.children[license_plate[i]] = self._own(child)
+            if not license_plate.startswith(child.label, i):
+                break
+            node = child
+            i += len(child.label)
+        return root
+
+    def _merge_with_child(self, node):
+        # The child's children dict is taken over, so it must not be shared with a published node
+        (first_char, child), = node.children.items()
+        node.children[first_char] = self._own(child)
+        super()._merge_with_child(node)
+
 # Test suite for the Trie data structure for License Plate Prefix Lookups
 # This is a test procedure following one function after the other
 def test_trie():
@@ -187,6 +672,30 @@ def test_trie():
     print("License plates starting with 'A' after attempting to delete non-existent plate:", trie.search("A"))
     trie.print_trie()
 
+    # Test Case 6: Paginated search in sorted order
+    print("\n-- Test Case 6: Paginated search --")
+    print("First page of 'A' (limit 2):", trie.search("A", limit=2))
+    print("Second page of 'A' (limit 2, offset 2):", trie.search("A", limit=2, offset=2))
+    print("Page after cursor 'ABC1EF' (limit 2):", trie.search("A", limit=2, after="ABC1EF"))
+    print("License plates starting with 'ABC4':", trie.search("ABC4"))
+    print("Number of license plates starting with 'A':", trie.count("A"))
+
+    # Test Case 7: Partial plate reads with wildcards and misread characters
+    print("\n-- Test Case 7: Wildcard and fuzzy search --")
+    print("License plates matching 'AB?456':", trie.wildcard_search("AB?456"))
+    print("License plates matching 'A?B*':", trie.wildcard_search("A?B*"))
+    print("License plates within 1 edit of 'A8C456':", trie.fuzzy_search("A8C456", 1))
+    print("License plates within 2 edits of 'XZ2O2':", trie.fuzzy_search("XZ2O2", 2))
+
+    # Test Case 8: Substring search through the n-gram index
+    print("\n-- Test Case 8: Contains and ends with search --")
+    indexed_trie = CompressedTrie(index_substrings=True)
+    indexed_trie.bulk_load(["ABC123", "XYZ123", "AX1239", "QX12AB"])
+    print("License plates containing 'X12':", indexed_trie.contains("X12"))
+    print("License plates ending with '123':", indexed_trie.endswith("123"))
+    indexed_trie.delete("AX1239")
+    print("License plates containing 'X12' after deleting 'AX1239':", indexed_trie.contains("X12"))
+
 # Running the test suite
 if __name__ == "__main__":
     test_trie()
@@ -0,0 +1,129 @@
+from itertools import islice
+
+# Markers added around every plate, so grams touching the start or end of a plate can be told apart
+START_MARKER = "^"
+END_MARKER = "$"
+
+
+class PlateNgramIndex:
+    """
+    Substring index over license plates for "contains" and "ends with" queries.
+
+    Every plate is padded with start/end markers and cut into overlapping n-grams ("^ABC123$" gives
+    "^AB", "ABC", "BC1", ... for n = 3), and each gram maps to the set of plates containing it.
+    A query intersects the posting sets of the grams in the fragment, starting with the smallest,
+    and only the few surviving candidates are checked with a real substring test.
+    """
+
+    def __init__(self, n=3):
+        if n < 1:
+            raise ValueError("n must be at least 1")
+        self.n = n
+        self.grams = {}  # n-gram -> set of license plates containing it
+        self.plates = set()
+
+    def __len__(self):
+        return len(self.plates)
+
+    def _grams_of(self, text):
+        return {text[i:i + self.n] for i in range(len(text) - self.n + 1)}
+
+    # Add a license plate to the index
+    def add(self, license_plate):
+        if not license_plate or license_plate in self.plates:
+            return False
+        self.plates.add(license_plate)
+        for gram in self._grams_of(START_MARKER + license_plate + END_MARKER):
+            self.grams.setdefault(gram, set()).add(license_plate)
+        return True
+
+    # Remove a license plate from the index, dropping grams no other plate uses
+    def remove(self, license_plate):
+        if license_plate not in self.plates:
+            return False
+        self.plates.remove(license_plate)
+        for gram in self._grams_of(START_MARKER + license_plate + END_MARKER):
+            postings = self.grams[gram]
+            postings.discard(license_plate)
+            if not postings:
+                del self.grams[gram]
+        return True
+
+    def contains(self, fragment, limit=None):
+        """
+        Return the license plates containing the fragment anywhere, in sorted order.
+        """
+        return self._search(fragment, limit)
+
+    def endswith(self, fragment, limit=None):
+        """
+        Return the license plates ending with the fragment, in sorted order.
+        """
+        return self._search(fragment + END_MARKER, limit)
+
+    def _search(self, pattern, limit):
+        if not pattern or pattern == END_MARKER:
+            return []
+        matches = sorted(plate for plate in self._candidates(pattern)
+                         if pattern in START_MARKER + plate + END_MARKER)
+        return list(islice(matches, limit))
+
+    # Collect a small superset of the plates that can contain the pattern
+    def _candidates(self, pattern):
+        if len(pattern) < self.n:
+            # Shorter than a gram: take every gram that contains it. The number of distinct grams
+            # is bounded by the alphabet, not by the number of plates.
+            candidates = set()
+            for gram, postings in self.grams.items():
+                if pattern in gram:
+                    candidates |= postings
+            return candidates
+
+        postings = []
+        for gram in self._grams_of(pattern):
+            if gram not in self.grams:
+                return set()  # A gram no plate has: nothing can match
+            postings.append(self.grams[gram])
+
+        # Intersect from the most selective gram so the working set only shrinks
+        postings.sort(key=len)
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            candidates &= posting
+            if not candidates:
+                break
+        return candidates
+
+
+# Test suite for the n-gram substring index
+def test_plate_ngram_index():
+    index = PlateNgramIndex()
+
+    # Test Case 1: Add license plates to the index
+    print("\n-- Test Case 1: Adding license plates --")
+    for plate in ["ABC123", "XYZ123", "AX1239", "DEF456", "QX12AB", "X12"]:
+        index.add(plate)
+    print(f"Indexed {len(index)} plates with {len(index.grams)} distinct grams.")
+
+    # Test Case 2: Search for plates containing a fragment
+    print("\n-- Test Case 2: Searching for fragments --")
+    print("License plates containing 'X12':", index.contains("X12"))
+    print("License plates containing '123':", index.contains("123"))
+    print("License plates containing 'X':", index.contains("X"))
+    print("License plates containing 'NOPE':", index.contains("NOPE"))
+
+    # Test Case 3: Search for plates ending with a fragment
+    print("\n-- Test Case 3: Searching for endings --")
+    print("License plates ending with '123':", index.endswith("123"))
+    print("License plates ending with 'B':", index.endswith("B"))
+
+    # Test Case 4: Remove a license plate and search again
+    print("\n-- Test Case 4: Removing 'AX1239' --")
+    index.remove("AX1239")
+    print("License plates containing 'X12' after removal:", index.contains("X12"))
+    print("Removing a non-existent plate:", index.remove("NONEXISTENT"))
+
+
+# Running the test suite
+if __name__ == "__main__":
+    test_plate_ngram_index()
@@ -0,0 +1,178 @@
+from bisect import bisect_left, bisect_right, insort
+from operator import itemgetter
+
+# Number of entries a SortedIndex block is filled with; blocks are split at twice this size
+BLOCK_SIZE = 512
+
+_entry_value = itemgetter(0)
+
+
+class HashIndex:
+    """
+    Secondary index for equality lookups: field value -> set of license plates.
+    """
+
+    def __init__(self):
+        self.postings = {}
+
+    def add(self, value, license_plate):
+        self.postings.setdefault(value, set()).add(license_plate)
+
+    # Add many (value, license_plate) pairs
+    def bulk_add(self, pairs):
+        postings = self.postings
+        for value, license_plate in pairs:
+            plates = postings.get(value)
+            if plates is None:
+                postings[value] = {license_plate}
+            else:
+                plates.add(license_plate)
+
+    def remove(self, value, license_plate):
+        plates = self.postings.get(value)
+        if plates is not None:
+            plates.discard(license_plate)
+            if not plates:
+                del self.postings[value]
+
+    # Number of plates matching the condition, or None if this index cannot answer it
+    def estimate(self, condition):
+        if isinstance(condition, tuple):
+            return None  # Ranges need a sorted index
+        return len(self.postings.get(condition, ()))
+
+    def lookup(self, condition):
+        return self.postings.get(condition, set())
+
+
+class SortedIndex:
+    """
+    Secondary index for equality and range lookups. (value, license plate) entries are kept sorted in
+    blocks of a few hundred, like BlockedOwnerIndex, so lookups are binary searches and an update only
+    shifts the entries of one block instead of the whole index.
+    """
+
+    def __init__(self):
+        self.blocks = []  # Sorted lists of (value, license_plate) entries
+        self.maxes = []  # Last entry of every block
+
+    def __len__(self):
+        return sum(len(block) for block in self.blocks)
+
+    def add(self, value, license_plate):
+        entry = (value, license_plate)
+        if not self.blocks:
+            self.blocks.append([entry])
+            self.maxes.append(entry)
+            return
+        i = min(bisect_left(self.maxes, entry), len(self.maxes) - 1)
+        block = self.blocks[i]
+        insort(block, entry)
+        self.maxes[i] = block[-1]
+        if len(block) >= 2 * BLOCK_SIZE:
+            self.blocks.insert(i + 1, block[BLOCK_SIZE:])
+            del block[BLOCK_SIZE:]
+            self.maxes.insert(i, block[-1])
+
+    # Add many (value, license_plate) pairs with one sort instead of one insert per pair
+    def bulk_add(self, pairs):
+        entries = sorted([entry for block in self.blocks for entry in block] + list(pairs))
+        self.blocks = [entries[start:start + BLOCK_SIZE] for start in range(0, len(entries), BLOCK_SIZE)]
+        self.maxes = [block[-1] for block in self.blocks]
+
+    def remove(self, value, license_plate):
+        entry = (value, license_plate)
+        i = bisect_left(self.maxes, entry)
+        if i == len(self.maxes):
+            return
+        block = self.blocks[i]
+        j = bisect_left(block, entry)
+        if block[j] != entry:
+            return
+        del block[j]
+        if block:
+            self.maxes[i] = block[-1]
+        else:
+            del self.blocks[i], self.maxes[i]
+
+    # (block, position) bounds of the entries matching an exact value or an inclusive (low, high) range,
+    # None leaving a side open
+    def _bounds(self, condition):
+        low, high = condition if isinstance(condition, tuple) else (condition, condition)
+        if low is None:
+            start = (0, 0)
+        else:
+            i = bisect_left(self.maxes, low, key=_entry_value)
+            start = (i, 0 if i == len(self.blocks) else bisect_left(self.blocks[i], low, key=_entry_value))
+        if high is None:
+            end = (len(self.blocks), 0)
+        else:
+            i = bisect_right(self.maxes, high, key=_entry_value)
+            end = (i, 0 if i == len(self.blocks) else bisect_right(self.blocks[i], high, key=_entry_value))
+        return start, max(start, end)
+
+    # The matching entries, one slice per block
+    def _slices(self, condition):
+        (first_block, first_position), (last_block, last_position) = self._bounds(condition)
+        for i in range(first_block, min(last_block + 1, len(self.blocks))):
+            yield self.blocks[i][first_position if i == first_block else 0:
+                                 last_position if i == last_block else len(self.blocks[i])]
+
+    def estimate(self, condition):
+        (first_block, first_position), (last_block, last_position) = self._bounds(condition)
+        if first_block == last_block:
+            return last_position - first_position
+        return sum(len(block) for block in self.blocks[first_block:last_block]) - first_position + last_position
+
+    def lookup(self, condition):
+        return {license_plate for entries in self._slices(condition) for _, license_plate in entries}
+
+
+# Index types that can be requested for a field
+INDEX_TYPES = {"hash": HashIndex, "sorted": SortedIndex}
+
+# Indexes a VehicleRegistrationSystem keeps unless told otherwise
+DEFAULT_INDEXES = {
+    "vin_number": "hash",
+    "make": "hash",
+    "year": "sorted",
+    "registration_date": "sorted",
+    "expiration_date": "sorted",
+}
+
+
+# Check a value against an exact value or an inclusive (low, high) range
+def matches(value, condition):
+    if isinstance(condition, tuple):
+        low, high = condition
+        return (low is None or value >= low) and (high is None or value <= high)
+    return value == condition
+
+
+# Test suite for the secondary indexes
+def test_registration_indexes():
+    # Test Case 1: Hash index lookups
+    print("\n-- Test Case 1: Hash index --")
+    makes = HashIndex()
+    for plate, make in [("ABC123", "Toyota"), ("XYZ789", "Honda"), ("LMN456", "Toyota")]:
+        makes.add(make, plate)
+    print("Plates with make 'Toyota':", sorted(makes.lookup("Toyota")))
+    makes.remove("Toyota", "ABC123")
+    print("Plates with make 'Toyota' after removing 'ABC123':", sorted(makes.lookup("Toyota")))
+    print("Can the hash index answer a range:", makes.estimate(("A", "M")) is not None)
+
+    # Test Case 2: Sorted index lookups
+    print("\n-- Test Case 2: Sorted index --")
+    years = SortedIndex()
+    for plate, year in [("ABC123", 2020), ("XYZ789", 2019), ("LMN456", 2020), ("QRS111", 2015)]:
+        years.add(year, plate)
+    print("Plates from 2019 to 2020:", sorted(years.lookup((2019, 2020))))
+    print("Plates up to 2019:", sorted(years.lookup((None, 2019))))
+    print("Number of plates from 2020:", years.estimate(2020))
+    years.remove(2020, "ABC123")
+    print("Plates from 2020 after removing 'ABC123':", sorted(years.lookup(2020)))
+
+
+# Running the test suite
+if __name__ == "__main__":
+    test_registration_indexes()
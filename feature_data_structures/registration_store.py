@@ -0,0 +1,407 @@
+from array import array
+from collections import Counter
+from collections.abc import Mapping
+from datetime import date
+
+from feature_data_structures.expiration_data import parse_expiration_date
+from feature_data_structures.owner_table import OWNER_FIELDS, OwnerTable
+
+# Fields of a registration, grouped like the nested dicts get_registrations returns
+VEHICLE_FIELDS = ("make", "model", "year", "color", "classification", "vin_number")
+DATE_FIELDS = ("registration_date", "expiration_date")
+FIELDS = OWNER_FIELDS + VEHICLE_FIELDS + DATE_FIELDS
+
+
+class CategoryColumn:
+    """
+    Dictionary-encoded column for fields with few distinct values (make, model, color, ...).
+    Every distinct value is stored once and each row only holds its 4-byte code.
+    """
+
+    def __init__(self):
+        self.values = []  # code -> value
+        self.codes = {}  # value -> code
+        self.rows = array("I")  # row id -> code
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, row):
+        return self.values[self.rows[row]]
+
+    def __setitem__(self, row, value):
+        self.rows[row] = self._encode(value)
+
+    def append(self, value):
+        self.rows.append(self._encode(value))
+
+    # Values of many rows at once
+    def take(self, rows):
+        values, codes = self.values, self.rows
+        return [values[codes[row]] for row in rows]
+
+    def _encode(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+class DateColumn:
+    """
+    Column of YYYY-MM-DD dates, stored as 4-byte day ordinals and turned back into strings on read.
+    """
+
+    def __init__(self):
+        self.rows = array("i")  # row id -> day ordinal
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, row):
+        return date.fromordinal(self.rows[row]).isoformat()
+
+    def __setitem__(self, row, value):
+        self.rows[row] = parse_expiration_date(value)
+
+    def append(self, value):
+        self.rows.append(parse_expiration_date(value))
+
+    # Values of many rows at once, formatting each distinct day only once
+    def take(self, rows):
+        days = self.rows
+        iso_dates = {}
+        values = []
+        for row in rows:
+            day = days[row]
+            iso_date = iso_dates.get(day)
+            if iso_date is None:
+                iso_date = iso_dates[day] = date.fromordinal(day).isoformat()
+            values.append(iso_date)
+        return values
+
+
+class YearColumn:
+    """
+    Column of model years, stored as 2-byte integers.
+    """
+    MAX_YEAR = 0xFFFF  # Largest year a 2-byte slot holds
+
+    def __init__(self):
+        self.rows = array("H")
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, row):
+        return self.rows[row]
+
+    def __setitem__(self, row, value):
+        self.rows[row] = self.parse(value)
+
+    def append(self, value):
+        self.rows.append(self.parse(value))
+
+    # The year as an int. Raises ValueError for a year the column cannot hold, instead of the
+    # OverflowError of the array.
+    @classmethod
+    def parse(cls, value):
+        year = int(value)
+        if not 0 <= year <= cls.MAX_YEAR:
+            raise ValueError(f"Year out of range: {value!r}")
+        return year
+
+    def take(self, rows):
+        years = self.rows
+        return [years[row] for row in rows]
+
+
+class RegistrationStore(Mapping):
+    """
+    Columnar storage for vehicle registrations.
+
+    Every license plate is given a row id, and each field lives in its own column indexed by row id
+    instead of in three dicts per registration: categorical fields are dictionary-encoded, years and
+    dates are packed into arrays, and only the free-form strings stay in plain lists. The owner fields
+    are not stored per row: each row points to an entry of an OwnerTable, which may be shared with the
+    owner index. Rows of removed registrations are reused by the next additions.
+
+    The store is a read-only mapping from license plate to a RegistrationView, which reads the
+    columns only when a field is accessed.
+    """
+
+    def __init__(self, owners=None):
+        self.rows = {}  # license plate -> row id
+        self.plates = []  # row id -> license plate, None for a free row
+        self.free_rows = []
+        self.owners = OwnerTable() if owners is None else owners
+        self.owner_ids = array("I")  # row id -> owner id in the owner table
+        self.columns = {
+            "make": CategoryColumn(),
+            "model": CategoryColumn(),
+            "year": YearColumn(),
+            "color": CategoryColumn(),
+            "classification": CategoryColumn(),
+            "vin_number": [],
+            "registration_date": DateColumn(),
+            "expiration_date": DateColumn(),
+        }
+
+    def __getitem__(self, license_plate):
+        return RegistrationView(self, self.rows[license_plate], license_plate)
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __contains__(self, license_plate):
+        return license_plate in self.rows
+
+    # Add or replace the registration of a license plate. values maps every field name to its value.
+    def add(self, license_plate, values):
+        # Check the values that can be rejected before touching any column, so a bad date cannot leave them uneven
+        YearColumn.parse(values["year"])
+        for field in DATE_FIELDS:
+            parse_expiration_date(values[field])
+
+        owner_id = self.owners.acquire(values["first_name"], values["last_name"], values["license_number"])
+        row = self.rows.get(license_plate)
+        if row is None:
+            if not self.free_rows:
+                self.rows[license_plate] = len(self.plates)
+                self.plates.append(license_plate)
+                self.owner_ids.append(owner_id)
+                for field, column in self.columns.items():
+                    column.append(values[field])
+                return
+            row = self.rows[license_plate] = self.free_rows.pop()
+            self.plates[row] = license_plate
+        else:
+            self.owners.release(self.owner_ids[row])  # The plate changes hands or is registered again
+        self.owner_ids[row] = owner_id
+        for field, column in self.columns.items():
+            column[row] = values[field]
+
+    # Owner id of a registration, or None
+    def owner_id(self, license_plate):
+        row = self.rows.get(license_plate)
+        return None if row is None else self.owner_ids[row]
+
+    # Read one field of a registration without building a view
+    def get_field(self, license_plate, field):
+        return self._get(self.rows[license_plate], field)
+
+    def field_items(self, field):
+        """
+        Return (value, license_plate) pairs of one field for every registration, decoding the column in
+        one pass instead of one get_field call per plate.
+        """
+        plates = list(self.rows)
+        rows = self.rows.values()
+        if field in OWNER_FIELDS:
+            values = [self.owners.get(self.owner_ids[row], field) for row in rows]
+        else:
+            column = self.columns[field]
+            values = column.take(rows) if hasattr(column, "take") else [column[row] for row in rows]
+        return list(zip(values, plates))
+
+    def _get(self, row, field):
+        if field in OWNER_FIELDS:
+            return self.owners.get(self.owner_ids[row], field)
+        return self.columns[field][row]
+
+    # Change one field of a registration. Returns False if the plate or the field does not exist.
+    # A new license number moves only this registration to that owner, while a new first or last name
+    # is changed in the owner table, for every registration of that owner at once.
+    def set(self, license_plate, field, value):
+        row = self.rows.get(license_plate)
+        if row is None or field not in FIELDS:
+            return False
+        if field == "license_number":
+            self.owner_ids[row] = self.owners.reassign(self.owner_ids[row], value)
+        elif field in OWNER_FIELDS:
+            self.owners.set(self.owner_ids[row], field, value)
+        else:
+            self.columns[field][row] = value
+        return True
+
+    # Remove the registration of a license plate. Returns False if the plate does not exist.
+    def remove(self, license_plate):
+        row = self.rows.pop(license_plate, None)
+        if row is None:
+            return False
+        self.plates[row] = None
+        self.free_rows.append(row)
+        self.owners.release(self.owner_ids[row])
+        return True
+
+    def count_by(self, field):
+        """
+        Count the registrations per value of a categorical field (make, model, color or classification),
+        scanning only the codes of that one column.
+        """
+        column = self.columns[field]
+        codes = column.rows
+        counts = Counter(codes[row] for row in self.rows.values())
+        return {column.values[code]: count for code, count in counts.most_common()}
+
+
+class RegistrationView(Mapping):
+    """
+    Read-only view of one row of a RegistrationStore, shaped like the nested registration dicts:
+    view['owner']['first_name'], view['vehicle']['make'], view['expiration_date'], ...
+    Fields are read from the columns on access, so creating a view copies nothing. A removed row
+    can be given to another plate, so a view of a removed registration raises KeyError.
+    """
+    __slots__ = ("store", "row", "license_plate")
+
+    def __init__(self, store, row, license_plate):
+        self.store = store
+        self.row = row
+        self.license_plate = license_plate
+
+    def __getitem__(self, key):
+        if key == 'owner':
+            return FieldGroupView(self.store, self.row, self.license_plate, OWNER_FIELDS)
+        if key == 'vehicle':
+            return FieldGroupView(self.store, self.row, self.license_plate, VEHICLE_FIELDS)
+        if key in DATE_FIELDS:
+            return _checked_get(self.store, self.row, self.license_plate, key)
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(('owner', 'vehicle') + DATE_FIELDS)
+
+    def __len__(self):
+        return 2 + len(DATE_FIELDS)
+
+    # Copy the registration into plain nested dicts
+    def to_dict(self):
+        return {key: value.to_dict() if isinstance(value, FieldGroupView) else value for key, value in self.items()}
+
+    def __repr__(self):
+        return repr(self.to_dict())
+
+
+class FieldGroupView(Mapping):
+    """
+    Read-only view of the owner or vehicle fields of one row of a RegistrationStore.
+    """
+    __slots__ = ("store", "row", "license_plate", "fields")
+
+    def __init__(self, store, row, license_plate, fields):
+        self.store = store
+        self.row = row
+        self.license_plate = license_plate
+        self.fields = fields
+
+    def __getitem__(self, field):
+        if field not in self.fields:
+            raise KeyError(field)
+        return _checked_get(self.store, self.row, self.license_plate, field)
+
+    def __iter__(self):
+        return iter(self.fields)
+
+    def __len__(self):
+        return len(self.fields)
+
+    def to_dict(self):
+        return dict(self.items())
+
+    def __repr__(self):
+        return repr(self.to_dict())
+
+
+# Read a field of a view's row, unless the row no longer holds the view's plate
+def _checked_get(store, row, license_plate, field):
+    if store.plates[row] != license_plate:
+        raise KeyError(license_plate)
+    return store._get(row, field)
+
+
+# Test suite for the columnar registration store
+def test_registration_store(num_registrations=100000):
+    import random
+    import tracemalloc
+
+    store = RegistrationStore()
+
+    # Test Case 1: Add registrations and read them back through views
+    print("\n-- Test Case 1: Adding and reading registrations --")
+    store.add("ABC123", {"first_name": "John", "last_name": "Doe", "license_number": "DL12345",
+                         "make": "Toyota", "model": "Camry", "year": 2020, "color": "Blue",
+                         "classification": "Sedan", "vin_number": "123456789",
+                         "registration_date": "2023-01-01", "expiration_date": "2024-01-01"})
+    view = store["ABC123"]
+    print("Registration for 'ABC123':", view)
+    print("Make of 'ABC123':", view['vehicle']['make'], "- Expires:", view['expiration_date'])
+
+    # Test Case 2: Update, remove and reuse a row
+    print("\n-- Test Case 2: Updating, removing and reusing rows --")
+    print("Updating the color:", store.set("ABC123", "color", "Green"), "->", store["ABC123"]['vehicle']['color'])
+    print("Updating an unknown field:", store.set("ABC123", "wheels", 4))
+    print("Removing 'ABC123':", store.remove("ABC123"), "- Removing it again:", store.remove("ABC123"))
+    store.add("XYZ789", {"first_name": "Jane", "last_name": "Doe", "license_number": "DL67890",
+                         "make": "Honda", "model": "Civic", "year": 2019, "color": "Red",
+                         "classification": "Sedan", "vin_number": "987654321",
+                         "registration_date": "2022-06-15", "expiration_date": "2023-06-15"})
+    print("Rows used:", len(store.plates), "- Registrations:", len(store))
+    for year in (70000, -1):
+        try:
+            store.add("BAD001", {**store["XYZ789"]['owner'], **store["XYZ789"]['vehicle'], "year": year,
+                                 "registration_date": "2022-06-15", "expiration_date": "2023-06-15"})
+        except ValueError as error:
+            print(f"Adding a vehicle from the year {year}:", error)
+    try:
+        store.set("XYZ789", "year", 70000)
+    except ValueError as error:
+        print("Updating the year to 70000:", error)
+    assert "BAD001" not in store and all(len(column) == len(store.plates) for column in store.columns.values()), \
+        "A rejected year should leave the store unchanged"
+    store.add("DEF456", {**store["XYZ789"]['owner'], **store["XYZ789"]['vehicle'],
+                         "registration_date": "2022-06-15", "expiration_date": "2023-06-15"})
+    print("Registrations after the rejected years:", len(store), "- Year of 'XYZ789':", store["XYZ789"]['vehicle']['year'])
+    try:
+        view['vehicle']['make']  # 'XYZ789' now uses the row of 'ABC123'
+    except KeyError as error:
+        print("Reading the old view of 'ABC123' after its row was reused: KeyError", error)
+
+    # Test Case 3: Memory of the columnar layout compared with nested dicts
+    print(f"\n-- Test Case 3: Memory usage with {num_registrations} registrations --")
+    makes = {"Toyota": ["Camry", "Corolla"], "Honda": ["Civic", "Accord"], "Ford": ["F150", "Focus"]}
+    rows = []
+    for i in range(num_registrations):
+        make = random.choice(list(makes))
+        rows.append((f"P{i:07d}", {"first_name": random.choice(["John", "Jane", "Ann"]), "last_name": "Doe",
+                                   "license_number": f"DL{i:08d}", "make": make, "model": random.choice(makes[make]),
+                                   "year": random.randint(1990, 2024), "color": random.choice(["Blue", "Red"]),
+                                   "classification": "Sedan", "vin_number": f"{i:017d}",
+                                   "registration_date": "2023-01-01", "expiration_date": "2025-01-01"}))
+    for layout in ("nested dicts", "columns"):
+        tracemalloc.start()
+        if layout == "columns":
+            registrations = RegistrationStore()
+            for license_plate, values in rows:
+                registrations.add(license_plate, values)
+        else:
+            registrations = {}
+            for license_plate, values in rows:
+                registrations[license_plate] = {
+                    'owner': {field: values[field] for field in OWNER_FIELDS},
+                    'vehicle': {field: values[field] for field in VEHICLE_FIELDS},
+                    'registration_date': values['registration_date'],
+                    'expiration_date': values['expiration_date'],
+                }
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"{layout}: {current / num_registrations:.0f} bytes per registration (not counting shared strings)")
+    print("Registrations per make:", registrations.count_by("make"))
+
+
+# Running the test suite
+if __name__ == "__main__":
+    test_registration_store()
@@ -0,0 +1,399 @@
+import csv
+import json
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from itertools import islice
+
+from feature_data_structures.expiration_data import parse_expiration_date
+from feature_data_structures.owner_table import OWNER_FIELDS
+from feature_data_structures.registration_store import DATE_FIELDS, VEHICLE_FIELDS
+
+# Columns of an import or export file, in the order of the "add" records of the write-ahead log
+RECORD_FIELDS = ("license_plate",) + VEHICLE_FIELDS + OWNER_FIELDS + DATE_FIELDS
+FORMATS = ("csv", "jsonl")
+
+# Number of lines handed to a worker process at a time
+CHUNK_SIZE = 20000
+# Fields that may only hold letters, like the color and names prompts of main.add_vehicle
+ALPHA_FIELDS = ("color", "classification", "first_name", "last_name")
+
+
+# Validation rules, shared with the prompts of main.add_vehicle
+def is_valid_year(year, current_year=None):
+    return year.isdigit() and 1886 <= int(year) <= (current_year or datetime.now().year)  # First car invented in 1886
+
+
+def is_valid_alpha(text):
+    return text.isalpha()
+
+
+def is_valid_vin(vin):
+    return vin.isdigit()
+
+
+def is_valid_date(text):
+    try:
+        datetime.strptime(text, "%Y-%m-%d")
+        return True
+    except ValueError:
+        return False
+
+
+def _normalize_date(text, dates):
+    """
+    Return a date accepted by is_valid_date in the zero-padded form the store keeps ("2024-1-5"
+    becomes "2024-01-05"), or None if it is invalid. Results are cached in dates, since an import
+    repeats the same few thousand dates, and the common zero-padded form skips strptime.
+    """
+    normalized = dates.get(text, False)
+    if normalized is False:
+        try:
+            parse_expiration_date(text)
+            normalized = text
+        except ValueError:
+            normalized = datetime.strptime(text, "%Y-%m-%d").date().isoformat() if is_valid_date(text) else None
+        dates[text] = normalized
+    return normalized
+
+
+def validate_record(values, current_year=None, dates=None):
+    """
+    Check the values of one registration, given in RECORD_FIELDS order, against the rules of
+    main.add_vehicle. Returns the record ready for the store (year as an int, zero-padded dates),
+    or raises ValueError naming the first invalid field.
+    """
+    (license_plate, make, model, year, color, classification, vin_number,
+     first_name, last_name, license_number, registration_date, expiration_date) = (
+        "" if value is None else str(value).strip() for value in values)
+    current_year = current_year or datetime.now().year
+    if not license_plate:
+        raise ValueError("missing license_plate")
+    if not is_valid_year(year, current_year):
+        raise ValueError(f"invalid year {year!r}, expected a year between 1886 and {current_year}")
+    for field, text in zip(ALPHA_FIELDS, (color, classification, first_name, last_name)):
+        if not is_valid_alpha(text):
+            raise ValueError(f"invalid {field} {text!r}, expected only alphabetic characters")
+    if not is_valid_vin(vin_number):
+        raise ValueError(f"invalid vin_number {vin_number!r}, expected only numeric characters")
+    dates = {} if dates is None else dates
+    normalized = []
+    for field, text in zip(DATE_FIELDS, (registration_date, expiration_date)):
+        date_value = _normalize_date(text, dates)
+        if date_value is None:
+            raise ValueError(f"invalid {field} {text!r}, expected YYYY-MM-DD")
+        normalized.append(date_value)
+    return (license_plate, make, model, int(year), color, classification, vin_number,
+            first_name, last_name, license_number, *normalized)
+
+
+def _format_of(path, file_format):
+    file_format = file_format or os.path.splitext(path)[1].lstrip(".").lower()
+    if file_format not in FORMATS:
+        raise ValueError(f"Unknown file format {file_format!r}, expected one of {', '.join(FORMATS)}")
+    return file_format
+
+
+def _parse_chunk(file_format, header, first_line, lines):
+    """
+    Parse and validate a chunk of lines in a worker process. Returns the valid records and a
+    (line number, message) pair for every rejected line.
+    """
+    records, errors = [], []
+    current_year = datetime.now().year
+    dates = {}
+    if file_format == "csv":
+        columns = [header.index(field) for field in RECORD_FIELDS]
+        rows = _numbered_rows(csv.reader(lines), first_line)
+    else:
+        rows = enumerate(lines, first_line)
+    for line_number, row in rows:
+        try:
+            if file_format == "csv":
+                if len(row) != len(header):
+                    raise ValueError(f"expected {len(header)} columns, found {len(row)}")
+                values = [row[column] for column in columns]
+            else:
+                if not row.strip():
+                    continue
+                document = json.loads(row)
+                if not isinstance(document, dict):
+                    raise ValueError("expected a JSON object")
+                values = [document.get(field) for field in RECORD_FIELDS]
+            records.append(validate_record(values, current_year, dates))
+        except ValueError as error:  # json.JSONDecodeError is a ValueError too
+            errors.append((line_number, str(error)))
+    return records, errors
+
+
+# Yield (line number, row) pairs, numbering every row by the line it starts on: a quoted field can
+# hold a newline, so a row can span several lines
+def _numbered_rows(reader, first_line):
+    line_number = first_line
+    for row in reader:
+        yield line_number, row
+        line_number = first_line + reader.line_num
+
+
+def _read_chunks(file, chunk_size, quoted=False):
+    """
+    Yield (number of the first line, lines) chunks without reading the whole file. With quoted, a
+    chunk never ends inside a quoted CSV field: while the chunk holds an odd number of quotes (an
+    escaped quote is written twice), the lines after it belong to the same row.
+    """
+    line_number = 1
+    while True:
+        lines = list(islice(file, chunk_size))
+        if not lines:
+            return
+        if quoted and sum(line.count('"') for line in lines) % 2:
+            for line in file:
+                lines.append(line)
+                if line.count('"') % 2:
+                    break
+        yield line_number, lines
+        line_number += len(lines)
+
+
+def import_registrations(path, car_system, trie, heap, owner_index, file_format=None, workers=None, chunk_size=CHUNK_SIZE):
+    """
+    Import the registrations of a CSV or JSONL file (the format is taken from the extension unless
+    given) into the four structures main.py keeps in sync. Every line holds one registration: a CSV
+    file starts with a header naming the RECORD_FIELDS columns, a JSONL file holds one object with
+    those keys per line.
+
+    The file is read in chunks that a pool of worker processes parses and validates while the
+    previous chunks are written to the registration store, so only a few chunks are in memory at
+    once. The secondary indexes, the trie, the heap and the owner index are then built in one bulk
+    pass each instead of one insert per record. Invalid lines are skipped; a plate that appears
+    more than once keeps its last registration.
+
+    Returns the number of imported registrations and the (line number, message) pairs of the
+    rejected lines.
+    """
+    file_format = _format_of(path, file_format)
+    workers = workers or os.cpu_count() or 1
+    store = car_system.registrations
+    index_was_empty = owner_index.root is None
+    imported = {}  # Imported license plates, in file order
+    new_plates = []  # Imported plates that were not registered before
+    errors = []
+
+    def add_records(records):
+        for record in records:
+            license_plate = record[0]
+            values = dict(zip(RECORD_FIELDS[1:], record[1:]))
+            if license_plate in store:
+                if not index_was_empty:
+                    old_license = store.get_field(license_plate, "license_number")
+                    owner_index.root = owner_index.remove(owner_index.root, old_license, license_plate)
+            else:
+                new_plates.append(license_plate)
+            store.add(license_plate, values)
+            imported[license_plate] = None
+            if not index_was_empty:
+                owner_index.root = owner_index.insert(owner_index.root, values["license_number"],
+                                                      f"{values['first_name']} {values['last_name']}", license_plate)
+
+    try:
+        with open(path, newline="", encoding="utf-8") as file:
+            header = None
+            first_line = 1
+            if file_format == "csv":
+                header = next(csv.reader([file.readline()]), [])
+                missing = [field for field in RECORD_FIELDS if field not in header]
+                if missing:
+                    raise ValueError(f"CSV header is missing the columns: {', '.join(missing)}")
+                first_line = 2
+            chunks = ((first_line + offset - 1, lines) for offset, lines in _read_chunks(file, chunk_size, file_format == "csv"))
+
+            if workers == 1:
+                for chunk_line, lines in chunks:
+                    records, chunk_errors = _parse_chunk(file_format, header, chunk_line, lines)
+                    add_records(records)
+                    errors.extend(chunk_errors)
+            else:
+                with ProcessPoolExecutor(workers) as pool:
+                    # Keep a couple of chunks per worker in flight, and apply the results in file order
+                    pending = deque()
+                    for chunk_line, lines in chunks:
+                        pending.append(pool.submit(_parse_chunk, file_format, header, chunk_line, lines))
+                        if len(pending) >= 2 * workers:
+                            records, chunk_errors = pending.popleft().result()
+                            add_records(records)
+                            errors.extend(chunk_errors)
+                    while pending:
+                        records, chunk_errors = pending.popleft().result()
+                        add_records(records)
+                        errors.extend(chunk_errors)
+    finally:
+        # Bring the other structures up to date with whatever reached the store
+        _bulk_load(car_system, trie, heap, owner_index, imported, new_plates, index_was_empty)
+    return len(imported), errors
+
+
+def _bulk_load(car_system, trie, heap, owner_index, imported, new_plates, index_was_empty):
+    store = car_system.registrations
+    car_system.rebuild_indexes()
+    trie.bulk_load(new_plates)  # Falls back to one insert per plate if the trie is not empty
+    rows = [store.rows[license_plate] for license_plate in imported]
+    heap.add_registrations(imported, store.columns["expiration_date"].take(rows))
+
+    if index_was_empty and len(store):
+        owners = store.owners
+        license_numbers, owner_ids = owners.license_numbers, store.owner_ids
+        # Sorting is stable, so every owner's vehicles stay in the order they were registered in
+        plate_rows = sorted(store.rows.items(), key=lambda item: license_numbers[owner_ids[item[1]]])
+        if owner_index.owner_table is not None:
+            items = ((license_numbers[owner_ids[row]], None, license_plate) for license_plate, row in plate_rows)
+        else:
+            items = ((license_numbers[owner_ids[row]], f"{owners.first_names[owner_ids[row]]} {owners.last_names[owner_ids[row]]}",
+                      license_plate) for license_plate, row in plate_rows)
+        owner_index.root = type(owner_index).build_from_sorted(items, owner_index.owner_table).root
+
+
+def export_registrations(path, car_system, file_format=None, chunk_size=CHUNK_SIZE):
+    """
+    Write every registration to a CSV or JSONL file that import_registrations can read back.
+    The columns are decoded and written one chunk of rows at a time, so the export never holds
+    more than chunk_size registrations as Python objects. Returns the number of written registrations.
+    """
+    file_format = _format_of(path, file_format)
+    store = car_system.registrations
+    owners = store.owners
+    written = 0
+    with open(path, "w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        if file_format == "csv":
+            writer.writerow(RECORD_FIELDS)
+        plate_rows = iter(store.rows.items())
+        while True:
+            chunk = list(islice(plate_rows, chunk_size))
+            if not chunk:
+                break
+            rows = [row for _, row in chunk]
+            owner_ids = [store.owner_ids[row] for row in rows]
+            columns = [[license_plate for license_plate, _ in chunk]]
+            for field in VEHICLE_FIELDS:
+                column = store.columns[field]
+                columns.append(column.take(rows) if hasattr(column, "take") else [column[row] for row in rows])
+            columns.append([owners.first_names[owner_id] for owner_id in owner_ids])
+            columns.append([owners.last_names[owner_id] for owner_id in owner_ids])
+            columns.append([owners.license_numbers[owner_id] for owner_id in owner_ids])
+            for field in DATE_FIELDS:
+                columns.append(store.columns[field].take(rows))
+
+            if file_format == "csv":
+                writer.writerows(zip(*columns))
+            else:
+                file.writelines(json.dumps(dict(zip(RECORD_FIELDS, values))) + "\n" for values in zip(*columns))
+            written += len(chunk)
+    return written
+
+
+# Test suite for the bulk import and export
+def test_registration_transfer(num_registrations=1000000):
+    import random
+    import shutil
+    import tempfile
+    import time
+    from feature_data_structures.expiration_data import ExpirationData
+    from feature_data_structures.owner_based_car_registration import AVLTree
+    from feature_data_structures.plate_lookup_registry import CompressedTrie
+    from feature_data_structures.vehicle_registration_system import VehicleRegistrationSystem
+
+    def new_registry():
+        car_system = VehicleRegistrationSystem()
+        return car_system, CompressedTrie(), ExpirationData(), AVLTree(car_system.owners)
+
+    directory = tempfile.mkdtemp()
+    try:
+        # Test Case 1: Importing a CSV file with invalid lines
+        print("\n-- Test Case 1: Importing a CSV file --")
+        path = os.path.join(directory, "registrations.csv")
+        with open(path, "w", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(RECORD_FIELDS)
+            writer.writerow(["ABC123", "Toyota", "Camry", "2020", "Blue", "Sedan", "12345", "John", "Doe", "DL12345", "2023-01-01", "2025-01-01"])
+            writer.writerow(["XYZ789", "Honda", "Civic", "2019", "Red", "Sedan", "67890", "Jane", "Smith", "DL67890", "2023-1-5", "2024-6-1"])
+            writer.writerow(["LMN456", "Ford", "Focus", "1850", "Black", "Hatchback", "54321", "John", "Doe", "DL12345", "2023-01-01", "2025-01-01"])
+            writer.writerow(["QRS111", "Ford", "Focus", "2018", "Black", "Hatchback", "5A321", "Ann", "Lee", "DL24680", "2023-01-01", "2025-01-01"])
+            writer.writerow(["TUV222", "Kia", "Rio", "2021", "White", "Sedan", "11111", "John", "Doe", "DL12345", "2023-02-30", "2026-01-01"])
+            writer.writerow(["DEF999", "Kia", "Rio", "2021", "White", "Sedan", "22222", "John", "Doe", "DL12345", "2023-02-01", "2026-01-01"])
+        car_system, trie, heap, owner_index = new_registry()
+        imported, errors = import_registrations(path, car_system, trie, heap, owner_index, workers=2)
+        print("Imported registrations:", imported)
+        for line_number, message in errors:
+            print(f"Rejected line {line_number}: {message}")
+        print("Plates in the trie:", len(trie), "- Plates starting with 'D':", trie.search("D"))
+        print("Next expiring vehicle:", heap.get_next_expiration())
+        print("Vehicles of DL12345:", owner_index.find_vehicles_by_dl(owner_index.root, "DL12345"))
+        print("Plates of make 'Kia':", car_system.query(make="Kia"))
+        print("Dates of XYZ789:", car_system.registrations.get_field("XYZ789", "registration_date"),
+              car_system.registrations.get_field("XYZ789", "expiration_date"))
+
+        # Test Case 2: Importing into a registry that already has registrations
+        print("\n-- Test Case 2: Importing into a non-empty registry --")
+        path = os.path.join(directory, "more.jsonl")
+        with open(path, "w") as file:
+            file.write(json.dumps(dict(zip(RECORD_FIELDS, ["ABC123", "Toyota", "Camry", 2020, "Blue", "Sedan", 12345,
+                                                           "Ann", "Lee", "DL24680", "2023-01-01", "2024-01-01"]))) + "\n")
+            file.write("not json\n")
+            file.write(json.dumps(dict(zip(RECORD_FIELDS, ["GHI333", "Mazda", "3", 2022, "Grey", "Sedan", 33333,
+                                                           "Ann", "Lee", "DL24680", "2023-01-01", "2027-01-01"]))) + "\n")
+        imported, errors = import_registrations(path, car_system, trie, heap, owner_index, workers=1)
+        print("Imported registrations:", imported, "- Rejected lines:", errors)
+        print("Vehicles of DL12345:", owner_index.find_vehicles_by_dl(owner_index.root, "DL12345")["vehicles"])
+        print("Vehicles of DL24680:", owner_index.find_vehicles_by_dl(owner_index.root, "DL24680")["vehicles"])
+        print("Next expiring vehicle:", heap.get_next_expiration())
+
+        # Test Case 3: Export and import again
+        print("\n-- Test Case 3: Round trip through an export --")
+        # A quoted CSV field can span lines, and small chunks put the chunk boundaries inside such rows
+        car_system.registrations.set("XYZ789", "model", "Cam\nry")
+        car_system.registrations.set("DEF999", "make", 'K"i\na')
+        for file_format in FORMATS:
+            path = os.path.join(directory, f"export.{file_format}")
+            written = export_registrations(path, car_system)
+            copy = new_registry()
+            imported, errors = import_registrations(path, *copy, chunk_size=2)
+            same = all(copy[0].registrations[plate].to_dict() == car_system.registrations[plate].to_dict()
+                       for plate in car_system.registrations)
+            print(f"{file_format}: written {written}, imported {imported}, rejected {len(errors)}, same registrations: {same}")
+        with open(os.path.join(directory, "export.csv"), "a", newline="") as file:
+            file.write("BAD000,not enough columns\n")
+        print("Rejected line after the multi-line rows:", import_registrations(os.path.join(directory, "export.csv"),
+                                                                               *new_registry(), chunk_size=2)[1])
+
+        # Test Case 4: Throughput with a large file
+        print(f"\n-- Test Case 4: Importing {num_registrations} registrations --")
+        path = os.path.join(directory, "large.csv")
+        makes = ["Toyota", "Honda", "Ford", "Kia", "Mazda", "Tesla"]
+        with open(path, "w", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(RECORD_FIELDS)
+            writer.writerows((f"P{i:07d}", random.choice(makes), "Model", random.randint(1990, 2024), "Blue", "Sedan",
+                              str(i), "John", "Doe", f"DL{i // 2:08d}", "2023-01-01",
+                              f"20{random.randint(25, 30)}-{random.randint(1, 12):02d}-{random.randint(1, 28):02d}")
+                             for i in range(num_registrations))
+        for workers in (1, None):
+            registry = new_registry()
+            start_time = time.time()
+            imported, errors = import_registrations(path, *registry, workers=workers)
+            elapsed = time.time() - start_time
+            label = "in one process" if workers == 1 else f"with a pool of {os.cpu_count()} worker processes"
+            print(f"Import {label}: {elapsed:.2f} seconds "
+                  f"({imported / elapsed * 60 / 10 ** 6:.2f}M records per minute)")
+        start_time = time.time()
+        written = export_registrations(os.path.join(directory, "large.jsonl"), registry[0])
+        elapsed = time.time() - start_time
+        print(f"Export of {written} registrations to JSONL: {elapsed:.2f} seconds")
+    finally:
+        shutil.rmtree(directory)
+
+
+# Running the test suite
+if __name__ == "__main__":
+    test_registration_transfer(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
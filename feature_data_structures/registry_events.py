@@ -0,0 +1,30 @@
+import logging
+import sys
+
+# Every data structure reports its events (a registration added to the heap, a plate not found, ...)
+# to this logger instead of printing them. Nothing is shown unless a handler is enabled, and a
+# disabled call only checks the level: the message is formatted from its arguments when it is shown.
+events = logging.getLogger("vehicle_registry")
+events.addHandler(logging.NullHandler())  # Not even warnings reach the terminal unless asked for
+
+
+def show_events(level=logging.DEBUG, stream=None):
+    """
+    Print the events of level and above to stream (stdout by default), one message per line, e.g. to
+    follow the test suites. Calling it again only changes the level. Returns the handler.
+    """
+    events.setLevel(level)
+    for handler in events.handlers:
+        if getattr(handler, "shows_events", False):
+            return handler
+    handler = logging.StreamHandler(stream or sys.stdout)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    handler.shows_events = True
+    events.addHandler(handler)
+    return handler
+
+
+def hide_events():
+    for handler in [handler for handler in events.handlers if getattr(handler, "shows_events", False)]:
+        events.removeHandler(handler)
+    events.setLevel(logging.NOTSET)
@@ -0,0 +1,516 @@
+import json
+import os
+import sys
+import threading
+import time
+import zlib
+from array import array
+from itertools import accumulate
+from struct import Struct
+
+from feature_data_structures.registration_store import CategoryColumn, DateColumn, YearColumn
+
+# Log record header: payload length, log sequence number, CRC32 of the payload
+RECORD_HEADER = Struct("<IQI")
+
+# Snapshot header: magic, format version, byte order flag, log sequence number, owner count, registration count
+SNAPSHOT_HEADER = Struct("<4sHHQII")
+SNAPSHOT_MAGIC = b"VRSS"
+SNAPSHOT_VERSION = 2
+NATIVE_ORDER = 1 if sys.byteorder == "little" else 2
+# Every snapshot section starts with its size in bytes and its number of items
+SECTION_HEADER = Struct("<QQ")
+
+# Separator of the strings of a version 1 snapshot section, which can still be loaded. A NUL inside
+# a field shifted every later string of its column, so version 2 stores the string lengths instead.
+STRING_SEPARATOR = "\x00"
+
+
+class WriteAheadLog:
+    """
+    Append-only log of registry mutations.
+
+    Every record is framed by its length, sequence number and CRC32, so a record torn by a crash is
+    detected and dropped on recovery. Records are written to the OS right away, but fsync is batched:
+    a record is forced to disk once sync_every records are waiting or at most sync_interval seconds
+    after it was written (and on sync() and close()), trading the last few records on a power loss
+    for far fewer disk flushes. A background timer syncs the records of a writer that went idle.
+    """
+
+    def __init__(self, path, next_lsn=1, sync_every=256, sync_interval=1.0):
+        self.path = path
+        self.next_lsn = next_lsn
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        self.pending = 0  # Records written since the last fsync
+        self.last_sync = time.monotonic()
+        self.lock = threading.Lock()  # The timer thread syncs while the owner appends
+        self.timer = None
+        self.file = open(path, "ab")
+
+    # Append one mutation and return its sequence number
+    def append(self, operation, *args):
+        payload = json.dumps([operation, *args], separators=(",", ":")).encode("utf-8")
+        with self.lock:
+            lsn = self.next_lsn
+            self.next_lsn += 1
+            self.file.write(RECORD_HEADER.pack(len(payload), lsn, zlib.crc32(payload)))
+            self.file.write(payload)
+            self.file.flush()
+            self.pending += 1
+            if self.pending >= self.sync_every or time.monotonic() - self.last_sync >= self.sync_interval:
+                self._sync()
+            elif self.timer is None:
+                self.timer = threading.Timer(self.sync_interval, self._sync_in_background)
+                self.timer.daemon = True
+                self.timer.start()
+        return lsn
+
+    # Force every written record to disk
+    def sync(self):
+        with self.lock:
+            self._sync()
+
+    def _sync(self):
+        if self.pending:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.pending = 0
+        self.last_sync = time.monotonic()
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+
+    def _sync_in_background(self):
+        with self.lock:
+            if not self.file.closed:
+                self._sync()
+
+    # Empty the log, once a snapshot holds everything it recorded
+    def truncate(self):
+        with self.lock:
+            self.file.truncate(0)
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.pending = 0
+
+    def close(self):
+        with self.lock:
+            self._sync()
+            self.file.close()
+
+    @staticmethod
+    def read(path):
+        """
+        Read the intact records of a log file. Returns a list of (lsn, operation, args) and the size
+        in bytes of the intact part; anything after it is a torn or corrupted tail.
+        """
+        records = []
+        if not os.path.exists(path):
+            return records, 0
+        with open(path, "rb") as file:
+            data = file.read()
+        offset = 0
+        while offset + RECORD_HEADER.size <= len(data):
+            length, lsn, checksum = RECORD_HEADER.unpack_from(data, offset)
+            start = offset + RECORD_HEADER.size
+            payload = data[start:start + length]
+            if len(payload) < length or zlib.crc32(payload) != checksum:
+                break
+            operation, *args = json.loads(payload)
+            records.append((lsn, operation, args))
+            offset = start + length
+        return records, offset
+
+
+# A string section holds the length in characters of every string, then all of them as UTF-8,
+# so the strings can hold any character and are decoded in one call
+def _pack_strings(strings):
+    lengths = array("I", map(len, strings))
+    return lengths.tobytes() + "".join(strings).encode("utf-8", "surrogatepass")
+
+
+def _unpack_strings(data, count):
+    lengths = array("I")
+    lengths.frombytes(data[:count * lengths.itemsize])
+    text = str(data[count * lengths.itemsize:], "utf-8", "surrogatepass")
+    ends = list(accumulate(lengths))
+    return [text[start:end] for start, end in zip([0] + ends, ends)]
+
+
+def _unpack_separated_strings(data, count):
+    return data.decode("utf-8").split(STRING_SEPARATOR) if count else []
+
+
+def save_snapshot(path, lsn, car_system, owner_index):
+    """
+    Write a compact binary snapshot of the registry to path, atomically replacing any older one.
+
+    The registrations are written column by column in license plate order, with the owner table
+    compacted to the owners still in use. The trie and the expiration heap are not written: they are
+    rebuilt from the sorted plates and the expiration column in one bulk pass each. The owner index
+    is written as the order of its registrations, so it is rebuilt without sorting.
+    """
+    store = car_system.registrations
+    owners = store.owners
+    ordered = sorted(store.rows.items())  # (license plate, row id) in license plate order
+    plates = [license_plate for license_plate, _ in ordered]
+    rows = [row for _, row in ordered]
+
+    # Compact the owner table to the owners referenced by a registration
+    owner_ids = {}
+    for row in rows:
+        owner_id = store.owner_ids[row]
+        if owner_id not in owner_ids:
+            owner_ids[owner_id] = len(owner_ids)
+    registration_owners = array("I", [owner_ids[store.owner_ids[row]] for row in rows])
+    owner_counts = array("I", [owners.registration_counts[owner_id] for owner_id in owner_ids])
+
+    sections = [
+        (_pack_strings([owners.license_numbers[owner_id] for owner_id in owner_ids]), len(owner_ids)),
+        (_pack_strings([owners.first_names[owner_id] for owner_id in owner_ids]), len(owner_ids)),
+        (_pack_strings([owners.last_names[owner_id] for owner_id in owner_ids]), len(owner_ids)),
+        (owner_counts.tobytes(), len(owner_counts)),
+        (_pack_strings(plates), len(plates)),
+        (registration_owners.tobytes(), len(rows)),
+    ]
+    for field, column in store.columns.items():
+        if isinstance(column, CategoryColumn):
+            sections.append((_pack_strings(column.values), len(column.values)))
+            sections.append((array("I", [column.rows[row] for row in rows]).tobytes(), len(rows)))
+        elif isinstance(column, (DateColumn, YearColumn)):
+            sections.append((array(column.rows.typecode, [column.rows[row] for row in rows]).tobytes(), len(rows)))
+        else:
+            sections.append((_pack_strings([column[row] for row in rows]), len(rows)))
+
+    # The owner index in driver's license order, as positions in the plate order above
+    positions = {license_plate: i for i, license_plate in enumerate(plates)}
+    owner_order = array("I")
+    for owner in owner_index.in_order(owner_index.root):
+        # Plates the registrations no longer know cannot be restored and are left out
+        owner_order.extend(positions[license_plate] for license_plate in owner_index.iter_vehicles(owner_index.root, owner['dl_numbers'])
+                           if license_plate in positions)
+    sections.append((owner_order.tobytes(), len(owner_order)))
+
+    temporary_path = path + ".tmp"
+    with open(temporary_path, "wb") as file:
+        file.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, NATIVE_ORDER, lsn, len(owner_ids), len(rows)))
+        for data, count in sections:
+            file.write(SECTION_HEADER.pack(len(data), count))
+            file.write(data)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporary_path, path)
+    _sync_directory(os.path.dirname(os.path.abspath(path)))
+
+
+def load_snapshot(path, car_system, trie, heap, owner_index):
+    """
+    Load a snapshot written by save_snapshot into empty structures. Returns the sequence number of
+    the last log record the snapshot contains.
+    """
+    with open(path, "rb") as file:
+        data = file.read()
+    magic, version, byte_order, lsn, owner_count, registration_count = SNAPSHOT_HEADER.unpack_from(data, 0)
+    if magic != SNAPSHOT_MAGIC or version not in (1, SNAPSHOT_VERSION):
+        raise ValueError("Not a registry snapshot")
+    unpack_strings = _unpack_strings if version == SNAPSHOT_VERSION else _unpack_separated_strings
+    if byte_order != NATIVE_ORDER:
+        raise ValueError("Registry snapshot was written on a machine with a different byte order")
+
+    view = memoryview(data)
+    offset = SNAPSHOT_HEADER.size
+
+    def next_section():
+        nonlocal offset
+        size, count = SECTION_HEADER.unpack_from(data, offset)
+        offset += SECTION_HEADER.size + size
+        return view[offset - size:offset], count
+
+    def next_strings():
+        section, count = next_section()
+        return unpack_strings(bytes(section), count)
+
+    def next_array(typecode):
+        result = array(typecode)
+        result.frombytes(next_section()[0])
+        return result
+
+    # Owner table
+    owners = car_system.owners
+    owners.license_numbers = next_strings()
+    owners.first_names = [sys.intern(name) for name in next_strings()]
+    owners.last_names = [sys.intern(name) for name in next_strings()]
+    owners.registration_counts = next_array("I")
+    owners.ids = dict(zip(owners.license_numbers, range(owner_count)))
+    owners.free_ids = []
+
+    # Registration columns, one row per plate in license plate order
+    store = car_system.registrations
+    plates = next_strings()
+    store.plates = plates
+    store.rows = dict(zip(plates, range(registration_count)))
+    store.free_rows = []
+    store.owner_ids = next_array("I")
+    for field, column in store.columns.items():
+        if isinstance(column, CategoryColumn):
+            column.values = next_strings()
+            column.codes = {value: code for code, value in enumerate(column.values)}
+            column.rows = next_array("I")
+        elif isinstance(column, (DateColumn, YearColumn)):
+            column.rows = next_array(column.rows.typecode)
+        else:
+            store.columns[field] = next_strings()
+    owner_order = next_array("I")
+    car_system.rebuild_indexes()
+
+    # Rebuild the trie, the heap and the owner index in one bulk pass each
+    trie.bulk_load(plates, presorted=True)
+
+    heap.add_registrations(plates, store.columns["expiration_date"].take(range(registration_count)))
+
+    license_numbers, owner_ids = owners.license_numbers, store.owner_ids
+    if owner_index.owner_table is not None:
+        items = ((license_numbers[owner_ids[i]], None, plates[i]) for i in owner_order)
+    else:
+        items = ((license_numbers[owner_ids[i]], f"{owners.first_names[owner_ids[i]]} {owners.last_names[owner_ids[i]]}",
+                  plates[i]) for i in owner_order)
+    owner_index.root = type(owner_index).build_from_sorted(items, owner_index.owner_table).root
+    return lsn
+
+
+class RegistryPersistence:
+    """
+    Crash-safe persistence for the four structures main.py keeps in sync: the registration system,
+    the plate trie, the expiration heap and the owner index.
+
+    Each mutation is applied in memory and then appended to the write-ahead log. Every
+    checkpoint_every mutations (and on checkpoint()) a snapshot of the whole registry replaces the
+    previous one and the log is emptied. Recovery loads the snapshot and replays the log on top of it.
+    """
+
+    SNAPSHOT_FILE = "registry.snapshot"
+    LOG_FILE = "registry.wal"
+
+    def __init__(self, directory, car_system, trie, heap, owner_index, sync_every=256, checkpoint_every=100000):
+        self.directory = directory
+        self.car_system = car_system
+        self.trie = trie
+        self.heap = heap
+        self.owner_index = owner_index
+        self.sync_every = sync_every
+        self.checkpoint_every = checkpoint_every
+        self.since_checkpoint = 0
+        self.log = None
+        os.makedirs(directory, exist_ok=True)
+        self.snapshot_path = os.path.join(directory, self.SNAPSHOT_FILE)
+        self.log_path = os.path.join(directory, self.LOG_FILE)
+
+    def recover(self, apply):
+        """
+        Load the last snapshot into the (empty) structures and replay the log records written after it,
+        calling apply(operation, args) for each. Must be called once, before any mutation is recorded.
+        Returns the number of replayed records.
+        """
+        snapshot_lsn = 0
+        if os.path.exists(self.snapshot_path):
+            snapshot_lsn = load_snapshot(self.snapshot_path, self.car_system, self.trie, self.heap, self.owner_index)
+
+        records, intact_size = WriteAheadLog.read(self.log_path)
+        replayed = 0
+        for lsn, operation, args in records:
+            if lsn > snapshot_lsn:  # Older records were already in the snapshot
+                apply(operation, args)
+                replayed += 1
+        self.since_checkpoint = replayed
+
+        # Drop a torn tail before appending after it
+        if os.path.exists(self.log_path) and os.path.getsize(self.log_path) > intact_size:
+            os.truncate(self.log_path, intact_size)
+        next_lsn = max(snapshot_lsn, records[-1][0] if records else 0) + 1
+        self.log = WriteAheadLog(self.log_path, next_lsn, self.sync_every)
+        return replayed
+
+    # Record a mutation that was just applied to the structures
+    def record(self, operation, *args):
+        self.log.append(operation, *args)
+        self.since_checkpoint += 1
+        if self.since_checkpoint >= self.checkpoint_every:
+            self.checkpoint()
+
+    def checkpoint(self):
+        """
+        Snapshot the registry and empty the log. A crash in between is harmless: the records the
+        snapshot already contains are skipped on replay by their sequence numbers.
+        """
+        self.log.sync()
+        save_snapshot(self.snapshot_path, self.log.next_lsn - 1, self.car_system, self.owner_index)
+        self.log.truncate()
+        self.since_checkpoint = 0
+
+    def close(self):
+        if self.log is not None:
+            self.log.close()
+
+
+def _sync_directory(directory):
+    # Make the rename of a snapshot durable; not every platform can open a directory
+    try:
+        descriptor = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(descriptor)
+    except OSError:
+        pass
+    finally:
+        os.close(descriptor)
+
+
+# Test suite for the write-ahead log and snapshots
+def test_registry_persistence(num_registrations=200000):
+    import gc
+    import random
+    import shutil
+    import tempfile
+    from feature_data_structures.expiration_data import ExpirationData
+    from feature_data_structures.owner_based_car_registration import AVLTree
+    from feature_data_structures.plate_lookup_registry import CompressedTrie
+    from feature_data_structures.vehicle_registration_system import VehicleRegistrationSystem
+    from objects.owner import Owner
+    from objects.vehicle import Vehicle
+
+    def new_registry(directory):
+        car_system = VehicleRegistrationSystem()
+        trie, heap, owner_index = CompressedTrie(), ExpirationData(), AVLTree(car_system.owners)
+        persistence = RegistryPersistence(directory, car_system, trie, heap, owner_index)
+
+        # Same steps as main.py, for the two operations used below
+        def apply(operation, args):
+            if operation == "add":
+                license_plate, make, year, first_name, license_number, expiration_date = args
+                car_system.add_vehicle(license_plate, Vehicle(make, "Model", year, "Blue", "Sedan", "1"),
+                                       Owner(first_name, "Doe", license_number), "2023-01-01", expiration_date)
+                trie.insert(license_plate)
+                heap.add_registration(license_plate, expiration_date)
+                owner_index.root = owner_index.insert(owner_index.root, license_number, None, license_plate)
+            elif operation == "remove":
+                license_number = car_system.registrations.get_field(args[0], "license_number")
+                owner_index.root = owner_index.remove(owner_index.root, license_number, args[0])
+                car_system.remove_vehicle(args[0])
+                trie.delete(args[0])
+                heap.remove_registration(args[0])
+
+        return persistence, apply, (car_system, trie, heap, owner_index)
+
+    def summary(structures):
+        car_system, trie, heap, owner_index = structures
+        return (len(car_system.registrations), len(trie), len(heap), heap.get_next_expiration(),
+                [(owner['dl_numbers'], owner['owner_name'], owner['vehicles']) for owner in owner_index.in_order(owner_index.root)][:3])
+
+    directory = tempfile.mkdtemp()
+    try:
+        # Test Case 1: Recover from the log alone, as after a crash
+        print("\n-- Test Case 1: Replaying the log after a crash --")
+        persistence, apply, structures = new_registry(directory)
+        persistence.recover(apply)
+        for args in [("ABC123", "Toyota", 2020, "John", "DL12345", "2025-01-01"),
+                     ("XYZ789", "Honda", 2019, "Jane", "DL67890", "2024-06-15"),
+                     ("LMN456", "Toyota", 2021, "John", "DL12345", "2026-04-01")]:
+            apply("add", args)
+            persistence.record("add", *args)
+        apply("remove", ["XYZ789"])
+        persistence.record("remove", "XYZ789")
+        persistence.log.file.close()  # Crash: no checkpoint, no clean close
+        expected = summary(structures)
+        persistence, apply, structures = new_registry(directory)
+        print("Replayed records:", persistence.recover(apply))
+        print("Same state as before the crash:", summary(structures) == expected, summary(structures))
+
+        # Test Case 2: A torn record at the end of the log is dropped
+        print("\n-- Test Case 2: Ignoring a torn record --")
+        persistence.close()
+        with open(os.path.join(directory, RegistryPersistence.LOG_FILE), "ab") as file:
+            file.write(RECORD_HEADER.pack(100, 99, 0) + b"half a rec")
+        persistence, apply, structures = new_registry(directory)
+        print("Replayed records:", persistence.recover(apply), "- Same state:", summary(structures) == expected)
+
+        # Test Case 3: Checkpoint, then recover from the snapshot plus newer log records
+        print("\n-- Test Case 3: Recovering from a snapshot and the log --")
+        persistence.checkpoint()
+        apply("add", ["QRS111", "Ford", 2018, "Ann", "DL24680", "2024-03-01"])
+        persistence.record("add", "QRS111", "Ford", 2018, "Ann", "DL24680", "2024-03-01")
+        persistence.close()
+        expected = summary(structures)
+        persistence, apply, structures = new_registry(directory)
+        print("Replayed records:", persistence.recover(apply), "- Same state:", summary(structures) == expected)
+
+        # Test Case 4: Fields holding any character, NUL included, come back unchanged
+        print("\n-- Test Case 4: Unusual characters in a snapshot --")
+        apply("add", ["NUL001", "To\x00yota", 2020, "Zoë", "DL\x00111", "2025-05-05"])
+        apply("add", ["NUL002", "Honda", 2019, "Jane", "DL222", "2025-06-06"])
+        persistence.checkpoint()
+        persistence.close()
+        persistence, apply, structures = new_registry(directory)
+        persistence.recover(apply)
+        registrations = structures[0].registrations
+        print("Makes:", [registrations[plate]['vehicle']['make'] for plate in ("NUL001", "NUL002")],
+              "- First names:", [registrations[plate]['owner']['first_name'] for plate in ("NUL001", "NUL002")])
+
+        # Test Case 5: A record written before the writer goes idle is synced by the timer
+        print("\n-- Test Case 5: Syncing an idle log --")
+        persistence.record("remove", "NUL002")
+        print("Records waiting for fsync:", persistence.log.pending, end="")
+        time.sleep(persistence.log.sync_interval + 0.5)
+        print(f" - after {persistence.log.sync_interval + 0.5:.1f} idle seconds:", persistence.log.pending)
+        persistence.close()
+    finally:
+        shutil.rmtree(directory)
+
+    # Test Case 6: Restart time with a large registry
+    print(f"\n-- Test Case 6: Restarting with {num_registrations} registrations --")
+    directory = tempfile.mkdtemp()
+    try:
+        persistence, apply, structures = new_registry(directory)
+        car_system, trie, heap, owner_index = structures
+        plates = [f"P{i:07d}" for i in range(num_registrations)]
+        expiration_dates = [f"20{random.randint(25, 30)}-{random.randint(1, 12):02d}-{random.randint(1, 28):02d}"
+                            for _ in range(num_registrations)]
+        owners = []
+        for i, license_plate in enumerate(plates):
+            license_number = f"DL{i // 2:08d}"  # Two vehicles per owner
+            car_system.add_vehicle(license_plate, Vehicle("Toyota", "Camry", 2020, "Blue", "Sedan", str(i)),
+                                   Owner("John", "Doe", license_number), "2023-01-01", expiration_dates[i])
+            owners.append((license_number, None, license_plate))
+        trie.bulk_load(plates, presorted=True)
+        heap.add_registrations(plates, expiration_dates)
+        owner_index.root = AVLTree.build_from_sorted(owners, car_system.owners).root
+        persistence.recover(apply)
+
+        start_time = time.time()
+        persistence.checkpoint()
+        print(f"Time to write the snapshot: {time.time() - start_time:.2f} seconds "
+              f"({os.path.getsize(persistence.snapshot_path) / 10 ** 6:.1f} MB)")
+        start_time = time.time()
+        for i in range(10000):
+            persistence.record("add", f"N{i:07d}", "Ford", 2018, "Ann", f"DN{i:08d}", "2027-01-01")
+        persistence.log.sync()
+        print(f"Time to log 10000 mutations: {time.time() - start_time:.2f} seconds")
+        persistence.close()
+        # Free the first registry, so a large restart is measured in the memory a real one would have
+        del apply, structures, car_system, trie, heap, owner_index, owners
+        gc.collect()
+
+        persistence, apply, structures = new_registry(directory)
+        start_time = time.time()
+        replayed = persistence.recover(apply)
+        print(f"Time to restart from the snapshot and {replayed} log records: {time.time() - start_time:.2f} seconds")
+        print("Registrations after the restart:", len(structures[0].registrations))
+        persistence.close()
+    finally:
+        shutil.rmtree(directory)
+
+
+# Running the test suite
+if __name__ == "__main__":
+    test_registry_persistence()
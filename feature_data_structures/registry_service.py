@@ -0,0 +1,345 @@
+from contextlib import contextmanager
+
+from objects.owner import Owner
+from objects.vehicle import Vehicle
+from feature_data_structures.expiration_data import ExpirationData
+from feature_data_structures.expiration_scheduler import ExpirationScheduler
+from feature_data_structures.owner_based_car_registration import AVLTree
+from feature_data_structures.owner_table import OWNER_FIELDS
+from feature_data_structures.plate_lookup_registry import CompressedTrie
+from feature_data_structures.registration_store import FIELDS
+from feature_data_structures.registration_transfer import import_registrations
+from feature_data_structures.registry_persistence import RegistryPersistence
+from feature_data_structures.vehicle_registration_system import VehicleRegistrationSystem
+
+
+class RegistryService:
+    """
+    Single place where the registry is changed. The service owns the four structures that hold a
+    registration (the registration system with its secondary indexes, the plate trie, the expiration
+    heap and the owner index) and applies every mutation to all of them, so callers never update
+    one structure and forget another.
+
+    Each mutation is checked by the registration system first, which rejects invalid values before
+    changing anything, and only then reaches the other structures: a failed mutation leaves all of
+    them untouched. Applied mutations are recorded in the write-ahead log once persistence is
+    restored with restore().
+
+    Inside a batch() the registration system and the owner index are still updated right away, but
+    trie and heap changes are collected and applied once when the batch ends: the new plates are
+    bulk-loaded into the trie in sorted order, and the heap gets its new entries with a single
+    heapify. Until then the trie and the heap show the registry as it was before the batch.
+    """
+
+    def __init__(self, car_system=None, trie=None, heap=None, owner_index=None):
+        self.car_system = VehicleRegistrationSystem() if car_system is None else car_system
+        self.trie = CompressedTrie() if trie is None else trie
+        self.heap = ExpirationData() if heap is None else heap
+        # Owner names are shared with the registrations through the owner table
+        self.owner_index = AVLTree(self.car_system.owners) if owner_index is None else owner_index
+        self.persistence = None
+        self.batch_depth = 0
+        self.pending_plates = {}  # license plate -> True to insert into the trie, False to delete
+        self.pending_dates = {}  # license plate -> new expiration date, None to remove from the heap
+        # Callbacks told which plates' details changed, or None after a change of unknown plates
+        self.listeners = []
+
+    @property
+    def registrations(self):
+        return self.car_system.registrations
+
+    def add(self, license_plate, vehicle: Vehicle, owner: Owner, registration_date, expiration_date):
+        """
+        Add a registration, or replace the registration of a plate that is already registered.
+        Raises ValueError, with nothing changed, if the year or a date is invalid.
+        """
+        store = self.car_system.registrations
+        old_license_number = store.get_field(license_plate, "license_number") if license_plate in store else None
+        # New names given with a registration are the owner's names for all their registrations
+        changed_plates = [license_plate]
+        if self.listeners and owner.license_number in self.car_system.owners and \
+                self.car_system.owners.full_name(owner.license_number) != f"{owner.first_name} {owner.last_name}":
+            changed_plates += self._owner_plates(owner.license_number)
+        self.car_system.add_vehicle(license_plate, vehicle, owner, registration_date, expiration_date)
+
+        owner_index = self.owner_index
+        if old_license_number is not None:
+            owner_index.root = owner_index.remove(owner_index.root, old_license_number, license_plate)
+        owner_index.root = owner_index.insert(owner_index.root, owner.license_number,
+                                              f"{owner.first_name} {owner.last_name}", license_plate)
+        self._add_plate(license_plate)
+        self._set_expiration(license_plate, store.get_field(license_plate, "expiration_date"))
+        self._notify(changed_plates)
+        self._record("add", license_plate, vehicle.make, vehicle.model, vehicle.year, vehicle.color,
+                     vehicle.classification, vehicle.vin_number, owner.first_name, owner.last_name,
+                     owner.license_number, registration_date, expiration_date)
+
+    def update(self, license_plate, field, value):
+        """
+        Change one field of a registration. A new expiration date moves the plate in the heap, and a
+        new license number moves only this plate to that owner in the owner index. First and last
+        names belong to the owner, so they change for all their registrations at once. Returns False
+        if the plate or the field does not exist, and raises ValueError, with nothing changed, if the
+        value is invalid.
+        """
+        store = self.car_system.registrations
+        if license_plate not in store or field not in FIELDS:
+            return False
+        old_license_number = store.get_field(license_plate, "license_number")
+        owner_wide = field in OWNER_FIELDS and field != "license_number"
+        # An owner index without the owner table keeps a copy of the names in its nodes
+        renames_owner = owner_wide and self.owner_index.owner_table is None
+        owner_plates = self._owner_plates(old_license_number) if owner_wide and (renames_owner or self.listeners) else None
+        self.car_system.update_registration(license_plate, field, value)
+
+        if field == "expiration_date":
+            self._set_expiration(license_plate, store.get_field(license_plate, field))
+        elif field == "license_number":
+            self._move_owner_vehicles(old_license_number, store.get_field(license_plate, field), [license_plate])
+        elif renames_owner:
+            self._move_owner_vehicles(old_license_number, old_license_number, owner_plates)
+        self._notify(owner_plates if owner_wide else [license_plate])
+        self._record("update", license_plate, field, value)
+        return True
+
+    # Rename the owner with the given license number. Returns False if there is no such owner.
+    def rename_owner(self, license_number, first_name, last_name):
+        if license_number not in self.car_system.owners:
+            return False
+        owner_plates = None
+        if self.owner_index.owner_table is None or self.listeners:
+            owner_plates = self._owner_plates(license_number)
+        self.car_system.rename_owner(license_number, first_name, last_name)
+        if self.owner_index.owner_table is None:
+            self._move_owner_vehicles(license_number, license_number, owner_plates)
+        self._notify(owner_plates)
+        self._record("rename_owner", license_number, first_name, last_name)
+        return True
+
+    # Remove a registration. Returns False if the plate is not registered.
+    def remove(self, license_plate):
+        store = self.car_system.registrations
+        if license_plate not in store:
+            return False
+        license_number = store.get_field(license_plate, "license_number")
+        self.car_system.remove_vehicle(license_plate)
+        self.owner_index.root = self.owner_index.remove(self.owner_index.root, license_number, license_plate)
+        self._remove_plate(license_plate)
+        self._set_expiration(license_plate, None)
+        self._notify([license_plate])
+        self._record("remove", license_plate)
+        return True
+
+    # Apply a mutation read back from the write-ahead log
+    def apply(self, operation, args):
+        if operation == "add":
+            (license_plate, make, model, year, color, classification, vin_number,
+             first_name, last_name, license_number, registration_date, expiration_date) = args
+            self.add(license_plate, Vehicle(make, model, year, color, classification, vin_number),
+                     Owner(first_name, last_name, license_number), registration_date, expiration_date)
+        elif operation == "update":
+            self.update(*args)
+        elif operation == "update_expiration":  # Written by older versions of main.py
+            self.update(args[0], "expiration_date", args[1])
+        elif operation == "remove":
+            self.remove(*args)
+        elif operation == "rename_owner":
+            self.rename_owner(*args)
+        else:
+            raise ValueError(f"Unknown logged operation: {operation}")
+
+    @contextmanager
+    def batch(self):
+        """
+        Group many mutations so the trie and the heap are brought up to date once, when the
+        outermost batch ends (also if it ends with an exception, for the mutations applied so far).
+        """
+        self.batch_depth += 1
+        try:
+            yield self
+        finally:
+            self.batch_depth -= 1
+            if not self.batch_depth:
+                self._flush()
+
+    def _add_plate(self, license_plate):
+        if self.batch_depth:
+            self.pending_plates[license_plate] = True
+        else:
+            self.trie.insert(license_plate)
+
+    def _remove_plate(self, license_plate):
+        if self.batch_depth:
+            self.pending_plates[license_plate] = False
+        else:
+            self.trie.delete(license_plate)
+
+    # Give a plate a new expiration date in the heap (adding it if needed), or remove it with None
+    def _set_expiration(self, license_plate, expiration_date):
+        if self.batch_depth:
+            self.pending_dates[license_plate] = expiration_date
+        elif expiration_date is None:
+            self.heap.remove_registration(license_plate)
+        else:
+            self.heap.add_registration(license_plate, expiration_date)
+
+    # Apply the trie and heap changes collected during a batch, keeping only the last change of each plate
+    def _flush(self):
+        pending_plates, self.pending_plates = self.pending_plates, {}
+        for license_plate, present in pending_plates.items():
+            if not present:
+                self.trie.delete(license_plate)
+        self.trie.bulk_load(sorted(license_plate for license_plate, present in pending_plates.items() if present),
+                            presorted=True)
+
+        pending_dates, self.pending_dates = self.pending_dates, {}
+        removed = [license_plate for license_plate, expiration_date in pending_dates.items() if expiration_date is None]
+        if removed:
+            self.heap.remove_registrations(removed)
+        dated = [(license_plate, expiration_date) for license_plate, expiration_date in pending_dates.items()
+                 if expiration_date is not None]
+        if dated:
+            self.heap.add_registrations(*zip(*dated))
+
+        if self.persistence is not None:
+            self.persistence.log.sync()  # A finished batch is on disk
+
+    # Move vehicles to their (new) license number and owner name in the owner index
+    def _move_owner_vehicles(self, old_license_number, new_license_number, license_plates):
+        owner_index = self.owner_index
+        owner_name = self.car_system.owners.full_name(new_license_number)
+        for license_plate in license_plates:
+            owner_index.root = owner_index.remove(owner_index.root, old_license_number, license_plate)
+        for license_plate in license_plates:
+            owner_index.root = owner_index.insert(owner_index.root, new_license_number, owner_name, license_plate)
+
+    # Scheduler reporting the registrations as they expire. It only reads the heap, so the lapsed
+    # plates stay registered and in next-expiring queries.
+    def expiration_scheduler(self, **options):
+        return ExpirationScheduler(self.heap, **options)
+
+    def add_listener(self, callback):
+        self.listeners.append(callback)
+
+    def remove_listener(self, callback):
+        self.listeners.remove(callback)
+
+    def _notify(self, license_plates):
+        for callback in self.listeners:
+            callback(license_plates)
+
+    def _owner_plates(self, license_number):
+        return list(self.owner_index.iter_vehicles(self.owner_index.root, license_number))
+
+    def _record(self, operation, *args):
+        if self.persistence is not None:
+            self.persistence.record(operation, *args)
+
+    def restore(self, directory, **options):
+        """
+        Load the registry saved in directory into the (empty) service and log every later mutation
+        there. Returns the number of mutations replayed from the log.
+        """
+        persistence = RegistryPersistence(directory, self.car_system, self.trie, self.heap, self.owner_index, **options)
+        with self.batch():
+            replayed = persistence.recover(self.apply)
+        self.persistence = persistence
+        self._notify(None)  # The snapshot is loaded without going through add
+        return replayed
+
+    def import_file(self, path, **options):
+        """
+        Bulk-import a CSV or JSONL file of registrations (see import_registrations). The imported
+        registrations are not written to the log one by one; a checkpoint saves them instead.
+        """
+        self._flush()
+        try:
+            return import_registrations(path, self.car_system, self.trie, self.heap, self.owner_index, **options)
+        finally:
+            self._notify(None)
+            self.checkpoint()
+
+    def checkpoint(self):
+        if self.persistence is not None:
+            self.persistence.checkpoint()
+
+    def close(self):
+        if self.persistence is not None:
+            self.persistence.close()
+
+
+# Test suite for the registry service
+def test_registry_service(num_registrations=100000):
+    import contextlib
+    import time
+
+    def summary(service):
+        owner_index = service.owner_index
+        return (len(service.registrations), len(service.trie), len(service.heap), service.heap.get_next_expiration(),
+                [(owner['dl_numbers'], owner['owner_name'], owner['vehicles']) for owner in owner_index.in_order(owner_index.root)])
+
+    toyota = Vehicle("Toyota", "Camry", 2020, "Blue", "Sedan", "123456789")
+    honda = Vehicle("Honda", "Civic", 2019, "Red", "Sedan", "987654321")
+    john, jane = Owner("John", "Doe", "DL12345"), Owner("Jane", "Doe", "DL67890")
+
+    # Test Case 1: Every mutation reaches every structure
+    print("\n-- Test Case 1: Mutations reach every structure --")
+    service = RegistryService()
+    service.add("ABC123", toyota, john, "2023-01-01", "2025-01-01")
+    service.add("XYZ789", honda, jane, "2023-01-01", "2025-06-01")
+    service.add("LMN456", toyota, john, "2023-01-01", "2026-01-01")
+    service.update("ABC123", "expiration_date", "2027-01-01")
+    print("Next expiring vehicle after moving 'ABC123' to 2027:", service.heap.get_next_expiration())
+    service.update("XYZ789", "license_number", "DL24680")
+    print("Vehicles of DL67890 after the license change:", service.owner_index.find_vehicles_by_dl(service.owner_index.root, "DL67890"))
+    print("Vehicles of DL24680 after the license change:", service.owner_index.find_vehicles_by_dl(service.owner_index.root, "DL24680"))
+    service.update("ABC123", "license_number", "DL24680")  # Only this one of John's two plates moves
+    print("Vehicles of DL12345 and DL24680 after moving 'ABC123':", [
+        (owner['owner_name'], owner['vehicles']) for owner in service.owner_index.in_order(service.owner_index.root)])
+    service.add("LMN456", honda, Owner("Jane", "Doe", "DL24680"), "2023-01-01", "2026-01-01")  # The plate changes hands
+    service.remove("ABC123")
+    print("Owners after 'LMN456' changed hands and 'ABC123' was removed:", summary(service)[4])
+    print("Removing a non-existent plate:", service.remove("NONEXISTENT"))
+    print("Updating a non-existent field:", service.update("XYZ789", "invalid_field", "Value"))
+
+    # Test Case 2: A rejected mutation changes nothing
+    print("\n-- Test Case 2: Rejected mutations --")
+    before = summary(service)
+    for mutation in (lambda: service.add("NEW111", toyota, john, "2023-01-01", "2025-13-01"),
+                     lambda: service.update("XYZ789", "expiration_date", "someday")):
+        try:
+            mutation()
+        except ValueError as error:
+            print("Rejected:", error)
+    print("Structures unchanged:", summary(service) == before)
+
+    # Test Case 3: A batch gives the same result as single mutations
+    print("\n-- Test Case 3: Batches --")
+    single, batched = RegistryService(), RegistryService()
+    for service in (single, batched):
+        with service.batch() if service is batched else contextlib.nullcontext():
+            service.add("ABC123", toyota, john, "2023-01-01", "2025-01-01")
+            service.add("XYZ789", honda, jane, "2023-01-01", "2025-06-01")
+            service.remove("ABC123")
+            service.add("ABC123", honda, jane, "2023-01-01", "2024-03-01")
+            service.update("XYZ789", "expiration_date", "2024-01-01")
+            if service is batched:
+                plates_during_batch = len(service.trie)
+    print("Plates in the trie during the batch:", plates_during_batch, "- after the batch:", len(batched.trie))
+    print("Same structures:", summary(single) == summary(batched))
+
+    # Test Case 4: Write throughput with and without a batch
+    print(f"\n-- Test Case 4: Adding {num_registrations} registrations --")
+    for use_batch in (False, True):
+        service = RegistryService()
+        start_time = time.time()
+        with service.batch() if use_batch else contextlib.nullcontext():
+            for i in range(num_registrations):
+                service.add(f"P{i:07d}", toyota, Owner("John", "Doe", f"DL{i // 2:08d}"), "2023-01-01",
+                            f"20{25 + i % 5}-{1 + i % 12:02d}-{1 + i % 28:02d}")
+        print(f"{'Batched' if use_batch else 'One by one'}: {time.time() - start_time:.2f} seconds")
+
+
+# Running the test suite
+if __name__ == "__main__":
+    test_registry_service()
@@ -0,0 +1,382 @@
+import heapq
+import multiprocessing
+import os
+import zlib
+from itertools import islice
+
+from objects.owner import Owner
+from objects.vehicle import Vehicle
+from feature_data_structures.registry_service import RegistryService
+
+
+# Operations a shard process runs for the coordinator, each called with the shard's RegistryService
+def _add(service, license_plate, make, model, year, color, classification, vin_number,
+         first_name, last_name, license_number, registration_date, expiration_date):
+    service.add(license_plate, Vehicle(make, model, year, color, classification, vin_number),
+                Owner(first_name, last_name, license_number), registration_date, expiration_date)
+
+
+# Add registrations in order until one is rejected. Returns the number added and the error or None,
+# so the coordinator knows which names to send to the other shards.
+def _add_many(service, registrations):
+    added = 0
+    with service.batch():
+        try:
+            for registration in registrations:
+                _add(service, *registration)
+                added += 1
+        except Exception as error:
+            return added, error
+    return added, None
+
+
+# Give owners that have registrations on this shard the latest names, {license_number: (first, last)}
+def _rename_owners(service, names):
+    owners = service.car_system.owners
+    for license_number, (first_name, last_name) in names.items():
+        if license_number in owners and owners.full_name(license_number) != f"{first_name} {last_name}":
+            service.rename_owner(license_number, first_name, last_name)
+
+
+# (first, last) names of an owner with registrations on this shard, or None
+def _owner_name(service, license_number):
+    owners = service.car_system.owners
+    owner_id = owners.find(license_number)
+    return None if owner_id is None else (owners.get(owner_id, "first_name"), owners.get(owner_id, "last_name"))
+
+
+def _get(service, license_plate):
+    registrations = service.registrations
+    return registrations[license_plate].to_dict() if license_plate in registrations else None
+
+
+def _find_vehicles_by_dl(service, dl_numbers):
+    return service.owner_index.find_vehicles_by_dl(service.owner_index.root, dl_numbers)
+
+
+SHARD_OPERATIONS = {
+    "add": _add,
+    "add_many": _add_many,
+    "update": RegistryService.update,
+    "remove": RegistryService.remove,
+    "rename_owner": RegistryService.rename_owner,
+    "rename_owners": _rename_owners,
+    "owner_name": _owner_name,
+    "get": _get,
+    "get_many": lambda service, license_plates: [_get(service, license_plate) for license_plate in license_plates],
+    "search": lambda service, prefix, limit: service.trie.search(prefix, limit=limit),
+    "count": lambda service, prefix: service.trie.count(prefix),
+    "next_expirations": lambda service, count: service.heap.next_expirations(count),
+    "find_vehicles_by_dl": _find_vehicles_by_dl,
+    "len": lambda service: len(service.registrations),
+}
+
+
+def _serve_shard(connection):
+    """
+    Main loop of a shard process: receive a list of (operation, args) calls, run them in order on
+    this shard's structures and send back one (ok, result or exception) pair per call. None stops it.
+    """
+    service = RegistryService()
+    while True:
+        calls = connection.recv()
+        if calls is None:
+            break
+        replies = []
+        for operation, args in calls:
+            try:
+                replies.append((True, SHARD_OPERATIONS[operation](service, *args)))
+            except Exception as error:  # Sent back and raised in the coordinator
+                replies.append((False, error))
+        connection.send(replies)
+    connection.close()
+
+
+class ShardedRegistry:
+    """
+    Registry partitioned by license plate across worker processes, to use more than one core.
+
+    Every shard process owns a RegistryService (registration system, trie, expiration heap and owner
+    index) for the plates that hash to it. The coordinator talks to the shards over pipes: a plate
+    lookup or change goes to its one shard, while prefix searches, next-expiring queries and owner
+    lookups are sent to every shard at once and the sorted partial answers are merged. Calls for
+    many plates are grouped into one message per shard, so the shards work on them in parallel.
+
+    An owner's registrations can be spread over several shards, but the owner has one name, like in
+    the single-process registry: a name given with a new registration or changed by an update is sent
+    to every shard. A new license number only moves that one plate, and the plate takes the names the
+    owner of that number already has on any shard.
+
+    A plate's shard is chosen with CRC32, which unlike hash() is the same in every process and run.
+    The coordinator itself is not thread-safe. Close it (or use it as a context manager) to stop
+    the shard processes.
+    """
+
+    def __init__(self, num_shards=None):
+        num_shards = num_shards or os.cpu_count() or 1
+        self.connections = []
+        self.processes = []
+        for _ in range(num_shards):
+            connection, shard_connection = multiprocessing.Pipe()
+            process = multiprocessing.Process(target=_serve_shard, args=(shard_connection,), daemon=True)
+            process.start()
+            shard_connection.close()
+            self.connections.append(connection)
+            self.processes.append(process)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return sum(self._broadcast("len"))
+
+    def shard_of(self, license_plate):
+        return zlib.crc32(license_plate.encode("utf-8")) % len(self.connections)
+
+    def _gather(self, calls_by_shard):
+        """
+        Send every shard its list of calls, then collect the replies, so the shards run in parallel.
+        Returns {shard: [result, ...]}. The first failed call is raised once every reply is in.
+        """
+        for shard, calls in calls_by_shard.items():
+            self.connections[shard].send(calls)
+        results = {}
+        error = None
+        for shard in calls_by_shard:
+            results[shard] = []
+            for ok, result in self.connections[shard].recv():
+                if not ok and error is None:
+                    error = result
+                results[shard].append(result)
+        if error is not None:
+            raise error
+        return results
+
+    def _route(self, license_plate, operation, *args):
+        shard = self.shard_of(license_plate)
+        return self._gather({shard: [(operation, (license_plate, *args))]})[shard][0]
+
+    def _broadcast(self, operation, *args):
+        results = self._gather({shard: [(operation, args)] for shard in range(len(self.connections))})
+        return [results[shard][0] for shard in range(len(self.connections))]
+
+    def add(self, license_plate, vehicle: Vehicle, owner: Owner, registration_date, expiration_date):
+        self._route(license_plate, "add", vehicle.make, vehicle.model, vehicle.year, vehicle.color,
+                    vehicle.classification, vehicle.vin_number, owner.first_name, owner.last_name,
+                    owner.license_number, registration_date, expiration_date)
+        # Only a registration the shard accepted gives the owner its names
+        shard = self.shard_of(license_plate)
+        self._gather({other: [("rename_owners", ({owner.license_number: (owner.first_name, owner.last_name)},))]
+                      for other in range(len(self.connections)) if other != shard})
+
+    def add_many(self, registrations):
+        """
+        Add (license_plate, vehicle, owner, registration_date, expiration_date) registrations, one
+        batch per shard. A shard stops at its first rejected registration; the others are still
+        added, then the first rejected registration is raised.
+        """
+        batches = {}
+        order = []  # (shard, position in the shard's batch, owner) of every registration
+        for license_plate, vehicle, owner, registration_date, expiration_date in registrations:
+            batch = batches.setdefault(self.shard_of(license_plate), [])
+            order.append((self.shard_of(license_plate), len(batch), owner))
+            batch.append((license_plate, vehicle.make, vehicle.model, vehicle.year, vehicle.color,
+                          vehicle.classification, vehicle.vin_number, owner.first_name, owner.last_name,
+                          owner.license_number, registration_date, expiration_date))
+        results = {shard: result[0] for shard, result in
+                   self._gather({shard: [("add_many", (batch,))] for shard, batch in batches.items()}).items()}
+
+        # The last name given for an owner wins, as with one add after the other, counting only added registrations
+        names = {owner.license_number: (owner.first_name, owner.last_name)
+                 for shard, position, owner in order if position < results[shard][0]}
+        if names:
+            self._broadcast("rename_owners", names)
+        for shard, position, _ in order:
+            added, error = results[shard]
+            if position == added and error is not None:
+                raise error
+
+    # A first or last name belongs to the owner, so it is changed on every shard
+    def update(self, license_plate, field, value):
+        if field == "license_number":
+            # The owner of the new number may only have registrations on other shards
+            shard = self.shard_of(license_plate)
+            calls = [("update", (license_plate, field, value))]
+            names = next((names for names in self._broadcast("owner_name", value) if names), None)
+            if names is not None:
+                calls.append(("rename_owners", ({value: names},)))
+            return self._gather({shard: calls})[shard][0]
+        if field not in ("first_name", "last_name"):
+            return self._route(license_plate, "update", field, value)
+        registration = self.get(license_plate)
+        if registration is None:
+            return False
+        owner = registration['owner']
+        names = {"first_name": owner['first_name'], "last_name": owner['last_name'], field: value}
+        self._broadcast("rename_owners", {owner['license_number']: (names['first_name'], names['last_name'])})
+        return True
+
+    def remove(self, license_plate):
+        return self._route(license_plate, "remove")
+
+    # The owner's registrations can be on any shard
+    def rename_owner(self, license_number, first_name, last_name):
+        return any(self._broadcast("rename_owner", license_number, first_name, last_name))
+
+    # Registration details as nested dicts, or None
+    def get(self, license_plate):
+        return self._route(license_plate, "get")
+
+    def get_many(self, license_plates):
+        """
+        Look up many plates with one message per shard. Returns their details (or None) in the
+        order of license_plates.
+        """
+        license_plates = list(license_plates)
+        by_shard = {}
+        for position, license_plate in enumerate(license_plates):
+            by_shard.setdefault(self.shard_of(license_plate), []).append(position)
+        results = self._gather({shard: [("get_many", ([license_plates[position] for position in positions],))]
+                                for shard, positions in by_shard.items()})
+        details = [None] * len(license_plates)
+        for shard, positions in by_shard.items():
+            for position, registration in zip(positions, results[shard][0]):
+                details[position] = registration
+        return details
+
+    def search(self, prefix, limit=None):
+        """
+        Plates starting with prefix in sorted order. Each shard returns at most limit sorted plates,
+        and the partial lists are merged until limit plates are found.
+        """
+        return list(islice(heapq.merge(*self._broadcast("search", prefix, limit)), limit))
+
+    def count(self, prefix):
+        return sum(self._broadcast("count", prefix))
+
+    def next_expirations(self, count=1):
+        """
+        The count registrations expiring first across all shards, as (expiration_date, license_plate)
+        pairs: a k-way merge of every shard's count earliest registrations.
+        """
+        return list(islice(heapq.merge(*self._broadcast("next_expirations", count)), count))
+
+    def get_next_expiration(self):
+        earliest = self.next_expirations(1)
+        return earliest[0] if earliest else None
+
+    def find_vehicles_by_dl(self, dl_numbers):
+        """
+        Owner name and vehicles of a driver's license number, collected from every shard the owner
+        has a registration on. Vehicles are returned in sorted order.
+        """
+        found = [result for result in self._broadcast("find_vehicles_by_dl", dl_numbers) if result]
+        if not found:
+            return None
+        vehicles = sorted(license_plate for result in found for license_plate in result['vehicles'])
+        return {'owner_name': found[0]['owner_name'], 'vehicles': vehicles, 'vehicle_count': len(vehicles)}
+
+    def close(self):
+        for connection in self.connections:
+            try:
+                connection.send(None)
+                connection.close()
+            except OSError:
+                pass  # The shard process is already gone
+        for process in self.processes:
+            process.join()
+        self.connections, self.processes = [], []
+
+
+# Test suite for the sharded registry
+def test_sharded_registry(num_registrations=200000):
+    import random
+    import time
+
+    toyota = Vehicle("Toyota", "Camry", 2020, "Blue", "Sedan", "123456789")
+    honda = Vehicle("Honda", "Civic", 2019, "Red", "Sedan", "987654321")
+
+    with ShardedRegistry(4) as registry:
+        # Test Case 1: Plates are spread over the shards and routed back
+        print("\n-- Test Case 1: Routing by plate --")
+        registry.add("ABC123", toyota, Owner("John", "Doe", "DL12345"), "2023-01-01", "2025-01-01")
+        registry.add("ABD456", honda, Owner("John", "Doe", "DL12345"), "2023-01-01", "2024-06-01")
+        registry.add("XYZ789", honda, Owner("Jane", "Roe", "DL67890"), "2023-01-01", "2024-03-01")
+        registry.add("ABE111", toyota, Owner("Ann", "Lee", "DL24680"), "2023-01-01", "2026-01-01")
+        print("Shards of the plates:", {plate: registry.shard_of(plate) for plate in ("ABC123", "ABD456", "XYZ789", "ABE111")})
+        print("Registrations:", len(registry))
+        print("Make of 'ABD456':", registry.get("ABD456")['vehicle']['make'])
+        print("Details of a non-existent plate:", registry.get("NONEXISTENT"))
+
+        # Test Case 2: Scatter-gather queries
+        print("\n-- Test Case 2: Scatter-gather queries --")
+        print("Plates starting with 'AB':", registry.search("AB"), "- first two:", registry.search("AB", limit=2))
+        print("Number of plates starting with 'AB':", registry.count("AB"))
+        print("Next two expiring vehicles:", registry.next_expirations(2))
+        print("Vehicles of DL12345:", registry.find_vehicles_by_dl("DL12345"))
+
+        # Test Case 3: Changes and errors are routed too
+        print("\n-- Test Case 3: Updates and removals --")
+        registry.update("XYZ789", "expiration_date", "2027-01-01")
+        print("Removing 'ABD456':", registry.remove("ABD456"), "- again:", registry.remove("ABD456"))
+        print("Renaming DL12345:", registry.rename_owner("DL12345", "Johnny", "Doe"))
+        print("Next expiring vehicle:", registry.get_next_expiration())
+        print("Vehicles of DL12345:", registry.find_vehicles_by_dl("DL12345"))
+        try:
+            registry.update("ABC123", "expiration_date", "someday")
+        except ValueError as error:
+            print("Rejected by the shard:", error)
+        # A name is the owner's, so changing it on one plate shows on the owner's plates of every shard
+        registry.add("QRS222", toyota, Owner("Johnny", "Doe", "DL12345"), "2023-01-01", "2026-01-01")
+        registry.update("ABC123", "first_name", "John")
+        print("Owner of 'QRS222' after renaming the owner of 'ABC123':", registry.get("QRS222")['owner'])
+        print("Vehicles of DL12345:", registry.find_vehicles_by_dl("DL12345"))
+        # A rejected registration gives its names to nobody, neither does one rejected in a batch
+        other_plate = next(plate for plate in ("XYZ000", "XYZ001", "XYZ002") if registry.shard_of(plate) != registry.shard_of("ABC123"))
+        for add in (lambda: registry.add(other_plate, toyota, Owner("Zed", "Q", "DL12345"), "2023-01-01", "someday"),
+                    lambda: registry.add_many([(other_plate, toyota, Owner("Zed", "Q", "DL12345"), "2023-01-01", "someday")])):
+            try:
+                add()
+            except ValueError as error:
+                print("Rejected:", error, "- Owner of 'ABC123':", registry.get("ABC123")['owner']['first_name'])
+
+        # A plate moved to a license number takes the names of that owner, wherever their plates are
+        registry.add(other_plate, honda, Owner("Ann", "Lee", "DL11111"), "2023-01-01", "2026-01-01")
+        registry.add("ABE222", honda, Owner("Bob", "Roe", "DL22222"), "2023-01-01", "2026-01-01")
+        moved = next(plate for plate in ("ABE222", "XYZ789") if registry.shard_of(plate) != registry.shard_of(other_plate))
+        registry.update(moved, "license_number", "DL11111")
+        print(f"Owners of '{other_plate}' and '{moved}' after moving '{moved}' to DL11111:",
+              registry.get(other_plate)['owner']['first_name'], registry.get(moved)['owner']['first_name'])
+
+    # Test Case 4: Throughput with more shards
+    print(f"\n-- Test Case 4: Throughput with {num_registrations} registrations --")
+    plates = [f"P{i:07d}" for i in range(num_registrations)]
+    registrations = [(plate, toyota, Owner("John", "Doe", f"DL{i // 2:08d}"), "2023-01-01",
+                      f"20{25 + i % 5}-{1 + i % 12:02d}-{1 + i % 28:02d}") for i, plate in enumerate(plates)]
+    lookups = random.sample(plates, min(100000, num_registrations))
+    for num_shards in sorted({1, 2, 4, os.cpu_count() or 1}):
+        with ShardedRegistry(num_shards) as registry:
+            start_time = time.time()
+            for start in range(0, num_registrations, 10000):
+                registry.add_many(registrations[start:start + 10000])
+            load_time = time.time() - start_time
+
+            start_time = time.time()
+            for start in range(0, len(lookups), 1000):
+                registry.get_many(lookups[start:start + 1000])
+            lookup_time = time.time() - start_time
+
+            start_time = time.time()
+            for i in range(1000):
+                registry.search(f"P{i:04d}", limit=10)
+            search_time = time.time() - start_time
+        print(f"{num_shards} shards: {num_registrations / load_time:,.0f} adds/s, "
+              f"{len(lookups) / lookup_time:,.0f} lookups/s, {1000 / search_time:,.0f} prefix searches/s")
+
+
+# Running the test suite
+if __name__ == "__main__":
+    test_sharded_registry()
@@ -1,78 +1,187 @@
+from itertools import islice
+
 from objects.vehicle import Vehicle
 from objects.owner import Owner
+from feature_data_structures.owner_table import OWNER_FIELDS, OwnerTable
+from feature_data_structures.registration_store import FIELDS, RegistrationStore
+from feature_data_structures.registration_indexes import DEFAULT_INDEXES, INDEX_TYPES, matches
+from feature_data_structures.registry_events import events, show_events
 
 class VehicleRegistrationSystem:
 
-    def __init__(self):
+    def __init__(self, indexes=None):
+
+        # Every owner is stored once, the registrations and the owner index only refer to them
+        self.owners = OwnerTable()
 
-        # Make the Dictionary for storing all the vehicle registration details by number plate as key
-        self.registrations = {}
+        # Columnar store of all the vehicle registration details with the number plate as key.
+        # It reads like a dict of nested dicts: registrations[plate]['vehicle']['make']
+        self.registrations = RegistrationStore(self.owners)
+
+        # Secondary indexes by field name, kept up to date by add_vehicle, update_registration and remove_vehicle
+        self.indexes = {}
+        for field, index_type in (DEFAULT_INDEXES if indexes is None else indexes).items():
+            self.add_index(field, index_type)
+
+    def add_index(self, field, index_type):
+        """
+        Index a field with a "hash" index (exact values) or a "sorted" index (exact values and ranges),
+        including the registrations already in the system.
+        """
+        if field not in FIELDS:
+            raise ValueError(f"Invalid field: {field}")
+        if field in OWNER_FIELDS:
+            # One owner change would have to be applied to the entries of all their registrations
+            raise ValueError(f"Owner fields cannot be indexed per registration: {field}")
+        if index_type not in INDEX_TYPES:
+            raise ValueError(f"Invalid index type: {index_type}")
+        self._build_index(field, INDEX_TYPES[index_type]())
+
+    # Rebuild every secondary index from the registrations, after they were loaded in bulk
+    def rebuild_indexes(self):
+        for field, index in list(self.indexes.items()):
+            self._build_index(field, type(index)())
+
+    def _build_index(self, field, index):
+        index.bulk_add(self.registrations.field_items(field))
+        self.indexes[field] = index
+
+    def _index_registration(self, license_plate):
+        for field, index in self.indexes.items():
+            index.add(self.registrations.get_field(license_plate, field), license_plate)
+
+    def _unindex_registration(self, license_plate):
+        for field, index in self.indexes.items():
+            index.remove(self.registrations.get_field(license_plate, field), license_plate)
 
     def add_vehicle(self, license_plate, vehicle:Vehicle, owner:Owner, registration_date, expiration_date):
-        self.registrations[license_plate] = {
-            'owner': {
-                'first_name': owner.first_name,
-                'last_name': owner.last_name,
-                'license_number': owner.license_number,
-            },
-            'vehicle': {
-                'make': vehicle.make,
-                'model': vehicle.model,
-                'year': vehicle.year,
-                'color': vehicle.color,
-                'classification': vehicle.classification,
-                'vin_number': vehicle.vin_number,
-            },
+        if license_plate in self.registrations:
+            self._unindex_registration(license_plate)  # The registration is replaced, drop its old values
+        try:
+            self._add_to_store(license_plate, vehicle, owner, registration_date, expiration_date)
+        finally:
+            # Index the new values, or the old ones again if the store rejected the registration
+            if license_plate in self.registrations:
+                self._index_registration(license_plate)
+
+    def _add_to_store(self, license_plate, vehicle, owner, registration_date, expiration_date):
+        self.registrations.add(license_plate, {
+            'first_name': owner.first_name,
+            'last_name': owner.last_name,
+            'license_number': owner.license_number,
+            'make': vehicle.make,
+            'model': vehicle.model,
+            'year': vehicle.year,
+            'color': vehicle.color,
+            'classification': vehicle.classification,
+            'vin_number': vehicle.vin_number,
             'registration_date': registration_date,
             'expiration_date': expiration_date
-        }
+        })
 
     def update_registration(self, license_plate,field, value ):
         if license_plate in self.registrations:
-            if field in self.registrations[license_plate]['vehicle']:
-                self.registrations[license_plate]['vehicle'][field] = value
-            elif field in self.registrations[license_plate]['owner']:
-                self.registrations[license_plate]['owner'][field] = value
-            elif field in ['registration_date', 'expiration_date']:
-                self.registrations[license_plate][field] = value
-            else:
-                print(f"Invalid field: {field}")
+            index = self.indexes.get(field)
+            old_value = self.registrations.get_field(license_plate, field) if index else None
+            if not self.registrations.set(license_plate, field, value):
+                events.warning("Invalid field: %s", field)
+            elif index:
+                index.remove(old_value, license_plate)
+                index.add(self.registrations.get_field(license_plate, field), license_plate)
 
         else:
-            print(f"Vehicle with license plate {license_plate} not found.")
+            events.debug("Vehicle with license plate %s not found.", license_plate)
+
+    # Rename the owner with the given license number in all their registrations at once
+    def rename_owner(self, license_number, first_name, last_name):
+        if not self.owners.rename(license_number, first_name, last_name):
+            events.debug("Owner with license number %s not found.", license_number)
 
+    # Details of a registration as nested dicts, or None
     def get_registrations(self, license_plate):
         if not license_plate in self.registrations:
-            print("License plate not found.")
-            return
-        details = self.registrations.get(license_plate, None)
-        print(f"License Plate: {license_plate}")
-        print(f"Owner: \n\tFirst name: {details['owner']['first_name']}"
-              f"\n\tLast name: {details['owner']['last_name']}"
-              f"\n\tLicense number: {details['owner']['license_number']}")
-        print(f"Vehicle: "
-              f"\n\tMake: {details['vehicle']['make']}"
-              f"\n\tModel: {details['vehicle']['model']}"
-              f"\n\tYear: {details['vehicle']['year']}"
-              f"\n\tColor: {details['vehicle']['color']}"
-              f"\n\tClassification: {details['vehicle']['classification']}"
-              f"\n\tVin Number: {details['vehicle']['vin_number']}")
-        print(f"Registration Date: {details['registration_date']}")
-        print(f"Expiration Date: {details['expiration_date']}\n")
-        return details
+            events.debug("License plate %s not found.", license_plate)
+            return None
+        return self.registrations[license_plate]  # Lazy view, fields are read from the columns
+
+    # Details of a registration as the text shown to the user, or None
+    def format_registration(self, license_plate):
+        details = self.get_registrations(license_plate)
+        if details is None:
+            return None
+        owner, vehicle = details['owner'], details['vehicle']
+        return (f"License Plate: {license_plate}\n"
+                f"Owner: \n\tFirst name: {owner['first_name']}"
+                f"\n\tLast name: {owner['last_name']}"
+                f"\n\tLicense number: {owner['license_number']}\n"
+                f"Vehicle: "
+                f"\n\tMake: {vehicle['make']}"
+                f"\n\tModel: {vehicle['model']}"
+                f"\n\tYear: {vehicle['year']}"
+                f"\n\tColor: {vehicle['color']}"
+                f"\n\tClassification: {vehicle['classification']}"
+                f"\n\tVin Number: {vehicle['vin_number']}\n"
+                f"Registration Date: {details['registration_date']}\n"
+                f"Expiration Date: {details['expiration_date']}\n\n")
 
     def remove_vehicle(self, license_plate):
         if license_plate in self.registrations:
-            del self.registrations[license_plate]
+            self._unindex_registration(license_plate)
+        if not self.registrations.remove(license_plate):
+            events.debug("Vehicle with license plate %s not found.", license_plate)
+
+    def query(self, **filters):
+        """
+        Return the sorted license plates matching every filter. A filter is field=value for an exact
+        match or field=(low, high) for an inclusive range, with None for an open end, for example
+        query(make="Toyota", year=(2015, None)).
+
+        The filter whose index matches the fewest plates is looked up first. Every other filter then
+        either intersects its own index lookup with the candidates or checks the candidates' column
+        values directly, whichever touches fewer plates.
+        """
+        for field in filters:
+            if field not in FIELDS:
+                raise ValueError(f"Invalid field: {field}")
+
+        # Number of plates each index would return, most selective first
+        estimates = []
+        for field, condition in filters.items():
+            index = self.indexes.get(field)
+            estimate = index.estimate(condition) if index else None
+            if estimate is not None:
+                estimates.append((estimate, field))
+        estimates.sort()
+
+        if estimates:
+            first = estimates[0][1]
+            candidates = set(self.indexes[first].lookup(filters[first]))
         else:
-            print(f"Vehicle with license plate {license_plate} not found.")
+            first = None
+            candidates = set(self.registrations)  # No usable index: scan every registration
+        estimated = {field: estimate for estimate, field in estimates}
+
+        for field, condition in sorted(filters.items(), key=lambda item: estimated.get(item[0], float("inf"))):
+            if field == first or not candidates:
+                continue
+            if estimated.get(field, float("inf")) <= len(candidates):
+                candidates &= self.indexes[field].lookup(condition)
+            else:
+                candidates = {license_plate for license_plate in candidates
+                              if matches(self.registrations.get_field(license_plate, field), condition)}
+        return sorted(candidates)
 
-    def display_all_registrations(self):
+    def registration_pages(self, page_size=50):
         """
-        Display all vehicle registrations in the system.
+        All vehicle registrations as text, one string per page of page_size registrations, in the
+        order they were added. The caller decides where a page goes and writes it in one call.
         """
-        for license_plate, details in self.registrations.items():
-            self.get_registrations(license_plate)
+        license_plates = iter(self.registrations)
+        while True:
+            page = [self.format_registration(license_plate) for license_plate in islice(license_plates, page_size)]
+            if not page:
+                break
+            yield "".join(page)
 
 # Test suite for the vehicle registration system implemented using a dictionary
 def test_vehicle_registration_system():
@@ -90,7 +199,7 @@ def test_vehicle_registration_system():
     car_system.add_vehicle("XYZ789", vehicle_2, owner_2, "2022-06-15", "2023-06-15")
 
     car_system.add_vehicle("LMN456", vehicle_1, owner_1, "2023-04-01", "2024-04-01")  # Another vehicle for the same owner
-    car_system.display_all_registrations()  # Print the current registrations to verify
+    print(*car_system.registration_pages(), sep="", end="")  # Print the current registrations to verify
 
     # Test Case 2: Retrieving vehicle registration by license plate
     print("\n-- Test Case 2: Retrieving vehicle registration by license plate --")
@@ -103,20 +212,43 @@ def test_vehicle_registration_system():
     car_system.update_registration("ABC123", "first_name", "Alice")  # Update owner first name
     car_system.update_registration("XYZ789", "color", "Green")  # Update vehicle color
     car_system.update_registration("LMN456", "expiration_date", "2025-04-01")  # Update expiration date
-    car_system.display_all_registrations()  # Verify updates
+    print(*car_system.registration_pages(), sep="", end="")  # Verify updates
     car_system.update_registration("XYZ789", "invalid_field", "Value")  # Edge case: Invalid field
 
     # Test Case 4: Removing a vehicle registration by license plate
     print("\n-- Test Case 4: Removing a vehicle registration --")
     car_system.remove_vehicle("ABC123")  # Remove existing registration
-    car_system.display_all_registrations()  # Verify removal
+    print(*car_system.registration_pages(), sep="", end="")  # Verify removal
     car_system.remove_vehicle("NONEXISTENT")  # Edge case: Try to remove non-existent registration
 
     # Test Case 5: Edge case - Adding a duplicate license plate
     print("\n-- Test Case 5: Adding a duplicate license plate --")
     car_system.add_vehicle("XYZ789", vehicle_2, owner_2, "2022-06-15", "2023-06-15")  # Attempt to re-add XYZ789
-    car_system.display_all_registrations()
+    print(*car_system.registration_pages(), sep="", end="")
+
+    # Test Case 6: Querying registrations through the secondary indexes
+    print("\n-- Test Case 6: Querying registrations by attributes --")
+    car_system.add_vehicle("QRS111", Vehicle("Toyota", "Corolla", 2015, "Red", "Sedan", "555555555"),
+                           Owner("Ann", "Lee", "DL24680"), "2023-03-01", "2025-03-01")
+    print("Toyotas:", car_system.query(make="Toyota"))
+    print("Red vehicles from 2016 on:", car_system.query(color="Red", year=(2016, None)))
+    print("VIN 555555555:", car_system.query(vin_number="555555555"))
+    print("Expiring before 2024-12-31:", car_system.query(expiration_date=(None, "2024-12-31")))
+    car_system.update_registration("QRS111", "make", "Lexus")
+    print("Toyotas after changing the make of 'QRS111':", car_system.query(make="Toyota"))
+    car_system.remove_vehicle("LMN456")
+    print("Toyotas after removing 'LMN456':", car_system.query(make="Toyota"))
+
+    # Test Case 7: Owners are stored once and renamed in one place
+    print("\n-- Test Case 7: Renaming an owner with several vehicles --")
+    car_system.add_vehicle("JKL222", vehicle_2, owner_2, "2023-02-01", "2024-02-01")  # Second vehicle for Jane
+    print("Owners stored:", len(car_system.owners), "- Registrations:", len(car_system.registrations))
+    car_system.rename_owner("DL67890", "Janet", "Smith")
+    print("Owner of 'XYZ789':", car_system.registrations['XYZ789']['owner'])
+    print("Owner of 'JKL222':", car_system.registrations['JKL222']['owner'])
+    car_system.rename_owner("DL99999", "No", "One")  # Edge case: non-existent owner
 
 # Running the test suite
 if __name__ == "__main__":
+    show_events()  # Follow the events of the registration system in the terminal
     test_vehicle_registration_system()
@@ -1,5 +1,7 @@
 # This will be the main system that runs the whole application
+import sys
 from datetime import datetime
+from itertools import islice
 from objects.vehicle import Vehicle
 from objects.owner import Owner
 
@@ -7,6 +9,21 @@ from feature_data_structures.vehicle_registration_system import VehicleRegistrat
 from feature_data_structures.expiration_data import ExpirationData
 from feature_data_structures.plate_lookup_registry import CompressedTrie
 from feature_data_structures.owner_based_car_registration import AVLTree
+from feature_data_structures.owner_block_index import BlockedOwnerIndex
+from feature_data_structures.registry_service import RegistryService
+from feature_data_structures.registration_transfer import (export_registrations, is_valid_alpha, is_valid_date,
+                                                           is_valid_vin, is_valid_year)
+
+# Number of license plates, owners or registrations shown per page of results
+PAGE_SIZE = 50
+# Number of misread characters tolerated by the partial plate search
+MAX_READ_ERRORS = 1
+# Backend of the owner index: "avl" for the AVL tree, "blocked" for the blocked sorted array
+# (see test_suite/owner_index_tests.py for a comparison of the two)
+OWNER_INDEX = "avl"
+OWNER_INDEX_BACKENDS = {"avl": AVLTree, "blocked": BlockedOwnerIndex}
+# Directory of the write-ahead log and snapshots that keep the registry across restarts
+DATA_DIRECTORY = "registry_data"
 
 def main_menu():
     print("\n---- Vehicle Registration System ----")
@@ -18,11 +35,15 @@ def main_menu():
     print("6. Get Next Expiring Vehicle")
     print("7. Display All Registrations")
     print("8. Find Vehicles by Driver's License")
-    print("9. Exit")
+    print("9. Search by Partial Plate (wildcards or misread characters)")
+    print("10. List Owners by Driver's License Range")
+    print("11. Import Registrations from a CSV/JSONL File")
+    print("12. Export Registrations to a CSV/JSONL File")
+    print("13. Exit")
     return input("Enter your choice: ")
 
 # We need to add all the details when a new vehicle is added.
-def add_vehicle(trie, heap, car_system, avl_tree):
+def add_vehicle(service):
     print("\n---- Add Vehicle Registration ----")
     license_plate = input("Enter license plate: ")
     make = input("Enter vehicle make: ")
@@ -32,7 +53,7 @@ def add_vehicle(trie, heap, car_system, avl_tree):
     def get_valid_year(prompt):
         while True:
             year = input(prompt)
-            if year.isdigit() and 1886 <= int(year) <= datetime.now().year:  # First car invented in 1886
+            if is_valid_year(year):  # First car invented in 1886
                 return int(year)
             else:
                 print(f"Invalid input. Please enter a valid year between 1886 and {datetime.now().year}.")
@@ -43,7 +64,7 @@ def add_vehicle(trie, heap, car_system, avl_tree):
     def get_valid_alpha(prompt, field_name):
         while True:
             text = input(prompt)
-            if text.isalpha():
+            if is_valid_alpha(text):
                 return text
             else:
                 print("Invalid input. Please enter only alphabetic characters for the " + field_name)
@@ -55,7 +76,7 @@ def add_vehicle(trie, heap, car_system, avl_tree):
     def get_valid_digit(prompt):
         while True:
             vin = input(prompt)
-            if vin.isdigit():
+            if is_valid_vin(vin):
                 return vin
             else:
                 print("Invalid input. Please enter only numeric characters for the VIN number.")
@@ -72,11 +93,9 @@ def add_vehicle(trie, heap, car_system, avl_tree):
     def get_valid_date(prompt):
         while True:
             date = input(prompt)
-            try:
-                # Try to parse the date in YYYY-MM-DD format
-                datetime.strptime(date, "%Y-%m-%d")
+            if is_valid_date(date):  # YYYY-MM-DD format
                 return date
-            except ValueError:
+            else:
                 print("Invalid date format. Please enter the date in YYYY-MM-DD format.")
 
     print("\n---- Registration Details ----")
@@ -86,10 +105,11 @@ def add_vehicle(trie, heap, car_system, avl_tree):
     vehicle = Vehicle(make, model, year, color, classification, vin_number)
     owner = Owner(first_name, last_name, license_number)
 
-    car_system.add_vehicle(license_plate, vehicle, owner, registration_date, expiration_date)
-    trie.insert(license_plate)
-    heap.add_registration(license_plate, expiration_date)
-    avl_tree.root = avl_tree.insert(avl_tree.root, license_number, f"{first_name} {last_name}", license_plate)  # Insert into AVL Tree
+    try:
+        service.add(license_plate, vehicle, owner, registration_date, expiration_date)  # Updates every structure at once
+    except ValueError as error:
+        print(f"Could not add the registration: {error}")
+        return
 
     print(f"Vehicle registration added for {license_plate}.")
 
@@ -97,44 +117,70 @@ def add_vehicle(trie, heap, car_system, avl_tree):
 def search_by_prefix(trie):
     print("\n---- Search by License Plate Prefix ----")
     prefix = input("Enter the license plate prefix: ")
-    result = trie.search(prefix)
-    if result:
+    result = trie.search(prefix, limit=PAGE_SIZE)
+    if not result:
+        print(f"No license plates found with prefix '{prefix}'.")
+        return
+
+    print(f"{trie.count(prefix)} license plates start with '{prefix}'.")
+    while result:
         print(f"License plates starting with '{prefix}': {result}")
+        if len(result) < PAGE_SIZE or input("Show next page? (y/n): ").lower() != 'y':
+            break
+        # Continue from the last plate shown instead of rescanning the earlier pages
+        result = trie.search(prefix, limit=PAGE_SIZE, after=result[-1])
+
+def search_by_partial_plate(trie):
+    print("\n---- Search by Partial License Plate ----")
+    print("Use '?' for an unreadable character and '*' for an unknown start or end of the plate.")
+    pattern = input("Enter the partial license plate: ")
+    try:
+        # Without wildcards, plates with up to MAX_READ_ERRORS misread, missing or extra characters match
+        result = trie.partial_search(pattern, MAX_READ_ERRORS, limit=PAGE_SIZE)
+    except ValueError as error:
+        print(error)
+        return
+
+    if result:
+        print(f"License plates matching '{pattern}': {result}")
     else:
-        print(f"No license plates found with prefix '{prefix}'.")
+        print(f"No license plates found matching '{pattern}'.")
 
 def search_by_plate(car_system):
     print("\n---- Search Registration by License Plate  ----")
     plate = input("Enter the license plate to retrieve full detail: ")
     print("")
-    car_system.get_registrations(plate)
+    details = car_system.format_registration(plate)
+    if details:
+        print(details, end="")
+    else:
+        print("License plate not found.")
 
 
-def update_expiration_date(heap, car_system):
+def update_expiration_date(service):
     print("\n---- Update Vehicle Expiration Date ----")
     license_plate = input("Enter license plate to update: ")
     new_expiration_date = input("Enter new expiration date (YYYY-MM-DD): ")
 
-    car_system.update_registration(license_plate, "expiration_date", new_expiration_date)
-    heap.remove_registration(license_plate)  # Remove old expiration date
-    heap.add_registration(license_plate, new_expiration_date)  # Add updated expiration date
+    try:
+        updated = service.update(license_plate, "expiration_date", new_expiration_date)  # Also moves the plate in the heap
+    except ValueError:
+        print("Invalid date format. Please enter the date in YYYY-MM-DD format.")
+        return
+    if not updated:
+        print(f"Vehicle with license plate {license_plate} not found.")
+        return
 
     print(f"Expiration date updated for {license_plate}.")
 
 
-def remove_vehicle(trie, heap, car_system, avl_tree):
+def remove_vehicle(service):
     print("\n---- Remove Vehicle Registration ----")
     license_plate = input("Enter license plate to remove: ")
 
-    # Get owner information to remove from AVL tree
-    vehicle_info = car_system.get_registrations(license_plate)
-    if vehicle_info:
-        license_number = vehicle_info['owner']['license_number']
-        avl_tree.root = avl_tree.remove(avl_tree.root, license_number, license_plate)  # Remove from AVL Tree
-
-    car_system.remove_vehicle(license_plate)
-    trie.delete(license_plate)
-    heap.remove_registration(license_plate)
+    if not service.remove(license_plate):  # Removes the plate from every structure
+        print(f"Vehicle with license plate {license_plate} not found.")
+        return
 
     print(f"Vehicle registration removed for {license_plate}.")
 
@@ -149,39 +195,112 @@ def get_next_expiring_vehicle(heap):
 
 def display_all_registrations(car_system):
     print("\n---- Display All Vehicle Registrations ----")
-    # for license_plate, details in car_system.registrations.items():
-    #     print(f"License Plate: {license_plate}, Details: {details}")
-    car_system.display_all_registrations()
+    total = len(car_system.registrations)
+    if not total:
+        print("No vehicles in the system.")
+        return
+
+    print(f"{total} registrations in the system.")
+    shown = 0
+    for page in car_system.registration_pages(PAGE_SIZE):
+        sys.stdout.write(page)  # One write per page instead of one per line
+        shown = min(shown + PAGE_SIZE, total)
+        if shown == total or input(f"Shown {shown} of {total}. Show next page? (y/n): ").lower() != 'y':
+            break
 
 def find_vehicles_by_license(avl_tree):
     print("\n---- Find Vehicles by Driver's License ----")
     license_number = input("Enter driver's license number: ")
-    result = avl_tree.find_vehicles_by_dl(avl_tree.root, license_number)
-
-    if result:
-        print(f"Vehicles owned by driver with license number '{license_number}': {result}")
-    else:
+    result = avl_tree.find_vehicles_by_dl(avl_tree.root, license_number, limit=PAGE_SIZE)
+    if not result:
         print(f"No vehicles found for driver's license number '{license_number}'.")
+        return
+
+    print(f"Driver with license number '{license_number}' ({result['owner_name']}) owns {result['vehicle_count']} vehicles.")
+    offset = 0
+    while result['vehicles']:
+        print(f"Vehicles owned by driver with license number '{license_number}': {result['vehicles']}")
+        offset += len(result['vehicles'])
+        if offset >= result['vehicle_count'] or input("Show next page? (y/n): ").lower() != 'y':
+            break
+        result = avl_tree.find_vehicles_by_dl(avl_tree.root, license_number, limit=PAGE_SIZE, offset=offset)
+
+def list_owners_by_license_range(avl_tree):
+    print("\n---- List Owners by Driver's License Range ----")
+    low = input("Enter the first driver's license number (leave empty for the start): ") or None
+    high = input("Enter the last driver's license number (leave empty for the end): ") or None
+    total = avl_tree.count_between(avl_tree.root, low, high)
+    if not total:
+        print("No owners found in that range.")
+        return
+
+    print(f"{total} owners in that range.")
+    owners = avl_tree.in_order(avl_tree.root, low)
+    shown = 0
+    while shown < total:
+        # Walk the tree lazily, one page at a time, in driver's license order
+        for owner in islice(owners, min(PAGE_SIZE, total - shown)):
+            more = " ..." if owner['vehicle_count'] > len(owner['vehicles']) else ""
+            print(f"{owner['dl_numbers']}: {owner['owner_name']}, {owner['vehicle_count']} vehicles: {owner['vehicles']}{more}")
+            shown += 1
+        if shown == total or input("Show next page? (y/n): ").lower() != 'y':
+            break
+
+# Load a whole file of registrations instead of typing them in one by one
+def import_file(service):
+    print("\n---- Import Registrations ----")
+    path = input("Enter the path of the .csv or .jsonl file: ")
+    start_time = datetime.now()
+    try:
+        imported, errors = service.import_file(path)
+    except (OSError, ValueError) as error:
+        print(f"Could not import '{path}': {error}")
+        return
+
+    print(f"Imported {imported} registrations in {(datetime.now() - start_time).total_seconds():.2f} seconds.")
+    if errors:
+        print(f"{len(errors)} lines were rejected, the first ones:")
+        for line_number, message in errors[:PAGE_SIZE]:
+            print(f"Line {line_number}: {message}")
+
+def export_file(car_system):
+    print("\n---- Export Registrations ----")
+    path = input("Enter the path of the .csv or .jsonl file to write: ")
+    try:
+        written = export_registrations(path, car_system)
+    except (OSError, ValueError) as error:
+        print(f"Could not export to '{path}': {error}")
+        return
+    print(f"Exported {written} registrations to '{path}'.")
 
 if __name__ == '__main__':
     car_system = VehicleRegistrationSystem()
-    trie = CompressedTrie()
+    trie = CompressedTrie(index_substrings=True)
     heap = ExpirationData()
-    avl_tree = AVLTree()
+    avl_tree = OWNER_INDEX_BACKENDS[OWNER_INDEX](car_system.owners)  # Owner names are shared with the registrations
+    # Every change goes through the service, which keeps the four structures in sync
+    service = RegistryService(car_system, trie, heap, avl_tree)
+
+    # Restore the registry saved by the previous run: last snapshot plus the log written after it
+    start_time = datetime.now()
+    replayed = service.restore(DATA_DIRECTORY)
+    if len(car_system.registrations):
+        print(f"Restored {len(car_system.registrations)} registrations ({replayed} from the log) "
+              f"in {(datetime.now() - start_time).total_seconds():.2f} seconds.")
 
     while True:
         choice = main_menu()
 
         if choice == '1':
-            add_vehicle(trie, heap, car_system, avl_tree)
+            add_vehicle(service)
         elif choice == '2':
             search_by_prefix(trie)
         elif choice == '3':
             search_by_plate(car_system)
         elif choice == '4':
-            update_expiration_date(heap, car_system)
+            update_expiration_date(service)
         elif choice == '5':
-            remove_vehicle(trie, heap, car_system, avl_tree)
+            remove_vehicle(service)
         elif choice == '6':
             get_next_expiring_vehicle(heap)
         elif choice == '7':
@@ -189,7 +308,17 @@ if __name__ == '__main__':
         elif choice == '8':
             find_vehicles_by_license(avl_tree)
         elif choice == '9':
+            search_by_partial_plate(trie)
+        elif choice == '10':
+            list_owners_by_license_range(avl_tree)
+        elif choice == '11':
+            import_file(service)
+        elif choice == '12':
+            export_file(car_system)
+        elif choice == '13':
             print("Exiting system...")
+            service.checkpoint()  # Start the next run from a snapshot instead of replaying the log
+            service.close()
             break
         else:
             print("Invalid choice, please try again.")
\ No newline at end of file
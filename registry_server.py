@@ -0,0 +1,283 @@
+# Network API of the Vehicle Registration System: every menu operation of main.py over a JSON line protocol
+#
+# Each request is one line of JSON, {"id": 1, "op": "get", "args": {"license_plate": "ABC123"}}, and is
+# answered by one line, {"id": 1, "ok": true, "result": {...}} or {"id": 1, "ok": false, "error": "..."}.
+# Clients may pipeline: send many requests without waiting, the responses come back in request order.
+# Run with: python registry_server.py [--host 127.0.0.1] [--port 8765] [--data-directory registry_data]
+#                                      [--files-directory exchange]
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import signal
+from datetime import datetime
+from itertools import islice
+
+from objects.vehicle import Vehicle
+from objects.owner import Owner
+
+from feature_data_structures.vehicle_registration_system import VehicleRegistrationSystem
+from feature_data_structures.expiration_data import ExpirationData
+from feature_data_structures.plate_lookup_registry import CompressedTrie
+from feature_data_structures.owner_based_car_registration import AVLTree
+from feature_data_structures.registry_service import RegistryService
+from feature_data_structures.registry_events import show_events
+from feature_data_structures.registration_transfer import RECORD_FIELDS, export_registrations, validate_record
+
+# Largest page any listing returns, like the pages of the interactive menu
+MAX_PAGE_SIZE = 1000
+# Number of misread characters tolerated by the partial plate search
+MAX_READ_ERRORS = 1
+# Most requests in one batch request
+MAX_BATCH_SIZE = 10000
+# Operations that read or write files: they run on a worker thread and cannot be part of a batch
+FILE_OPERATIONS = {"import", "export", "checkpoint"}
+# The only operations a batch may contain. The trie and the heap catch up when the batch ends, so a
+# read inside it would not see the batch's own changes; reads are pipelined instead.
+BATCH_OPERATIONS = {"add", "update_expiration", "remove"}
+
+
+class RegistryAPI:
+    """
+    The operations of the main.py menu as functions of JSON arguments returning JSON values.
+    Changes go through the RegistryService, so they reach every structure and the write-ahead log.
+    Import and export only use files inside files_directory, and are refused when it is None.
+    """
+
+    def __init__(self, service, files_directory=None):
+        self.service = service
+        self.files_directory = files_directory and os.path.realpath(files_directory)
+        # Held by every request, so requests on other connections wait while a file operation
+        # uses the structures from a worker thread
+        self.lock = asyncio.Lock()
+        self.operations = {
+            "add": self.add,
+            "search_prefix": self.search_prefix,
+            "get": self.get,
+            "get_many": self.get_many,
+            "update_expiration": self.update_expiration,
+            "remove": self.remove,
+            "next_expiring": self.next_expiring,
+            "list_registrations": self.list_registrations,
+            "find_by_license": self.find_by_license,
+            "search_partial": self.search_partial,
+            "owners_in_range": self.owners_in_range,
+            "import": self.import_file,
+            "export": self.export_file,
+            "checkpoint": self.checkpoint,
+            "batch": self.batch,
+        }
+
+    def handle(self, request):
+        """
+        Run one decoded request and build its response. Errors in the request are reported in the
+        response instead of being raised.
+        """
+        if not isinstance(request, dict):
+            return {"id": None, "ok": False, "error": "A request must be a JSON object"}
+        response = {"id": request.get("id")}
+        operation = self.operations.get(request.get("op"))
+        args = request.get("args") or {}
+        try:
+            if operation is None:
+                raise ValueError(f"Unknown operation: {request.get('op')!r}")
+            if not isinstance(args, dict):
+                raise ValueError("args must be a JSON object")
+            response["result"] = operation(**args)
+            response["ok"] = True
+        except Exception as error:  # A bad argument must not close the connection and lose its other responses
+            response["ok"] = False
+            response["error"] = str(error) or type(error).__name__
+        return response
+
+    async def run(self, request):
+        """
+        Handle a request on the event loop, or on a worker thread for a file operation so the
+        server keeps accepting connections and reading requests meanwhile.
+        """
+        async with self.lock:
+            if isinstance(request, dict) and request.get("op") in FILE_OPERATIONS:
+                return await asyncio.get_running_loop().run_in_executor(None, self.handle, request)
+            return self.handle(request)
+
+    def add(self, **fields):
+        missing = [field for field in RECORD_FIELDS if field not in fields]
+        if missing:
+            raise ValueError(f"Missing fields: {', '.join(missing)}")
+        # Same rules as the prompts of main.add_vehicle
+        (license_plate, make, model, year, color, classification, vin_number,
+         first_name, last_name, license_number, registration_date, expiration_date) = validate_record(
+            [fields[field] for field in RECORD_FIELDS])
+        self.service.add(license_plate, Vehicle(make, model, year, color, classification, vin_number),
+                         Owner(first_name, last_name, license_number), registration_date, expiration_date)
+        return license_plate
+
+    def search_prefix(self, prefix, limit=50, after=None):
+        trie = self.service.trie
+        return {"count": trie.count(prefix), "plates": trie.search(prefix, limit=_page_size(limit), after=after)}
+
+    def get(self, license_plate):
+        registrations = self.service.registrations
+        return registrations[license_plate].to_dict() if license_plate in registrations else None
+
+    # Multi-plate lookup: details (or null) for every plate, in the order given
+    def get_many(self, license_plates):
+        if len(license_plates) > MAX_BATCH_SIZE:
+            raise ValueError(f"At most {MAX_BATCH_SIZE} plates per request")
+        return [self.get(license_plate) for license_plate in license_plates]
+
+    def update_expiration(self, license_plate, expiration_date):
+        return self.service.update(license_plate, "expiration_date", expiration_date)
+
+    def remove(self, license_plate):
+        return self.service.remove(license_plate)
+
+    def next_expiring(self, count=1):
+        return [{"license_plate": license_plate, "expiration_date": expiration_date.strftime("%Y-%m-%d")}
+                for expiration_date, license_plate in self.service.heap.next_expirations(_page_size(count))]
+
+    # One page of all registrations, in the order they were added
+    def list_registrations(self, offset=0, limit=50):
+        registrations = self.service.registrations
+        return {"total": len(registrations),
+                "registrations": [{"license_plate": license_plate, **registrations[license_plate].to_dict()}
+                                  for license_plate in islice(registrations, offset, offset + _page_size(limit))]}
+
+    def find_by_license(self, license_number, limit=50, offset=0):
+        owner_index = self.service.owner_index
+        return owner_index.find_vehicles_by_dl(owner_index.root, license_number, limit=_page_size(limit), offset=offset)
+
+    def search_partial(self, pattern, limit=50):
+        if not isinstance(pattern, str):
+            raise ValueError("pattern must be a string")
+        return self.service.trie.partial_search(pattern, MAX_READ_ERRORS, limit=_page_size(limit))
+
+    # One page of owners with a driver's license number between low and high, continuing after a number.
+    # Each owner lists the first plates of the fleet, find_by_license pages through the rest.
+    def owners_in_range(self, low=None, high=None, after=None, limit=50):
+        owner_index = self.service.owner_index
+        owners = []
+        for owner in owner_index.in_order(owner_index.root, after or low):
+            if high is not None and owner['dl_numbers'] > high:
+                break
+            if owner['dl_numbers'] == after:
+                continue
+            owners.append(owner)
+            if len(owners) == _page_size(limit):
+                break
+        return {"count": owner_index.count_between(owner_index.root, low, high), "owners": owners}
+
+    # Paths are relative to the files directory on the server's machine
+    def import_file(self, path):
+        imported, errors = self.service.import_file(self._file_path(path))
+        return {"imported": imported, "errors": errors[:MAX_PAGE_SIZE], "error_count": len(errors)}
+
+    def export_file(self, path):
+        return export_registrations(self._file_path(path), self.service.car_system)
+
+    def _file_path(self, path):
+        if self.files_directory is None:
+            raise ValueError("Import and export are disabled: the server was started without --files-directory")
+        if not isinstance(path, str):
+            raise ValueError("path must be a string")
+        full_path = os.path.realpath(os.path.join(self.files_directory, path))
+        if os.path.commonpath([full_path, self.files_directory]) != self.files_directory:
+            raise ValueError(f"{path!r} is outside the files directory")
+        return full_path
+
+    def checkpoint(self):
+        self.service.checkpoint()
+        return True
+
+    def batch(self, requests):
+        """
+        Run a list of changes as one, answering with the list of their responses. Changes are
+        applied as one RegistryService batch, so the trie and the heap are updated once at the end.
+        """
+        if len(requests) > MAX_BATCH_SIZE:
+            raise ValueError(f"At most {MAX_BATCH_SIZE} requests per batch")
+        if not all(isinstance(request, dict) and request.get("op") in BATCH_OPERATIONS for request in requests):
+            raise ValueError(f"A batch can only contain {', '.join(sorted(BATCH_OPERATIONS))} requests")
+        with self.service.batch():
+            return [self.handle(request) for request in requests]
+
+
+def _page_size(limit):
+    return max(0, min(int(limit), MAX_PAGE_SIZE))
+
+
+async def serve_connection(api, reader, writer):
+    """
+    Answer the requests of one connection in order. All the complete lines that have arrived are
+    handled before the responses are written back with a single write, so pipelined requests
+    share system calls.
+    """
+    buffer = b""
+    try:
+        while True:
+            data = await reader.read(65536)
+            if not data:
+                break
+            buffer += data
+            *lines, buffer = buffer.split(b"\n")
+            responses = []
+            for line in lines:
+                if not line.strip():
+                    continue
+                try:
+                    request = json.loads(line)
+                except ValueError as error:
+                    responses.append({"id": None, "ok": False, "error": f"Invalid JSON: {error}"})
+                    continue
+                responses.append(await api.run(request))
+            if responses:
+                writer.write(b"".join(json.dumps(response, default=str).encode("utf-8") + b"\n" for response in responses))
+                await writer.drain()
+    except ConnectionError:
+        pass  # The client went away
+    finally:
+        writer.close()
+
+
+async def run_server(host, port, data_directory, files_directory=None):
+    car_system = VehicleRegistrationSystem()
+    service = RegistryService(car_system, CompressedTrie(index_substrings=True), ExpirationData(), AVLTree(car_system.owners))
+    start_time = datetime.now()
+    replayed = service.restore(data_directory)
+    print(f"Restored {len(service.registrations)} registrations ({replayed} from the log) "
+          f"in {(datetime.now() - start_time).total_seconds():.2f} seconds.")
+
+    api = RegistryAPI(service, files_directory)
+    server = await asyncio.start_server(lambda reader, writer: serve_connection(api, reader, writer), host, port)
+    print(f"Serving the registry on {', '.join(str(socket.getsockname()) for socket in server.sockets)}")
+    # Stop on Ctrl+C or a service manager's SIGTERM (signal handlers are not available on Windows)
+    stopped = asyncio.Event()
+    for signal_number in (signal.SIGINT, signal.SIGTERM):
+        with contextlib.suppress(NotImplementedError):
+            asyncio.get_running_loop().add_signal_handler(signal_number, stopped.set)
+    try:
+        async with server:
+            await stopped.wait()
+    finally:
+        service.checkpoint()  # Start the next run from a snapshot instead of replaying the log
+        service.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Serve the vehicle registry over a JSON line protocol.")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on (default: only this machine)")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--data-directory", default="registry_data", help="write-ahead log and snapshot directory")
+    parser.add_argument("--files-directory", help="directory of the files import and export may use "
+                                                   "(default: import and export are disabled)")
+    parser.add_argument("--show-events", action="store_true", help="print every event of the data structures (slower)")
+    arguments = parser.parse_args()
+    # Warnings of the data structures are always shown, their other events only when asked for
+    show_events(logging.DEBUG if arguments.show_events else logging.WARNING)
+    try:
+        asyncio.run(run_server(arguments.host, arguments.port, arguments.data_directory, arguments.files_directory))
+    except KeyboardInterrupt:
+        pass
+    print("Server stopped.")
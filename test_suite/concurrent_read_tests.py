@@ -0,0 +1,91 @@
+import contextlib
+import os
+import random
+import sys
+import threading
+import time
+
+from objects.owner import Owner
+from objects.vehicle import Vehicle
+from feature_data_structures.concurrent_registry import VersionedRegistry
+
+
+class TestConcurrentReads:
+    def __init__(self, num_registrations):
+        self.num_registrations = num_registrations
+        self.registry = VersionedRegistry()
+        self.global_lock = threading.Lock()
+        vehicle = Vehicle("Toyota", "Camry", 2020, "Blue", "Sedan", "123456789")
+        with self.registry.write() as service:
+            for i in range(num_registrations):
+                service.add(f"P{i:07d}", vehicle, Owner("John", "Doe", f"DL{i // 2:08d}"), "2023-01-01",
+                            f"20{25 + i % 5}-{1 + i % 12:02d}-{1 + i % 28:02d}")
+
+    def read_snapshot(self, rng):
+        # Lock-free: every query of one read sees the same published version
+        snapshot = self.registry.snapshot()
+        snapshot.search(f"P{rng.randrange(self.num_registrations) // 100:05d}", limit=10)
+        snapshot.find_vehicles_by_dl(f"DL{rng.randrange(self.num_registrations // 2):08d}")
+
+    def read_locked(self, rng):
+        # Baseline: one lock around the live structures, shared with the writer
+        service = self.registry.service
+        with self.global_lock:
+            service.trie.search(f"P{rng.randrange(self.num_registrations) // 100:05d}", limit=10)
+            service.owner_index.find_vehicles_by_dl(service.owner_index.root,
+                                                    f"DL{rng.randrange(self.num_registrations // 2):08d}")
+
+    def write_renewals(self, done, use_lock):
+        """
+        Writer thread: renew registrations (a new expiration date) and replace a few plates, publishing
+        a new version every 100 changes.
+        """
+        rng = random.Random(1)
+        vehicle = Vehicle("Honda", "Civic", 2019, "Red", "Sedan", "987654321")
+        while not done.is_set():
+            with self.global_lock if use_lock else contextlib.nullcontext(), self.registry.write() as service:
+                for _ in range(100):
+                    i = rng.randrange(self.num_registrations)
+                    service.update(f"P{i:07d}", "expiration_date", f"20{26 + i % 5}-01-01")
+                i = rng.randrange(self.num_registrations)
+                service.add(f"P{i:07d}", vehicle, Owner("Jane", "Doe", f"DL{i // 2:08d}"), "2024-01-01", "2029-01-01")
+            time.sleep(0.001)  # Leave the readers some room, like a writer waiting for renewals
+
+    def test_read_throughput(self, mode, num_threads, duration=1.0):
+        """
+        Count the reads num_threads reader threads complete in duration seconds while the writer runs.
+        """
+        read = self.read_snapshot if mode == "snapshot" else self.read_locked
+        done = threading.Event()
+        counts = [0] * num_threads
+
+        def reader(index):
+            rng = random.Random(index)
+            while not done.is_set():
+                read(rng)
+                counts[index] += 1
+
+        threads = [threading.Thread(target=reader, args=(index,)) for index in range(num_threads)]
+        threads.append(threading.Thread(target=self.write_renewals, args=(done, mode == "lock")))
+        for thread in threads:
+            thread.start()
+        time.sleep(duration)
+        done.set()
+        for thread in threads:
+            thread.join()
+        print(f"{mode:>8}, {num_threads} reader threads: {sum(counts) / duration:,.0f} reads per second")
+
+
+if __name__ == "__main__":
+    # Registry size and reader thread counts, for example: python -m test_suite.concurrent_read_tests 100000 1 2 4 8 16
+    num_registrations = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    thread_counts = [int(count) for count in sys.argv[2:]] or [1, 2, 4, 8]
+
+    gil_enabled = getattr(sys, "_is_gil_enabled", lambda: True)()
+    print(f"Python {sys.version.split()[0]}, GIL {'enabled' if gil_enabled else 'disabled (free-threaded build)'}, "
+          f"{os.cpu_count()} CPUs")
+
+    test = TestConcurrentReads(num_registrations)
+    for mode in ("lock", "snapshot"):
+        for num_threads in thread_counts:
+            test.test_read_throughput(mode, num_threads)
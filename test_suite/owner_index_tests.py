@@ -0,0 +1,126 @@
+import sys
+import time
+import random
+import tracemalloc
+
+
+class TestOwnerIndex:
+    def __init__(self, index_class):
+        self.index_class = index_class
+        self.index = index_class()
+
+    def test_insertion_search(self):
+        """
+        Test insertion and search correctness, including a second vehicle for the same owner.
+        """
+        print("-- Test: Insertion and Search --")
+        self.index.root = self.index.insert(self.index.root, "DL12345", "Alice", "ABC123")
+        self.index.root = self.index.insert(self.index.root, "DL67890", "Bob", "XYZ789")
+        self.index.root = self.index.insert(self.index.root, "DL12345", "Alice", "DEF456")
+        self.index.root = self.index.insert(self.index.root, "DL12345", "Alice", "DEF456")  # Duplicate plate
+
+        result = self.index.find_vehicles_by_dl(self.index.root, "DL12345")
+        assert result['vehicles'] == ["ABC123", "DEF456"], "Alice should own two vehicles"
+        assert self.index.find_vehicles_by_dl(self.index.root, "DL99999") is None, "DL99999 should not be found"
+
+        print("Passed: Insertion and Search")
+
+    def test_deletion(self):
+        """
+        Test that an owner is removed together with their last vehicle.
+        """
+        print("\n-- Test: Deletion --")
+        self.index.root = self.index.remove(self.index.root, "DL12345", "ABC123")
+        assert self.index.count_vehicles(self.index.root, "DL12345") == 1, "Alice should own one vehicle"
+        self.index.root = self.index.remove(self.index.root, "DL12345", "DEF456")
+        assert self.index.find_vehicles_by_dl(self.index.root, "DL12345") is None, "Alice should be removed"
+
+        print("Passed: Deletion")
+
+    def test_ordered_queries(self, num_owners=10000):
+        """
+        Test range, rank, select and paging against a sorted list of the same owners.
+        """
+        print("\n-- Test: Ordered Queries --")
+        self.index = self.index_class()  # Give a fresh index to prevent previous inputs from messing with the test
+        dl_numbers = [f"DL{random.randrange(10 ** 8):08d}" for _ in range(num_owners)]
+        for dl in dl_numbers:
+            self.index.root = self.index.insert(self.index.root, dl, "Owner", "P" + dl)
+        expected = sorted(set(dl_numbers))
+
+        low, high = sorted(random.sample(expected, 2))
+        found = [owner['dl_numbers'] for owner in self.index.range(self.index.root, low, high)]
+        assert found == [dl for dl in expected if low <= dl <= high], "Range should match the sorted owners"
+        assert self.index.count_between(self.index.root, low, high) == len(found), "Count should match the range"
+        assert self.index.rank(self.index.root, high) == expected.index(high), "Rank should match the position"
+        assert self.index.select(self.index.root, 100)['dl_numbers'] == expected[100], "Select should match"
+        page = self.index.page(self.index.root, 10, after=low)
+        assert [owner['dl_numbers'] for owner in page] == [dl for dl in expected if dl > low][:10], "Page should match"
+
+        # A fleet owner is listed with the first plates only, the rest is paged by license number
+        for i in range(25):
+            self.index.root = self.index.insert(self.index.root, low, "Owner", f"FLEET{i:02d}")
+        owner = self.index.select(self.index.root, expected.index(low))
+        assert owner['vehicle_count'] == 26 and len(owner['vehicles']) < 26, "Listings should not copy whole fleets"
+        rest = self.index.find_vehicles_by_dl(self.index.root, low, limit=100, offset=len(owner['vehicles']))['vehicles']
+        assert owner['vehicles'] + rest == list(self.index.iter_vehicles(self.index.root, low)), "Pages should cover the fleet"
+
+        print("Passed: Ordered Queries")
+
+    def test_benchmark(self, num_owners, num_operations=100000):
+        """
+        Build an index of num_owners owners, then time inserts, lookups and deletes at that size.
+        """
+        print(f"\n-- Benchmark: {num_operations} operations on {num_owners} owners --")
+        # Existing owners get even numbers so the new ones (odd numbers) land between them
+        owners = ((f"DL{2 * i:09d}", "Owner", f"P{i:08d}") for i in range(num_owners))
+
+        tracemalloc.start()
+        start_time = time.time()
+        self.index = self.index_class.build_from_sorted(owners)
+        build_time = time.time() - start_time
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"Time to build from sorted owners: {build_time:.2f} seconds; "
+              f"Memory: {current / 10 ** 6:.2f} MB ({current / num_owners:.0f} bytes per owner)")
+
+        new_owners = [f"DL{2 * random.randrange(num_owners) + 1:09d}" for _ in range(num_operations)]
+        start_time = time.time()
+        for dl in new_owners:
+            self.index.root = self.index.insert(self.index.root, dl, "Owner", "NEW")
+        print(f"Time to insert {num_operations} owners: {time.time() - start_time:.2f} seconds")
+
+        lookups = [f"DL{2 * random.randrange(num_owners):09d}" for _ in range(num_operations)]
+        start_time = time.time()
+        for dl in lookups:
+            self.index.find_vehicles_by_dl(self.index.root, dl)
+        print(f"Time to look up {num_operations} owners: {time.time() - start_time:.2f} seconds")
+
+        start_time = time.time()
+        for dl in new_owners:
+            self.index.root = self.index.remove(self.index.root, dl, "NEW")
+        print(f"Time to delete {num_operations} owners: {time.time() - start_time:.2f} seconds")
+
+        print("Passed: Benchmark")
+
+
+if __name__ == "__main__":
+    # Import both owner index backends so they can be compared side by side
+    from feature_data_structures.owner_based_car_registration import AVLTree
+    from feature_data_structures.owner_block_index import BlockedOwnerIndex
+
+    # Owner counts to benchmark, for example: python -m test_suite.owner_index_tests 100000 1000000 10000000
+    sizes = [int(size) for size in sys.argv[1:]] or [100000, 1000000]
+
+    for index_class in (AVLTree, BlockedOwnerIndex):
+        print(f"\n==== {index_class.__name__} ====")
+        test_index = TestOwnerIndex(index_class)
+
+        # Correctness Tests
+        test_index.test_insertion_search()
+        test_index.test_deletion()
+        test_index.test_ordered_queries()
+
+        # Performance Tests
+        for num_owners in sizes:
+            test_index.test_benchmark(num_owners)
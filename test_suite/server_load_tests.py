@@ -0,0 +1,107 @@
+import asyncio
+import json
+import random
+import sys
+import time
+
+# Largest response line the client accepts: a batch of adds is answered with one line
+MAX_LINE_SIZE = 1 << 24
+
+
+class TestServerLoad:
+    """
+    Load generator for registry_server.py. Every connection keeps up to depth requests in flight
+    (pipelining) and the latency of each request is measured from its send to its response.
+    """
+
+    def __init__(self, host="127.0.0.1", port=8765, num_registrations=100000):
+        self.host = host
+        self.port = port
+        self.num_registrations = num_registrations
+
+    async def populate(self, batch_size=5000):
+        # Register the plates the workload reads, with batch requests of adds
+        reader, writer = await asyncio.open_connection(self.host, self.port, limit=MAX_LINE_SIZE)
+        start_time = time.time()
+        for start in range(0, self.num_registrations, batch_size):
+            adds = [{"id": i, "op": "add", "args": {
+                "license_plate": f"L{i:07d}", "make": "Toyota", "model": "Camry", "year": "2020",
+                "color": "Blue", "classification": "Sedan", "vin_number": "123456789",
+                "first_name": "John", "last_name": "Doe", "license_number": f"DL{i // 2:08d}",
+                "registration_date": "2023-01-01",
+                "expiration_date": f"20{27 + i % 5}-{1 + i % 12:02d}-{1 + i % 28:02d}"}}
+                for i in range(start, min(start + batch_size, self.num_registrations))]
+            writer.write(json.dumps({"id": start, "op": "batch", "args": {"requests": adds}}).encode() + b"\n")
+            response = json.loads(await reader.readline())
+            failed = [result["error"] for result in response.get("result") or [] if not result["ok"]]
+            if not response["ok"] or failed:
+                raise RuntimeError(response.get("error") or failed[0])
+        writer.close()
+        print(f"Registered {self.num_registrations} plates in {time.time() - start_time:.2f} seconds")
+
+    def next_request(self, rng, request_id):
+        # Mixed workload: mostly plate lookups, then prefix searches, multi-plate lookups and expirations
+        choice = rng.random()
+        if choice < 0.6:
+            return {"id": request_id, "op": "get", "args": {"license_plate": self.random_plate(rng)}}
+        if choice < 0.85:
+            return {"id": request_id, "op": "search_prefix",
+                    "args": {"prefix": self.random_plate(rng)[:6], "limit": 10}}
+        if choice < 0.95:
+            return {"id": request_id, "op": "get_many",
+                    "args": {"license_plates": [self.random_plate(rng) for _ in range(10)]}}
+        return {"id": request_id, "op": "next_expiring", "args": {"count": 5}}
+
+    def random_plate(self, rng):
+        return f"L{rng.randrange(self.num_registrations):07d}"
+
+    async def run_connection(self, index, depth, deadline, latencies):
+        rng = random.Random(index)
+        reader, writer = await asyncio.open_connection(self.host, self.port, limit=MAX_LINE_SIZE)
+        sent_at = {}
+        next_id = 0
+        while True:
+            # Top up the pipeline, then wait for the oldest response
+            if time.perf_counter() < deadline:
+                lines = []
+                while len(sent_at) < depth:
+                    lines.append(json.dumps(self.next_request(rng, next_id)).encode() + b"\n")
+                    sent_at[next_id] = time.perf_counter()
+                    next_id += 1
+                if lines:
+                    writer.write(b"".join(lines))
+                    await writer.drain()
+            if not sent_at:
+                break
+            response = json.loads(await reader.readline())
+            latencies.append(time.perf_counter() - sent_at.pop(response["id"]))
+            if not response["ok"]:
+                raise RuntimeError(response["error"])
+        writer.close()
+
+    async def test_throughput(self, connections, depth, duration=5.0):
+        latencies = []
+        start_time = time.perf_counter()
+        deadline = start_time + duration
+        await asyncio.gather(*(self.run_connection(index, depth, deadline, latencies) for index in range(connections)))
+        elapsed = time.perf_counter() - start_time
+        latencies.sort()
+        p50 = latencies[len(latencies) // 2] * 1000
+        p99 = latencies[min(len(latencies) - 1, len(latencies) * 99 // 100)] * 1000
+        print(f"{connections:>3} connections, pipeline depth {depth:>3}: {len(latencies) / elapsed:>9,.0f} requests/s, "
+              f"p50 {p50:.2f} ms, p99 {p99:.2f} ms")
+
+
+if __name__ == "__main__":
+    # Start the server first (python registry_server.py), then for example:
+    # python -m test_suite.server_load_tests 100000 --populate
+    num_registrations = int(sys.argv[1]) if len(sys.argv) > 1 and sys.argv[1].isdigit() else 100000
+    test = TestServerLoad(num_registrations=num_registrations)
+
+    async def run():
+        if "--populate" in sys.argv:
+            await test.populate()
+        for connections, depth in ((1, 1), (1, 16), (8, 1), (8, 16), (32, 16)):
+            await test.test_throughput(connections, depth)
+
+    asyncio.run(run())
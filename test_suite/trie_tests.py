@@ -6,6 +6,7 @@ import tracemalloc
 
 class TestTrie:
     def __init__(self, trie_class):
+        self.trie_class = trie_class
         self.trie = trie_class()
 
     def test_insertion_search(self):
@@ -63,6 +64,75 @@ class TestTrie:
 
         print("Passed: Edge Cases")
 
+    def test_paginated_search(self):
+        """
+        Test that limit, offset and cursor paging return consistent sorted pages.
+        """
+        print("\n-- Test: Paginated Search --")
+        for plate in ["PAG003", "PAG001", "PAG005", "PAG002", "PAG004"]:
+            self.trie.insert(plate)
+
+        all_plates = self.trie.search("PAG")
+        assert all_plates == sorted(all_plates), "Results should be in sorted order"
+        assert self.trie.search("PAG", limit=2) == ["PAG001", "PAG002"], "First page should hold the 2 smallest plates"
+        assert self.trie.search("PAG", limit=2, offset=2) == ["PAG003", "PAG004"], "Offset should skip the first page"
+        assert self.trie.search("PAG", limit=2, after="PAG004") == ["PAG005"], "Cursor should resume after the last plate"
+
+        print("Passed: Paginated Search")
+
+    def test_wildcard_fuzzy_search(self):
+        """
+        Test wildcard patterns and edit distance search for misread plates.
+        """
+        print("\n-- Test: Wildcard and Fuzzy Search --")
+        for plate in ["CAM123", "CAM128", "CBM123", "CAM1234"]:
+            self.trie.insert(plate)
+
+        assert self.trie.wildcard_search("C?M123") == ["CAM123", "CBM123"], "'?' should match any single character"
+        assert self.trie.wildcard_search("CAM12*") == ["CAM123", "CAM1234", "CAM128"], "'*' should match any rest"
+        assert ("CAM123", 0) in self.trie.fuzzy_search("CAM123", 1), "Exact plate should match with distance 0"
+        assert ("CAM123", 1) in self.trie.fuzzy_search("C4M123", 1), "One misread character should match"
+        assert ("CAM123", 1) in self.trie.fuzzy_search("CM123", 1), "One missing character should match"
+        assert "CAM123" not in [plate for plate, _ in self.trie.fuzzy_search("C4M12", 1)], "Two edits should not match with k=1"
+        assert ("CAM123", 2) in self.trie.fuzzy_search("C4M12", 2), "Two edits should match with k=2"
+
+        print("Passed: Wildcard and Fuzzy Search")
+
+    def test_substring_search(self):
+        """
+        Test contains and ends with queries through the n-gram index, including after deletion.
+        """
+        print("\n-- Test: Substring Search --")
+        self.trie = self.trie_class(index_substrings=True) # Fresh Trie with the n-gram index enabled
+        for plate in ["ABX127", "QX12ZZ", "X12", "ZZZ999"]:
+            self.trie.insert(plate)
+
+        assert self.trie.contains("X12") == ["ABX127", "QX12ZZ", "X12"], "All plates containing 'X12' should be found"
+        assert self.trie.endswith("ZZ") == ["QX12ZZ"], "Only plates ending with 'ZZ' should be found"
+        self.trie.delete("QX12ZZ")
+        assert "QX12ZZ" not in self.trie.contains("X12"), "Deleted plates should leave the substring index"
+
+        print("Passed: Substring Search")
+
+    def test_prefix_count(self):
+        """
+        Test that prefix counts follow insertions and deletions without running a search.
+        """
+        print("\n-- Test: Prefix Count --")
+        self.trie = self.trie_class() # Give a fresh Trie data structure to prevent previous inputs from messing with the test
+        for plate in ["CNT100", "CNT101", "CNT200", "CN", "XCNT10"]:
+            self.trie.insert(plate)
+        self.trie.insert("CNT100")  # Duplicates must not be counted twice
+
+        assert self.trie.count("CN") == 4, "4 plates start with 'CN'"
+        assert self.trie.count("CNT1") == 2, "2 plates start with 'CNT1'"
+        assert self.trie.count("NONE") == 0, "No plates start with 'NONE'"
+        self.trie.delete("CNT101")
+        assert self.trie.count("CNT1") == 1, "Deleted plates should no longer be counted"
+        assert self.trie.search("CN", limit=1, offset=2) == ["CNT200"], "Offset should land on the third plate"
+
+        print("Passed: Prefix Count")
+
     def test_large_dataset(self, num_plates=100000):
         """
         Insert a large dataset to test performance and scalability.
@@ -86,14 +156,57 @@ class TestTrie:
         search_duration = time.time() - search_time_start
         print(f"Time to perform 100 searches: {search_duration:.5f} seconds")
 
+        # Prefixes longer than 3 characters used to scan every suffix below the third character
+        deep_search_time_start = time.time()
+        for _ in range(100):
+            prefix = ''.join(random.choices(string.ascii_uppercase + string.digits, k=5))
+            self.trie.search(prefix)
+        deep_search_duration = time.time() - deep_search_time_start
+        print(f"Time to perform 100 searches with 5 character prefixes: {deep_search_duration:.5f} seconds")
+
+        # Fetch the first page of single character prefixes, as the lookup UI does
+        page_time_start = time.time()
+        for _ in range(100):
+            prefix = random.choice(string.ascii_uppercase + string.digits)
+            self.trie.search(prefix, limit=50)
+        page_duration = time.time() - page_time_start
+        print(f"Time to fetch 100 pages of 50 plates: {page_duration:.5f} seconds")
+
         print("Passed: Large Dataset")
 
+    def test_bulk_load(self, num_plates=100000):
+        """
+        Compare bulk loading a batch of plates against inserting them one at a time.
+        """
+        print(f"\n-- Test: Bulk Load with {num_plates} plates --")
+        plates = [''.join(random.choices(string.ascii_uppercase + string.digits, k=6)) for _ in range(num_plates)]
+
+        insert_trie = self.trie_class()
+        start_time = time.time()
+        for plate in plates:
+            insert_trie.insert(plate)
+        insert_duration = time.time() - start_time
+
+        self.trie = self.trie_class() # Give a fresh Trie data structure to prevent previous inputs from messing with the test
+        start_time = time.time()
+        self.trie.bulk_load(plates)
+        bulk_duration = time.time() - start_time
+
+        for _ in range(100):
+            prefix = ''.join(random.choices(string.ascii_uppercase + string.digits, k=2))
+            assert self.trie.search(prefix) == insert_trie.search(prefix), "Bulk load should store the same plates"
+
+        print(f"Time to insert {num_plates} plates one by one: {insert_duration:.5f} seconds")
+        print(f"Time to bulk load {num_plates} plates: {bulk_duration:.5f} seconds ({insert_duration / bulk_duration:.2f}x faster)")
+
+        print("Passed: Bulk Load")
+
     def stress_test_prefix_collision(self):
         """
         Insert plates with similar prefixes to test deep prefix collisions.
         """
         print("\n-- Test: Prefix Collision Stress Test --")
-        self.trie = CompressedTrie() # Give a fresh Trie data structure to prevent previous inputs from messing with the test
+        self.trie = self.trie_class() # Give a fresh Trie data structure to prevent previous inputs from messing with the test
         prefix = "NLZ"
         for i in range(1000):
             plate = prefix + str(i).zfill(3)
@@ -107,7 +220,7 @@ class TestTrie:
 
         tracemalloc.start()
 
-        self.trie = CompressedTrie() # Give a fresh Trie data structure to prevent previous inputs from messing with the test
+        self.trie = self.trie_class() # Give a fresh Trie data structure to prevent previous inputs from messing with the test
 
         start_time = time.time()
 
@@ -126,22 +239,59 @@ class TestTrie:
 
         print("Passed: Memory Usage Test")
 
+    def test_frozen_snapshot(self, num_plates=100000):
+        """
+        Freeze the Trie into an array-backed image and compare its size and answers with the live Trie.
+        """
+        print(f"\n-- Test: Frozen Snapshot with {num_plates} plates --")
+        self.trie = self.trie_class() # Give a fresh Trie data structure to prevent previous inputs from messing with the test
+        for _ in range(num_plates):
+            random_plate = ''.join(random.choices(string.ascii_uppercase + string.digits, k=6))
+            self.trie.insert(random_plate)
 
-# Example Usage of the Test Suite
-if __name__ == "__main__":
-    from feature_data_structures.plate_lookup_registry import CompressedTrie  # Import your optimized Trie class
+        start_time = time.time()
+        frozen = self.trie.freeze()
+        duration = time.time() - start_time
+
+        for _ in range(100):
+            prefix = ''.join(random.choices(string.ascii_uppercase + string.digits, k=2))
+            assert frozen.search(prefix) == self.trie.search(prefix), "Frozen image should return the same plates"
 
-    test_trie = TestTrie(CompressedTrie)
+        print(f"Time to freeze {num_plates} plates: {duration:.2f} seconds")
+        print(f"Frozen image size: {frozen.nbytes() / 10 ** 6:.2f} MB")
 
-    # Correctness Tests
-    test_trie.test_insertion_search()
-    test_trie.test_custom_plates()
-    test_trie.test_deletion()
-    test_trie.test_edge_cases()
+        print("Passed: Frozen Snapshot Test")
 
-    # Performance Tests
-    test_trie.test_large_dataset(100000)  # Test with 100,000 plates
 
-    # Stress Tests
-    test_trie.stress_test_prefix_collision()
-    test_trie.test_memory_usage(100000)
+# Example Usage of the Test Suite
+if __name__ == "__main__":
+    # Import both Trie engines so they can be compared side by side
+    from feature_data_structures.plate_lookup_registry import CompressedTrie, HashSuffixTrie
+
+    for trie_class in (HashSuffixTrie, CompressedTrie):
+        print(f"\n==== {trie_class.__name__} ====")
+        test_trie = TestTrie(trie_class)
+
+        # Correctness Tests
+        test_trie.test_insertion_search()
+        test_trie.test_custom_plates()
+        test_trie.test_deletion()
+        test_trie.test_edge_cases()
+        test_trie.test_paginated_search()
+        if hasattr(trie_class, "fuzzy_search"):
+            test_trie.test_wildcard_fuzzy_search()
+        if hasattr(trie_class, "count"):
+            test_trie.test_prefix_count()
+        if hasattr(trie_class, "contains"):
+            test_trie.test_substring_search()
+
+        # Performance Tests
+        test_trie.test_large_dataset(100000)  # Test with 100,000 plates
+        if hasattr(trie_class, "bulk_load"):
+            test_trie.test_bulk_load(100000)
+
+        # Stress Tests
+        test_trie.stress_test_prefix_collision()
+        test_trie.test_memory_usage(100000)
+        if hasattr(trie_class, "freeze"):
+            test_trie.test_frozen_snapshot(100000)